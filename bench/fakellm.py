@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Fake OpenAI-compatible LLM server that injects latency and errors
+
+  python bench/fakellm.py --port 8080 --latency 0.5 --error-rate 0.2
+  MEINANTRAG_LLM_BACKEND=openai MEINANTRAG_LLM_BASE_URL=http://127.0.0.1:8080/v1 python meinantrag.py
+
+The answers come from the fake backend of the app, so they parse like real
+ones. bench/resilience.py starts the server in-process and changes the
+faults between its scenarios.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+
+DEFAULT_FAULTS = {
+	'latency': 0.0,       # seconds per answer
+	'jitter': 0.0,        # up to this many seconds on top
+	'slow_rate': 0.0,     # share of answers that take slow_latency longer
+	'slow_latency': 1.0,
+	'error_rate': 0.0,    # share of requests answered with error_status
+	'error_status': 503,
+	'down': False,        # answer every request with error_status
+}
+
+class FakeLLMServer:
+	"""Chat completions endpoint on 127.0.0.1, faults can be changed while it runs"""
+
+	def __init__(self, port=0, **faults):
+		sys.path.insert(0, ROOT_DIR)
+		import meinantrag
+		self.answers = meinantrag.FakeBackend()
+		self.faults = dict(DEFAULT_FAULTS, **faults)
+		self.stats = {'requests': 0, 'errors': 0}
+		self._lock = threading.Lock()
+		self.httpd = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+		self.httpd.daemon_threads = True
+		self._thread = None
+
+	@property
+	def url(self):
+		return f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+
+	def configure(self, **faults):
+		self.faults = dict(DEFAULT_FAULTS, **faults)
+		with self._lock:
+			self.stats = {'requests': 0, 'errors': 0}
+
+	def start(self):
+		self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+		self._thread.start()
+		return self
+
+	def stop(self):
+		self.httpd.shutdown()
+		self.httpd.server_close()
+
+	def _decide(self):
+		"""Return the error status or None, and the latency of one request"""
+		faults = self.faults
+		with self._lock:
+			self.stats['requests'] += 1
+			failed = faults['down'] or random.random() < faults['error_rate']
+			if failed:
+				self.stats['errors'] += 1
+		latency = faults['latency'] + random.uniform(0, faults['jitter'])
+		if random.random() < faults['slow_rate']:
+			latency += faults['slow_latency']
+		return (faults['error_status'] if failed else None), latency
+
+	def _handler(self):
+		server = self
+
+		class Handler(BaseHTTPRequestHandler):
+			protocol_version = 'HTTP/1.1'
+			# Headers and body are separate writes, avoid the delayed ACK
+			disable_nagle_algorithm = True
+
+			def log_message(self, format, *args):
+				pass
+
+			def _send(self, status, content_type, body):
+				self.send_response(status)
+				self.send_header('Content-Type', content_type)
+				self.send_header('Content-Length', str(len(body)))
+				self.end_headers()
+				self.wfile.write(body)
+
+			def do_POST(self):
+				payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+				if not self.path.endswith('/chat/completions'):
+					self._send(404, 'application/json', b'{"error": "not found"}')
+					return
+				status, latency = server._decide()
+				try:
+					time.sleep(latency)
+					if status is not None:
+						self._send(status, 'application/json', json.dumps({'error': {'message': 'injected error'}}).encode('utf-8'))
+						return
+					prompt = payload['messages'][-1]['content']
+					answer = server.answers._answer(prompt, 'response_format' in payload)
+					usage = {'prompt_tokens': len(prompt) // 4, 'completion_tokens': len(answer) // 4}
+					if payload.get('stream'):
+						self._stream(answer, usage)
+					else:
+						body = {'choices': [{'message': {'role': 'assistant', 'content': answer}}], 'usage': usage}
+						self._send(200, 'application/json', json.dumps(body).encode('utf-8'))
+				except (BrokenPipeError, ConnectionResetError):
+					# The client gave up, e.g. after its attempt timeout
+					pass
+
+			def _stream(self, answer, usage):
+				events = [{'choices': [{'delta': {'content': piece}}]} for piece in server.answers._pieces(answer)]
+				events.append({'choices': [], 'usage': usage})
+				body = ''.join(f"data: {json.dumps(event)}\n\n" for event in events) + 'data: [DONE]\n\n'
+				self._send(200, 'text/event-stream', body.encode('utf-8'))
+
+		return Handler
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--port', type=int, default=8080)
+	parser.add_argument('--latency', type=float, default=0.0, help='seconds per answer (default: 0)')
+	parser.add_argument('--jitter', type=float, default=0.0, help='up to this many seconds on top (default: 0)')
+	parser.add_argument('--slow-rate', type=float, default=0.0, help='share of slow answers (default: 0)')
+	parser.add_argument('--slow-latency', type=float, default=1.0, help='extra seconds of a slow answer (default: 1)')
+	parser.add_argument('--error-rate', type=float, default=0.0, help='share of failed requests (default: 0)')
+	parser.add_argument('--error-status', type=int, default=503, help='HTTP status of a failed request (default: 503)')
+	parser.add_argument('--down', action='store_true', help='fail every request')
+	args = parser.parse_args()
+
+	server = FakeLLMServer(
+		args.port, latency=args.latency, jitter=args.jitter, slow_rate=args.slow_rate, slow_latency=args.slow_latency,
+		error_rate=args.error_rate, error_status=args.error_status, down=args.down
+	)
+	print(f"Fake LLM API on {server.url}")
+	try:
+		server.httpd.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.httpd.server_close()
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Load test and benchmark for the HTTP endpoints
+
+  python bench/load.py                   all scenarios in-process (falcon.testing) and over a socket
+  python bench/load.py --mode in-process only drive the app in-process
+  python bench/load.py --check           also compare with bench/thresholds.json, exit with status 1 on a regression
+
+The generation runs against the fake LLM backend with --latency seconds per
+call, so only our own overhead is measured. The search scenario queries the
+library that the generate scenario filled. The thresholds assume the
+defaults for --requests, --concurrency and --latency.
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+import http.client
+import socket
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+APP = os.path.join(ROOT_DIR, 'meinantrag.py')
+THRESHOLDS = os.path.join(BENCH_DIR, 'thresholds.json')
+
+FORM = {'Content-Type': 'application/x-www-form-urlencoded'}
+LONG_DEMAND = '\n'.join(f"{i}. Die Stadtverwaltung prüft Maßnahme {i} & berichtet dem Gemeinderat." for i in range(1, 31))
+LONG_JUSTIFICATION = '\n'.join(
+	f"Absatz {i}: Die Stadtverwaltung & der Gemeinderat <prüfen> \"Maßnahmen\" für eine bessere Anbindung der Höhenstadtteile."
+	for i in range(200)
+)
+
+# name: (method, path, headers, body for request i)
+SCENARIOS = {
+	'page': ('GET', '/', {'Accept-Encoding': 'gzip, br'}, None),
+	'static': ('GET', '/static/css/bootstrap.min.css', {}, None),
+	'generate': ('POST', '/api/generate-antrag', FORM, lambda i: urlencode({
+		'anliegen': f"Mehr Bäume und Schatten auf dem Marktplatz, Variante {i}",
+		'party_id': 'SPD'
+	})),
+	'word': ('POST', '/api/generate-word', FORM, lambda i: urlencode({
+		'title': f"Bessere Anbindung der Höhenstadtteile {i}",
+		'demand': LONG_DEMAND,
+		'justification': LONG_JUSTIFICATION,
+		'party_name': 'SPD'
+	})),
+	# The library is filled by the generate scenario
+	'search': ('GET', '/api/library/search?' + urlencode({'q': 'Mehr Bäume und Schatten auf dem Marktplatz'}), {}, None),
+}
+
+def app_env(latency):
+	env = dict(os.environ)
+	env.update({
+		'MEINANTRAG_LLM_BACKEND': 'fake',
+		'MEINANTRAG_FAKE_LATENCY': str(latency),
+		# Every request has to reach the backend
+		'MEINANTRAG_CACHE_SIZE': '0',
+		'MEINANTRAG_CACHE_DB': '',
+		'MEINANTRAG_MAX_CONCURRENT': '256',
+		'MEINANTRAG_QUEUE_SIZE': '1024',
+		'MEINANTRAG_PRELOAD': '1',
+		'MEINANTRAG_LIBRARY_DB': os.path.join(tempfile.mkdtemp(prefix='meinantrag-bench-'), 'library.db'),
+		# All requests come from one client
+		'MEINANTRAG_RATE_LIMIT_GENERATE': '0',
+		'MEINANTRAG_RATE_LIMIT_WORD': '0',
+		'MEINANTRAG_RATE_LIMIT_SEARCH': '0',
+	})
+	return env
+
+def percentiles(samples):
+	if len(samples) < 2:
+		samples = samples * 2
+	cuts = statistics.quantiles(samples, n=100)
+	return cuts[49], cuts[94], cuts[98]
+
+def run(send, name, requests, concurrency):
+	"""Send requests with a pool of concurrency threads, returns latencies and wall time"""
+	method, path, headers, body = SCENARIOS[name]
+
+	def one(i):
+		start = time.perf_counter()
+		status = send(method, path, headers, body(i) if body else None)
+		if status != 200:
+			raise RuntimeError(f"{name}: {method} {path} answered {status}")
+		return time.perf_counter() - start
+
+	for i in range(min(3, requests)):
+		one(-1 - i)
+	start = time.perf_counter()
+	if concurrency <= 1:
+		latencies = [one(i) for i in range(requests)]
+	else:
+		with ThreadPoolExecutor(max_workers=concurrency) as pool:
+			latencies = list(pool.map(one, range(requests)))
+	return latencies, time.perf_counter() - start
+
+def allocations(send, name, requests=20):
+	"""Average peak of traced allocations per request in KB"""
+	method, path, headers, body = SCENARIOS[name]
+	tracemalloc.start()
+	try:
+		peaks = []
+		for i in range(requests):
+			tracemalloc.reset_peak() if hasattr(tracemalloc, 'reset_peak') else None
+			base = tracemalloc.get_traced_memory()[0]
+			send(method, path, headers, body(i) if body else None)
+			peaks.append(tracemalloc.get_traced_memory()[1] - base)
+	finally:
+		tracemalloc.stop()
+	return statistics.mean(peaks) / 1024
+
+def self_rss_mb():
+	# ru_maxrss is in KB on Linux
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def process_rss_mb(pid):
+	try:
+		with open(f'/proc/{pid}/status') as status:
+			for line in status:
+				if line.startswith('VmRSS:'):
+					return int(line.split()[1]) / 1024
+	except OSError:
+		pass
+	return None
+
+def in_process(args):
+	os.environ.update(app_env(args.latency))
+	sys.path.insert(0, ROOT_DIR)
+	import meinantrag
+	from falcon import testing
+
+	client = testing.TestClient(meinantrag.app)
+
+	def send(method, path, headers, body):
+		return client.simulate_request(method, path, headers=headers, body=body).status_code
+
+	results = {}
+	for name in args.scenarios:
+		latencies, wall = run(send, name, args.requests, args.concurrency)
+		results[name] = summarize(latencies, wall)
+		results[name]['alloc_kb'] = round(allocations(send, name), 1)
+		results[name]['rss_mb'] = round(self_rss_mb(), 1)
+	return results
+
+def free_port():
+	with socket.socket() as sock:
+		sock.bind(('127.0.0.1', 0))
+		return sock.getsockname()[1]
+
+def over_socket(args):
+	port = free_port()
+	command = [sys.executable, APP, '--host', '127.0.0.1', '--port', str(port)]
+	if args.asgi:
+		command.append('--asgi')
+	server = subprocess.Popen(command, cwd=ROOT_DIR, env=app_env(args.latency), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+	local = threading.local()
+
+	def send(method, path, headers, body):
+		# One keep-alive connection per client thread, reopened when the server closes it
+		for attempt in range(2):
+			connection = getattr(local, 'connection', None)
+			if connection is None:
+				connection = local.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+			try:
+				connection.request(method, path, body=body, headers=headers)
+				response = connection.getresponse()
+				response.read()
+				if response.getheader('Connection', '').lower() == 'close' or response.version == 10:
+					connection.close()
+					local.connection = None
+				return response.status
+			except (http.client.HTTPException, OSError):
+				connection.close()
+				local.connection = None
+				if attempt:
+					raise
+
+	try:
+		deadline = time.monotonic() + 30
+		while True:
+			try:
+				send('GET', '/robots.txt', {}, None)
+				break
+			except OSError:
+				if server.poll() is not None or time.monotonic() > deadline:
+					raise RuntimeError('server did not start')
+				time.sleep(0.05)
+		results = {}
+		for name in args.scenarios:
+			latencies, wall = run(send, name, args.requests, args.concurrency)
+			results[name] = summarize(latencies, wall)
+			rss = process_rss_mb(server.pid)
+			results[name]['rss_mb'] = round(rss, 1) if rss is not None else None
+		return results
+	finally:
+		server.terminate()
+		server.wait()
+
+def summarize(latencies, wall):
+	p50, p95, p99 = percentiles(latencies)
+	return {
+		'requests': len(latencies),
+		'rps': round(len(latencies) / wall, 1),
+		'p50_ms': round(p50 * 1000, 2),
+		'p95_ms': round(p95 * 1000, 2),
+		'p99_ms': round(p99 * 1000, 2),
+	}
+
+def report(mode, results):
+	print(f"\n{mode}")
+	print(f"  {'scenario':<10} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'alloc KB':>9} {'RSS MB':>7}")
+	for name, result in results.items():
+		alloc = result.get('alloc_kb')
+		rss = result.get('rss_mb')
+		print(f"  {name:<10} {result['rps']:8.1f} {result['p50_ms']:8.2f} {result['p95_ms']:8.2f} {result['p99_ms']:8.2f} "
+			f"{alloc if alloc is not None else '-':>9} {rss if rss is not None else '-':>7}")
+
+def compare(mode, results):
+	"""Return the threshold violations of one mode"""
+	with open(THRESHOLDS) as f:
+		limits = json.load(f).get(mode, {})
+	failures = []
+	for name, result in results.items():
+		for metric, limit in limits.get(name, {}).items():
+			value = result.get(metric)
+			if value is None:
+				continue
+			# rps is a lower bound, everything else an upper bound
+			if (value < limit) if metric == 'rps' else (value > limit):
+				failures.append(f"{mode} {name} {metric} {value} (limit {limit})")
+	return failures
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--mode', choices=('all', 'in-process', 'socket'), default='all')
+	parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+	parser.add_argument('--requests', type=int, default=200, help='requests per scenario (default: 200)')
+	parser.add_argument('--concurrency', type=int, default=4, help='client threads (default: 4)')
+	parser.add_argument('--latency', type=float, default=0.05, help='fake LLM latency in seconds (default: 0.05)')
+	parser.add_argument('--asgi', action='store_true', help='run the socket benchmark against the ASGI app (needs uvicorn)')
+	parser.add_argument('--check', action='store_true', help='compare with bench/thresholds.json')
+	parser.add_argument('--json', action='store_true', help='print the results as JSON')
+	args = parser.parse_args()
+
+	results = {}
+	# The socket run goes first, the in-process run imports the app into this interpreter
+	if args.mode in ('all', 'socket'):
+		results['socket-asgi' if args.asgi else 'socket'] = over_socket(args)
+	if args.mode in ('all', 'in-process'):
+		results['in-process'] = in_process(args)
+
+	if args.json:
+		print(json.dumps(results, indent=2))
+	else:
+		for mode, mode_results in results.items():
+			report(mode, mode_results)
+
+	if not args.check:
+		return 0
+	failures = [failure for mode, mode_results in results.items() for failure in compare(mode, mode_results)]
+	for failure in failures:
+		print(f"FAIL {failure}")
+	return 1 if failures else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Golden-corpus check and micro-benchmark for the Gemini response parser
+
+  python bench/parser.py                  check against the golden corpus, then benchmark
+  python bench/parser.py --check          only check against the golden corpus
+  python bench/parser.py --update-golden  regenerate corpus/golden.json from the current parser
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import timeit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.path.join(BENCH_DIR, 'corpus')
+GOLDEN_PATH = os.path.join(CORPUS_DIR, 'golden.json')
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import meinantrag
+
+# The original implementation, kept as the baseline for the benchmark
+def legacy_remove_markdown(text):
+	if not text:
+		return text
+	text = re.sub(r'\*\*(.+?)\*\*', r'\1', text)
+	text = re.sub(r'\*(.+?)\*', r'\1', text)
+	text = re.sub(r'__(.+?)__', r'\1', text)
+	text = re.sub(r'_(.+?)_', r'\1', text)
+	text = re.sub(r'^/\s*', '', text, flags=re.MULTILINE)
+	text = re.sub(r'^#+\s*', '', text, flags=re.MULTILINE)
+	text = re.sub(r'`(.+?)`', r'\1', text)
+	text = re.sub(r'\[(.+?)\]\(.+?\)', r'\1', text)
+	return text.strip()
+
+def legacy_parse_gemini_response(text):
+	text = legacy_remove_markdown(text)
+	parts = re.split(r'(begründung|sachverhalt|begründung/sachverhalt)', text, maxsplit=1, flags=re.IGNORECASE)
+	if len(parts) >= 3:
+		before_justification = parts[0].strip()
+		justification = parts[2].strip() if len(parts) > 2 else ""
+		justification = re.sub(r'^(begründung\s*/?\s*sachverhalt|sachverhalt|begründung)\s*:?\s*\n?', '', justification, flags=re.IGNORECASE).strip()
+	else:
+		paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
+		if len(paragraphs) >= 3:
+			before_justification = '\n\n'.join(paragraphs[:-1])
+			justification = paragraphs[-1]
+			justification = re.sub(r'^(begründung\s*/?\s*sachverhalt|sachverhalt|begründung)\s*:?\s*\n?', '', justification, flags=re.IGNORECASE).strip()
+		else:
+			before_justification = text
+			justification = ""
+	title_match = re.match(r'^(.+?)(?:\n\n|\n|$)', before_justification)
+	if title_match:
+		title = title_match.group(1).strip()
+		demand = before_justification[len(title):].strip()
+	else:
+		lines = before_justification.split('\n', 1)
+		title = lines[0].strip()
+		demand = lines[1].strip() if len(lines) > 1 else ""
+	if demand.startswith(title):
+		demand = demand[len(title):].strip()
+	title = legacy_remove_markdown(title)
+	demand = legacy_remove_markdown(demand)
+	justification = legacy_remove_markdown(justification)
+	justification = re.sub(r'^(begründung\s*/?\s*sachverhalt|sachverhalt|begründung)\s*:?\s*\n?\s*', '', justification, flags=re.IGNORECASE).strip()
+	return {'title': title, 'demand': demand, 'justification': justification}
+
+def load_corpus():
+	corpus = {}
+	for name in sorted(os.listdir(CORPUS_DIR)):
+		if name.endswith('.txt'):
+			with open(os.path.join(CORPUS_DIR, name), encoding='utf-8') as f:
+				corpus[name] = f.read()
+	return corpus
+
+def check(corpus):
+	"""Compare the current parser with the golden output, returns the number of mismatches"""
+	with open(GOLDEN_PATH, encoding='utf-8') as f:
+		golden = json.load(f)
+	failures = 0
+	for name, text in corpus.items():
+		result = meinantrag.parse_gemini_response(text)
+		if result != golden.get(name):
+			failures += 1
+			print(f"MISMATCH {name}")
+			print(f"  expected: {golden.get(name)!r}")
+			print(f"  actual:   {result!r}")
+	print(f"golden corpus: {len(corpus) - failures}/{len(corpus)} responses match")
+	return failures + fuzz()
+
+# Fragments that exercise the overlapping markdown and heading rules
+FUZZ_ALPHABET = ['*', '**', '_', '__', '/', '#', '`', '[', ']', '(', ')', '\n', '\n\n', ' ', '\t', ':',
+	'a', 'x', '/ ', '# ', 'Begründung', 'Sachverhalt', 'begründung/sachverhalt']
+
+def fuzz(cases=20000, seed=1):
+	"""Differential test of the current parser against the legacy implementation"""
+	rng = random.Random(seed)
+	failures = 0
+	for _ in range(cases):
+		text = ''.join(rng.choice(FUZZ_ALPHABET) for _ in range(rng.randint(0, 25)))
+		if meinantrag.parse_gemini_response(text) != legacy_parse_gemini_response(text):
+			failures += 1
+			if failures <= 5:
+				print(f"MISMATCH fuzz {text!r}")
+	print(f"fuzz: {cases - failures}/{cases} random inputs match the legacy parser")
+	return failures
+
+def long_response(corpus, size, markdown):
+	"""Build a realistic response of roughly size bytes from corpus paragraphs"""
+	paragraphs = [p for text in corpus.values() for p in text.split('\n\n')[1:] if p.strip()]
+	if not markdown:
+		paragraphs = [p for p in paragraphs if p == legacy_remove_markdown(p)]
+	title = 'Nachtabsenkung der öffentlichen Straßenbeleuchtung'
+	demand, justification = [], []
+	i = 0
+	while len('\n\n'.join(demand + justification).encode('utf-8')) < size:
+		(demand if i % 3 == 0 else justification).append(paragraphs[i % len(paragraphs)])
+		i += 1
+	return f"{title}\n\n" + '\n\n'.join(demand) + "\n\nBegründung/Sachverhalt:\n" + '\n\n'.join(justification)
+
+def benchmark(corpus):
+	print(f"{'input':>9} {'size':>8} {'legacy':>12} {'current':>12} {'speedup':>8} {'one pass':>12}")
+	for markdown, size in [(m, s) for m in (False, True) for s in (2048, 8192, 32768, 131072)]:
+		text = long_response(corpus, size, markdown)
+		assert meinantrag.parse_gemini_response(text) == legacy_parse_gemini_response(text)
+		number = max(10, 200000 // size)
+		legacy = min(timeit.repeat(lambda: legacy_parse_gemini_response(text), number=number, repeat=5)) / number
+		current = min(timeit.repeat(lambda: meinantrag.parse_gemini_response(text), number=number, repeat=5)) / number
+		# A single remove_markdown over the response, the floor for a one pass parser
+		one_pass = min(timeit.repeat(lambda: meinantrag.remove_markdown(text), number=number, repeat=5)) / number
+		print(f"{'markdown' if markdown else 'plain':>9} {len(text.encode('utf-8')):>8} {legacy * 1e6:>10.1f}us {current * 1e6:>10.1f}us {legacy / current:>7.2f}x {one_pass * 1e6:>10.1f}us")
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--check', action='store_true', help='only run the golden corpus check')
+	parser.add_argument('--update-golden', action='store_true', help='regenerate the golden output')
+	args = parser.parse_args()
+	
+	corpus = load_corpus()
+	if args.update_golden:
+		golden = {name: meinantrag.parse_gemini_response(text) for name, text in corpus.items()}
+		with open(GOLDEN_PATH, 'w', encoding='utf-8') as f:
+			json.dump(golden, f, ensure_ascii=False, indent=1, sort_keys=True)
+			f.write('\n')
+		print(f"wrote {GOLDEN_PATH}")
+		return 0
+	
+	failures = check(corpus)
+	if args.check or failures:
+		return 1 if failures else 0
+	benchmark(corpus)
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Resilience test of the LLM client layer against bench/fakellm.py
+
+  python bench/resilience.py          all scenarios
+  python bench/resilience.py --check  exit with status 1 if a scenario misses its expectation
+
+Every scenario wraps OpenAICompatibleBackend in a fresh ResilientBackend and
+CircuitBreaker and sends --calls calls with --concurrency threads:
+
+  errors   20 % of the requests fail with 503, with and without retries
+  tail     3 % of the answers take a second longer, with and without hedging
+  timeout  the server hangs, every call has to end at its deadline
+  outage   the server is down, the circuit breaker has to fail fast and recover
+  probe    a stream that times out as the half-open probe must not keep the circuit open
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fakellm import FakeLLMServer
+
+import meinantrag
+
+def client(server, retries=2, attempt_timeout=5.0, hedge=False, threshold=10, reset=30.0):
+	upstream = meinantrag.OpenAICompatibleBackend('fake', server.url)
+	breaker = meinantrag.CircuitBreaker(threshold, reset)
+	return meinantrag.ResilientBackend(upstream, breaker, retries=retries, attempt_timeout=attempt_timeout, hedge=hedge)
+
+def call(backend, i, timeout=None):
+	"""Return the outcome and the duration of one call"""
+	start = time.perf_counter()
+	try:
+		backend.generate(meinantrag.PROMPTS['antrag'].render(f"Mehr Bäume auf dem Marktplatz, Variante {i}"), timeout=timeout)
+		outcome = 'ok'
+	except meinantrag.CircuitOpenError:
+		outcome = 'circuit'
+	except meinantrag.GenerationTimeoutError:
+		outcome = 'timeout'
+	except Exception:
+		outcome = 'error'
+	return outcome, time.perf_counter() - start
+
+def run(backend, calls, concurrency, timeout=None, offset=0):
+	with ThreadPoolExecutor(max_workers=concurrency) as pool:
+		return list(pool.map(lambda i: call(backend, i, timeout), range(offset, offset + calls)))
+
+def summarize(label, results, server):
+	durations = sorted(duration for _, duration in results)
+	cuts = statistics.quantiles(durations, n=100) if len(durations) > 1 else durations * 99
+	outcomes = {}
+	for outcome, _ in results:
+		outcomes[outcome] = outcomes.get(outcome, 0) + 1
+	return {
+		'label': label,
+		'ok': outcomes.get('ok', 0) / len(results),
+		'outcomes': outcomes,
+		'p50_ms': cuts[49] * 1000,
+		'p95_ms': cuts[94] * 1000,
+		'p99_ms': cuts[98] * 1000,
+		'max_ms': durations[-1] * 1000,
+		'upstream': server.stats['requests'],
+	}
+
+def errors(server, args):
+	rows = []
+	for retries in (0, 2):
+		server.configure(latency=0.01, error_rate=0.2)
+		results = run(client(server, retries=retries), args.calls, args.concurrency)
+		rows.append(summarize(f"errors retries={retries}", results, server))
+	# 0.2 ** 3 of the calls fail three times in a row
+	failures = [] if rows[1]['ok'] >= 0.97 else [f"errors: only {rows[1]['ok']:.1%} succeeded with retries"]
+	return rows, failures
+
+def tail(server, args):
+	rows = []
+	for hedge in (False, True):
+		server.configure(latency=0.02, jitter=0.01, slow_rate=0.03, slow_latency=1.0)
+		backend = client(server, hedge=hedge)
+		# Recent latencies for the p95 before hedging starts
+		run(backend, 40, args.concurrency, offset=-40)
+		server.configure(latency=0.02, jitter=0.01, slow_rate=0.03, slow_latency=1.0)
+		results = run(backend, args.calls, args.concurrency)
+		rows.append(summarize(f"tail hedge={'on' if hedge else 'off'}", results, server))
+	plain, hedged = rows
+	failures = []
+	if hedged['ok'] < 1:
+		failures.append(f"tail: {hedged['outcomes']} with hedging")
+	if hedged['p99_ms'] > plain['p99_ms'] / 2:
+		failures.append(f"tail: hedging only lowered p99 from {plain['p99_ms']:.0f} to {hedged['p99_ms']:.0f} ms")
+	return rows, failures
+
+def timeout(server, args):
+	deadline = 1.0
+	server.configure(latency=5.0)
+	# Enough retries that the deadline ends every call, not the last attempt
+	results = run(client(server, retries=10, attempt_timeout=0.3, threshold=1000), 8, args.concurrency, timeout=deadline)
+	row = summarize(f"timeout deadline={deadline:g}s", results, server)
+	failures = []
+	if row['outcomes'] != {'timeout': 8}:
+		failures.append(f"timeout: {row['outcomes']}, expected only timeouts")
+	if row['max_ms'] > (deadline + 0.3) * 1000:
+		failures.append(f"timeout: a call took {row['max_ms']:.0f} ms with a deadline of {deadline:g} s")
+	return [row], failures
+
+def outage(server, args):
+	threshold, reset = 10, 0.5
+	server.configure(latency=0.01, down=True)
+	backend = client(server, retries=2, threshold=threshold, reset=reset)
+	results = run(backend, args.calls, 1)
+	row = summarize('outage', results, server)
+	failures = []
+	# A call that saw the circuit open may have started its last attempt before
+	if row['upstream'] > threshold + 2:
+		failures.append(f"outage: {row['upstream']} upstream requests with an open circuit after {threshold} failures")
+	rejected = sorted(duration for outcome, duration in results if outcome == 'circuit')
+	if not rejected or statistics.median(rejected) > 0.005:
+		failures.append('outage: calls were not rejected right away')
+	server.configure(latency=0.01)
+	time.sleep(reset)
+	recovered = run(backend, 10, 1)
+	recovered_row = summarize('outage recovered', recovered, server)
+	if recovered_row['ok'] < 1 or backend.breaker.state != 'closed':
+		failures.append(f"outage: {recovered_row['outcomes']} after the upstream recovered, circuit {backend.breaker.state}")
+	return [row, recovered_row], failures
+
+def stream(backend, timeout):
+	return list(backend.stream(meinantrag.PROMPTS['antrag'].render('Mehr Bäume auf dem Marktplatz'), timeout=timeout))
+
+def stream_async(backend, timeout):
+	async def consume():
+		return [piece async for piece in backend.stream_async(meinantrag.PROMPTS['antrag'].render('Mehr Bäume auf dem Marktplatz'), timeout=timeout)]
+	return asyncio.run(consume())
+
+def probe(server, args):
+	reset = 0.05
+	rows = []
+	failures = []
+	for consume in (stream, stream_async):
+		server.configure(latency=0.01, down=True)
+		backend = client(server, retries=0, threshold=1, reset=reset)
+		run(backend, 1, 1)
+		server.configure(latency=0.01)
+		time.sleep(reset)
+		# The deadline is over before the probe reaches the upstream
+		try:
+			consume(backend, 1e-9)
+			failures.append(f"probe: {consume.__name__} did not time out")
+		except meinantrag.GenerationTimeoutError:
+			pass
+		row = summarize(f"probe {consume.__name__}", run(backend, 10, 1), server)
+		rows.append(row)
+		if row['ok'] < 1 or backend.breaker.state != 'closed':
+			failures.append(f"probe: {row['outcomes']} after a timed out {consume.__name__} probe, circuit {backend.breaker.state}")
+	return rows, failures
+
+SCENARIOS = {'errors': errors, 'tail': tail, 'timeout': timeout, 'outage': outage, 'probe': probe}
+
+def report(rows):
+	print(f"  {'scenario':<22} {'ok':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'upstream':>9}  outcomes")
+	for row in rows:
+		outcomes = ', '.join(f"{name} {count}" for name, count in sorted(row['outcomes'].items()))
+		print(f"  {row['label']:<22} {row['ok']:7.1%} {row['p50_ms']:8.1f} {row['p95_ms']:8.1f} {row['p99_ms']:8.1f} "
+			f"{row['max_ms']:8.1f} {row['upstream']:>9}  {outcomes}")
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+	parser.add_argument('--calls', type=int, default=200, help='calls per scenario (default: 200)')
+	parser.add_argument('--concurrency', type=int, default=4, help='client threads (default: 4)')
+	parser.add_argument('--check', action='store_true', help='exit with status 1 if a scenario misses its expectation')
+	args = parser.parse_args()
+
+	server = FakeLLMServer().start()
+	rows = []
+	failures = []
+	try:
+		for name in args.scenarios:
+			scenario_rows, scenario_failures = SCENARIOS[name](server, args)
+			rows.extend(scenario_rows)
+			failures.extend(scenario_failures)
+	finally:
+		server.stop()
+	report(rows)
+
+	if not args.check:
+		return 0
+	for failure in failures:
+		print(f"FAIL {failure}")
+	return 1 if failures else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
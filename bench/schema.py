@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Build the structured-output requests of the LLM backends with the real client libraries
+
+  python bench/schema.py          print what was checked
+  python bench/schema.py --check  exit with status 1 if a request cannot be built
+
+Nothing is sent. The Gemini SDK validates the response schema while it
+builds the request, so a key it does not know (e.g. propertyOrdering) fails
+here instead of in every structured generation. Backends whose library is
+not installed are skipped.
+
+The responses check feeds structured answers that fail the schema to the
+WSGI and the ASGI generation: the valid fields have to be kept and only
+the rest generated again, no JSON syntax may reach the result.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import warnings
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+import meinantrag
+
+def gemini():
+	with warnings.catch_warnings():
+		# The package warns that it is deprecated
+		warnings.simplefilter('ignore')
+		try:
+			import google.generativeai
+		except ImportError:
+			return None
+		backend = meinantrag.GeminiBackend('gemini-3-pro-preview', 'not-a-key')
+		kwargs = backend._kwargs(True, None)
+		# The same conversion generate_content() does before sending
+		request = backend.client._prepare_request(contents='Anliegen: Test', generation_config=kwargs['generation_config'], tools=None, tool_config=None)
+	schema = request.generation_config.response_schema
+	missing = set(meinantrag.STRUCTURED_FIELDS) - set(schema.properties)
+	if missing:
+		raise ValueError(f"fields missing in the schema sent to Gemini: {', '.join(sorted(missing))}")
+	return f"{len(schema.properties)} properties, {len(schema.required)} required"
+
+def openai():
+	try:
+		import requests
+	except ImportError:
+		return None
+	payload = meinantrag.OpenAICompatibleBackend('default', 'http://127.0.0.1:8080/v1')._payload('Anliegen: Test', True)
+	schema = json.loads(json.dumps(payload))['response_format']['json_schema']['schema']
+	# Strict mode needs every property required and no additional properties
+	if set(schema['required']) != set(schema['properties']) or schema.get('additionalProperties') is not False:
+		raise ValueError('schema is not valid for strict mode')
+	return f"{len(schema['properties'])} properties, strict"
+
+class SchemaInvalidBackend(meinantrag.FakeBackend):
+	"""Answers structured prompts with a fixed response instead of valid JSON"""
+	
+	def __init__(self, response):
+		super().__init__()
+		self.response = response
+		self.prompts = []
+	
+	def _answer(self, prompt, structured):
+		self.prompts.append('structured' if structured else prompt.split('\n', 1)[0])
+		return self.response if structured else super()._answer(prompt, structured)
+
+RESPONSES = {
+	# Fields that pass are kept, the empty e-mail is generated with the e-mail prompt
+	'empty e-mail': ('{"title": "Radwege", "demand": "Die Stadt baut Radwege.", "justification": "Mehr Sicherheit.", "email_body": ""}', 'Radwege', 2),
+	# Nothing usable, the Antrag comes from the text prompt as well
+	'no demand': ('{"title": "Radwege", "demand": 3, "justification": "", "email_body": ""}', None, 3),
+	'not json': ('Radwege\n\nDie Stadt baut Radwege.', None, 3),
+}
+
+def responses():
+	for resource_class, run in ((meinantrag.GenerateAntragResource, lambda generator, *args: generator._run_structured(*args)),
+			(meinantrag.AsyncGenerateAntragResource, lambda generator, *args: asyncio.run(generator._run_structured_async(*args)))):
+		for name, (response, title, calls) in RESPONSES.items():
+			generator = resource_class()
+			generator._backend = generator._draft_backend = backend = SchemaInvalidBackend(response)
+			result, fallback = run(generator, 'Mehr sichere Radwege in der Innenstadt', None, '')
+			label = f"{resource_class.__name__} {name}"
+			if any(mark in value for value in result.values() for mark in ('{', '"email_body"')):
+				raise ValueError(f"{label}: JSON in the result {result!r}")
+			if not all(result.values()) or fallback:
+				raise ValueError(f"{label}: incomplete result {result!r}")
+			if title is not None and result['title'] != title:
+				raise ValueError(f"{label}: valid title {title!r} was not kept, got {result['title']!r}")
+			if len(backend.prompts) != calls:
+				raise ValueError(f"{label}: {len(backend.prompts)} LLM calls, expected {calls}")
+	return f"{len(RESPONSES)} schema-invalid responses, WSGI and ASGI"
+
+CHECKS = {'gemini': gemini, 'openai': openai, 'responses': responses}
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--check', action='store_true', help='exit with status 1 if a request cannot be built')
+	args = parser.parse_args()
+
+	failures = []
+	for name, build in CHECKS.items():
+		try:
+			result = build()
+		except Exception as e:
+			failures.append(f"{name}: {e!r}")
+			print(f"  {name:<10} FAIL {e!r}")
+			continue
+		print(f"  {name:<10} {'skipped, library not installed' if result is None else 'ok, ' + result}")
+
+	if not args.check:
+		return 0
+	for failure in failures:
+		print(f"FAIL {failure}")
+	return 1 if failures else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the WSGI module
+
+  python bench/startup.py                      import profile, in-process and socket time to first response
+  python bench/startup.py --max-import-ms 400  exit with status 1 if a median exceeds its threshold
+
+Every measurement runs in a fresh interpreter, so nothing is shared with a
+previous run apart from the OS file cache and the Jinja2 bytecode cache.
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+APP = os.path.join(ROOT_DIR, 'meinantrag.py')
+
+# Dependencies that must not be imported together with the module
+LAZY_MODULES = ('google.generativeai', 'docx', 'jinja2', 'requests')
+
+IN_PROCESS = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+import meinantrag
+imported = time.perf_counter()
+eager = [name for name in {lazy!r} if name in sys.modules and not {preload!r}]
+from falcon import testing
+client = testing.TestClient(meinantrag.app)
+assert client.simulate_get('/').status_code == 200
+first_page = time.perf_counter()
+client.simulate_post('/api/generate-word', params={{'title': 'T', 'demand': 'D', 'justification': 'J', 'party_name': 'P'}})
+first_word = time.perf_counter()
+print(json.dumps({{
+	'import': imported - start,
+	'first_page': first_page - start,
+	'first_word': first_word - first_page,
+	'eager': eager
+}}))
+"""
+
+def child_env(preload):
+	env = dict(os.environ)
+	env.pop('GOOGLE_GEMINI_API_KEY', None)
+	env['MEINANTRAG_PRELOAD'] = '1' if preload else '0'
+	return env
+
+def import_profile(preload):
+	"""Cumulative import time of meinantrag and its heaviest top-level imports in ms"""
+	result = subprocess.run(
+		[sys.executable, '-X', 'importtime', '-c', 'import meinantrag'],
+		cwd=ROOT_DIR, env=child_env(preload), capture_output=True, text=True, check=True
+	)
+	total = None
+	packages = {}
+	for line in result.stderr.splitlines():
+		if not line.startswith('import time:') or '|' not in line:
+			continue
+		_, cumulative, name = line[len('import time:'):].split('|')
+		if not cumulative.strip().isdigit():
+			continue
+		depth = (len(name) - len(name.lstrip())) // 2
+		name = name.strip()
+		if name == 'meinantrag':
+			total = int(cumulative) / 1000
+		elif depth == 1:
+			packages[name] = packages.get(name, 0) + int(cumulative) / 1000
+	heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:8]
+	return total, heaviest
+
+def in_process(preload):
+	script = IN_PROCESS.format(root=ROOT_DIR, lazy=LAZY_MODULES, preload=preload)
+	result = subprocess.run([sys.executable, '-c', script], cwd=ROOT_DIR, env=child_env(preload), capture_output=True, text=True, check=True)
+	return json.loads(result.stdout.strip().splitlines()[-1])
+
+def free_port():
+	with socket.socket() as sock:
+		sock.bind(('127.0.0.1', 0))
+		return sock.getsockname()[1]
+
+def over_socket(preload, timeout=30):
+	"""Seconds from spawning the development server until it answers GET /"""
+	port = free_port()
+	start = time.perf_counter()
+	process = subprocess.Popen(
+		[sys.executable, APP, '--host', '127.0.0.1', '--port', str(port)],
+		cwd=ROOT_DIR, env=child_env(preload), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+	)
+	try:
+		while time.perf_counter() - start < timeout:
+			try:
+				with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=timeout) as response:
+					response.read()
+				return time.perf_counter() - start
+			except OSError:
+				if process.poll() is not None:
+					raise RuntimeError(f'server exited with status {process.returncode}')
+				time.sleep(0.005)
+		raise RuntimeError(f'server did not answer within {timeout} s')
+	finally:
+		process.terminate()
+		process.wait()
+
+def ms(seconds):
+	return seconds * 1000
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per measurement (default: 5)')
+	parser.add_argument('--preload', action='store_true', help='measure with MEINANTRAG_PRELOAD=1')
+	parser.add_argument('--max-import-ms', type=float, help='threshold for the median import time')
+	parser.add_argument('--max-first-response-ms', type=float, help='threshold for the median in-process time to first response')
+	parser.add_argument('--max-socket-ms', type=float, help='threshold for the median socket time to first response')
+	args = parser.parse_args()
+
+	total, heaviest = import_profile(args.preload)
+	print(f"python -X importtime: meinantrag {total:.1f} ms")
+	for name, cumulative in heaviest:
+		print(f"  {name:<30} {cumulative:8.1f} ms")
+
+	runs = [in_process(args.preload) for _ in range(args.runs)]
+	imports = statistics.median(run['import'] for run in runs)
+	first_page = statistics.median(run['first_page'] for run in runs)
+	first_word = statistics.median(run['first_word'] for run in runs)
+	print(f"import:                 {ms(imports):8.1f} ms (median of {args.runs})")
+	print(f"first response (GET /): {ms(first_page):8.1f} ms")
+	print(f"first Word document:    {ms(first_word):8.1f} ms")
+
+	socket_times = [over_socket(args.preload) for _ in range(args.runs)]
+	socket_median = statistics.median(socket_times)
+	print(f"socket first response:  {ms(socket_median):8.1f} ms")
+
+	failures = []
+	eager = sorted(set(name for run in runs for name in run['eager']))
+	if eager:
+		failures.append(f"imported at module import: {', '.join(eager)}")
+	for label, value, limit in (
+		('import', imports, args.max_import_ms),
+		('first response', first_page, args.max_first_response_ms),
+		('socket first response', socket_median, args.max_socket_ms),
+	):
+		if limit is not None and ms(value) > limit:
+			failures.append(f"{label} {ms(value):.1f} ms exceeds {limit:.1f} ms")
+	for failure in failures:
+		print(f"FAIL {failure}")
+	return 1 if failures else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Equivalence check and benchmark for the precompiled Word template
+
+  python bench/word.py          check that the precompiled renderer matches python-docx, then benchmark
+  python bench/word.py --check  only run the equivalence check
+"""
+
+import argparse
+import os
+import sys
+import time
+import zipfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import meinantrag
+
+DATE = '17.10.2026'
+LONG_JUSTIFICATION = '\n'.join(
+	f"Absatz {i}: Die Stadtverwaltung & der Gemeinderat <prüfen> \"Maßnahmen\" für eine bessere Anbindung der Höhenstadtteile."
+	for i in range(200)
+)
+
+# (title, demand, justification, party_name), the last ones fall back to python-docx
+CASES = [
+	('Nachtabsenkung der Straßenbeleuchtung', 'Die Stadtverwaltung wird beauftragt, ein Konzept vorzulegen.', 'Klimaschutz.', 'SPD'),
+	('Titel mit & und <Klammern>', 'Zeile 1\n\nZeile 2\n- Punkt\n', 'Text', ''),
+	('Ohne Forderung', '', '', 'DIE LINKE'),
+	('Lange Begründung', 'a\n\n\nb\n', LONG_JUSTIFICATION, 'FDP/FW'),
+	('Umlaute „Anführungszeichen“', '  eingerückt  \nx', 'y\n', 'GRÜNEN'),
+	(' Leerzeichen am Anfang', 'a', 'b', 'SPD'),
+	('Tab\tim Titel', 'a\tb', 'b', 'SPD'),
+	('', 'Leerer Titel', 'b', 'SPD'),
+	('Windows-Zeilenenden', 'a\r\nb', 'b', 'Volt'),
+]
+
+def parts(buffer):
+	with zipfile.ZipFile(buffer) as package:
+		return [(info.filename, package.read(info)) for info in package.infolist()]
+
+def check(resource):
+	"""Compare every part of both renderers, returns the number of mismatches"""
+	failures = 0
+	for case in CASES:
+		fast = resource.compiled.render(*case, DATE)
+		if fast is None:
+			print(f"fallback  {case[0]!r}")
+			continue
+		if parts(fast) != parts(resource._render_document(*case, DATE)):
+			failures += 1
+			print(f"MISMATCH  {case[0]!r}")
+		else:
+			print(f"identical {case[0]!r}")
+	return failures
+
+def benchmark(resource, rounds=20):
+	case = ('Lange Begründung', 'Forderung\n' * 20, LONG_JUSTIFICATION, 'SPD')
+	for label, render in (('python-docx', resource._render_document), ('precompiled', resource.compiled.render)):
+		start = time.perf_counter()
+		for _ in range(rounds):
+			render(*case, DATE)
+		print(f"{label:>12}: {(time.perf_counter() - start) / rounds * 1000:7.2f} ms per document")
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--check', action='store_true', help='only run the equivalence check')
+	args = parser.parse_args()
+	
+	resource = meinantrag.GenerateWordResource()
+	if resource.compiled is None:
+		print('Word template could not be precompiled')
+		return 1
+	failures = check(resource)
+	if args.check or failures:
+		return 1 if failures else 0
+	benchmark(resource)
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -32,12 +32,18 @@
           google-generativeai # Dependency for Gemini API
           grpcio              # Required by google-generativeai
           python-docx          # Dependency for Word document generation
+          brotli               # Optional, brotli variants of the pre-rendered pages
+          uvicorn              # Optional, ASGI server for meinantrag --asgi
         ];
 
         installPhase = ''
           install -Dm755 ${./meinantrag.py} $out/bin/meinantrag
           mkdir -p $out/share/meinantrag
           cp -r ${./templates} $out/share/meinantrag/templates
+          cp -r ${./prompts} $out/share/meinantrag/prompts
+          # Precompile the Jinja2 templates, so workers start without compiling them
+          MEINANTRAG_TEMPLATES_DIR=$out/share/meinantrag/templates \
+            ${python3Packages.python.interpreter} ./meinantrag.py --compile-templates $out/share/meinantrag/templates-compiled
           # Provide a WSGI entry file for uWSGI to load
           install -Dm644 ${./meinantrag.py} $out/share/meinantrag/meinantrag_wsgi.py
           # Install built assets if present
@@ -1,6 +1,25 @@
+var crypto = require('crypto');
+var fs = require('fs');
+var path = require('path');
+var zlib = require('zlib');
 var gulp = require('gulp');
 var copy = require('gulp-copy');
 
+// Bundles loaded by templates/base.html, in load order. The inputs are
+// already minified builds, so they are only concatenated
+var BUNDLES = {
+  'app.css': [
+    './assets/css/pages.css',
+    './assets/css/select2.min.css',
+    './assets/css/select2-bootstrap-5-theme.min.css'
+  ],
+  'app.js': [
+    './assets/js/pages-jquery.js',
+    './assets/js/select2.min.js'
+  ]
+};
+var DIST_DIR = './assets/dist';
+
 // Copy bulk assets that already have css/js folder structure under dist
 gulp.task('copy-bulk', function () {
   return gulp
@@ -40,4 +59,30 @@ gulp.task('copy-favicon', function () {
 
 gulp.task('copy-assets', gulp.series('copy-bulk', 'copy-jquery', 'copy-select2-theme', 'copy-favicon'));
 
-gulp.task('default', gulp.series('copy-assets')); 
\ No newline at end of file
+// Content-hashed names, precompressed .gz and .br siblings and the manifest
+// that asset_url() in meinantrag.py resolves
+gulp.task('bundle', function (done) {
+  fs.rmSync(DIST_DIR, { recursive: true, force: true });
+  fs.mkdirSync(DIST_DIR, { recursive: true });
+  var manifest = {};
+  Object.keys(BUNDLES).forEach(function (name) {
+    var ext = path.extname(name);
+    // A script without trailing semicolon must not run into the next one
+    var separator = ext === '.js' ? ';\n' : '\n';
+    var body = Buffer.from(BUNDLES[name].map(function (file) {
+      return fs.readFileSync(file, 'utf8').replace(/\/[*/][#@] sourceMappingURL=\S+/g, '');
+    }).join(separator));
+    var hash = crypto.createHash('sha256').update(body).digest('hex').slice(0, 12);
+    var file = path.basename(name, ext) + '.' + hash + ext;
+    fs.writeFileSync(path.join(DIST_DIR, file), body);
+    fs.writeFileSync(path.join(DIST_DIR, file + '.gz'), zlib.gzipSync(body, { level: 9 }));
+    fs.writeFileSync(path.join(DIST_DIR, file + '.br'), zlib.brotliCompressSync(body, {
+      params: { [zlib.constants.BROTLI_PARAM_QUALITY]: zlib.constants.BROTLI_MAX_QUALITY }
+    }));
+    manifest[name] = 'dist/' + file;
+  });
+  fs.writeFileSync(path.join(DIST_DIR, 'manifest.json'), JSON.stringify(manifest, null, 2) + '\n');
+  done();
+});
+
+gulp.task('default', gulp.series('copy-assets', 'bundle'));
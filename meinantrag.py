@@ -5,96 +5,1620 @@ MeinAntrag - A web application to generate prefilled government requests
 
 import falcon
 import json
-import requests
 from urllib.parse import urlencode, parse_qs
 import os
 import sys
-from jinja2 import Environment, FileSystemLoader
-import google.generativeai as genai
 import re
 from io import BytesIO
-from datetime import datetime
+import zipfile
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future, TimeoutError as FutureTimeoutError, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
+import functools
+import math
+import mimetypes
+import multiprocessing
+import random
+import secrets
+import time
+import hashlib
+import itertools
+import ipaddress
+import sqlite3
+import struct
+import threading
+import unicodedata
+import gzip
+import zlib
+from collections import OrderedDict, deque
+from contextlib import closing, contextmanager, asynccontextmanager
 try:
-	from docx import Document
-	from docx.shared import Pt, Inches
-	from docx.enum.text import WD_ALIGN_PARAGRAPH
-	DOCX_AVAILABLE = True
+	import brotli
+	BROTLI_AVAILABLE = True
 except ImportError:
-	DOCX_AVAILABLE = False
+	BROTLI_AVAILABLE = False
+
+# google.generativeai, python-docx and jinja2 are imported on first use, they
+# make up most of the import time. MEINANTRAG_PRELOAD=1 loads everything at
+# import instead, so the uWSGI master does the work once before forking.
+PRELOAD = os.environ.get('MEINANTRAG_PRELOAD', '') not in ('', '0')
+
+_docx_document = None
+_docx_import_error = None
+
+def _import_docx():
+	"""Import python-docx on first use, returns docx.Document or None if not installed"""
+	global _docx_document, _docx_import_error
+	if _docx_document is None and _docx_import_error is None:
+		try:
+			from docx import Document
+			_docx_document = Document
+		except ImportError as e:
+			_docx_import_error = e
+	return _docx_document
+
+def docx_available():
+	return _import_docx() is not None
 
 SITE_BASE_URL = os.environ.get('MEINANTRAG_BASE_URL', 'http://localhost:8000')
 
-class BaseTemplateResource:
-	"""Base class for resources that need template rendering"""
-	
-	def _get_template_dir(self):
-		"""Get the template directory path, handling both development and installed environments"""
+# Pre-rendered pages are rebuilt when one of their templates changes (development only)
+DEV_RELOAD = os.environ.get('MEINANTRAG_DEV_RELOAD', '') not in ('', '0')
+PAGE_CACHE_CONTROL = f"public, max-age={int(os.environ.get('MEINANTRAG_PAGE_MAX_AGE', '300'))}"
+
+# Upper bound for a single Gemini call in seconds. Both calls of a request run
+# in parallel, so this has to stay well below the uWSGI harakiri of 60 s.
+LLM_TIMEOUT = float(os.environ.get('MEINANTRAG_LLM_TIMEOUT', '25'))
+
+# gemini, openai (any OpenAI-compatible server) or fake (offline, for load tests).
+# The e-mail is a short draft and can go to a faster model.
+LLM_BACKEND = os.environ.get('MEINANTRAG_LLM_BACKEND', 'gemini').strip().lower()
+LLM_MODEL = os.environ.get('MEINANTRAG_LLM_MODEL') or None
+LLM_DRAFT_MODEL = os.environ.get('MEINANTRAG_LLM_DRAFT_MODEL') or None
+LLM_BASE_URL = os.environ.get('MEINANTRAG_LLM_BASE_URL', 'http://localhost:8080/v1')
+FAKE_LATENCY = float(os.environ.get('MEINANTRAG_FAKE_LATENCY', '0'))
+
+# Shared, bounded pool for Gemini calls so a burst of requests cannot spawn
+# an unlimited number of threads
+LLM_WORKERS = int(os.environ.get('MEINANTRAG_LLM_WORKERS', '8'))
+LLM_EXECUTOR = ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix='meinantrag-llm')
+
+# Within LLM_TIMEOUT a single attempt gets at most LLM_ATTEMPT_TIMEOUT seconds,
+# transient errors (timeouts, 429, 5xx) are retried up to LLM_RETRIES times.
+# With LLM_HEDGE a second request is sent when the first one takes longer than
+# the p95 of recent calls. After LLM_CIRCUIT_THRESHOLD failed attempts in a
+# row, calls fail right away for LLM_CIRCUIT_RESET seconds.
+LLM_ATTEMPT_TIMEOUT = float(os.environ.get('MEINANTRAG_LLM_ATTEMPT_TIMEOUT', str(LLM_TIMEOUT)))
+LLM_RETRIES = int(os.environ.get('MEINANTRAG_LLM_RETRIES', '2'))
+LLM_HEDGE = os.environ.get('MEINANTRAG_LLM_HEDGE', '') not in ('', '0')
+LLM_CIRCUIT_THRESHOLD = int(os.environ.get('MEINANTRAG_LLM_CIRCUIT_THRESHOLD', '5'))
+LLM_CIRCUIT_RESET = float(os.environ.get('MEINANTRAG_LLM_CIRCUIT_RESET', '30'))
+
+# Request bodies: maximum size of a body in bytes, of a single field in
+# characters, and of the Anliegen, which ends up in the prompt
+MAX_BODY_SIZE = int(os.environ.get('MEINANTRAG_MAX_BODY_SIZE', str(2 * 1024 * 1024)))
+MAX_FIELD_SIZE = int(os.environ.get('MEINANTRAG_MAX_FIELD_SIZE', str(100000)))
+MAX_ANLIEGEN_LENGTH = int(os.environ.get('MEINANTRAG_MAX_ANLIEGEN_LENGTH', '5000'))
+
+# Rate limits per client as capacity/period: a client may send capacity
+# requests at once and then capacity per period seconds. 0 disables a group.
+def _rate_limit(name, default):
+	value = os.environ.get(f'MEINANTRAG_RATE_LIMIT_{name.upper()}', default).strip()
+	if value in ('', '0'):
+		return None
+	capacity, _, period = value.partition('/')
+	return int(capacity), float(period or 60)
+
+RATE_LIMITS = {
+	'generate': _rate_limit('generate', '10/600'),
+	'word': _rate_limit('word', '30/60'),
+	'batch': _rate_limit('batch', '5/60'),
+	'search': _rate_limit('search', '120/60'),
+}
+RATE_LIMIT_ROUTES = {
+	('POST', '/api/generate-antrag'): 'generate',
+	('POST', '/api/generate-antrag/stream'): 'generate',
+	('POST', '/api/jobs'): 'generate',
+	('POST', '/api/generate-word'): 'word',
+	('POST', '/api/generate-word/batch'): 'batch',
+	('GET', '/api/library/search'): 'search',
+}
+# Proxies whose X-Forwarded-For header is trusted, addresses or networks
+TRUSTED_PROXIES = tuple(
+	ipaddress.ip_network(proxy.strip(), strict=False)
+	for proxy in os.environ.get('MEINANTRAG_TRUSTED_PROXIES', '127.0.0.1,::1').split(',') if proxy.strip()
+)
+
+# Batch Word export: documents per request and worker processes per uWSGI
+# process (0 renders in threads of this process instead)
+BATCH_MAX_ITEMS = int(os.environ.get('MEINANTRAG_BATCH_MAX_ITEMS', '100'))
+BATCH_WORKERS = int(os.environ.get('MEINANTRAG_BATCH_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+def _find_data_dir(name, override=None):
+	"""Directory of the data files next to the script or in share/meinantrag, override wins if it exists"""
+	script_dir = os.path.dirname(os.path.abspath(__file__))
+	dev_dir = os.path.join(script_dir, name)
+	candidates = [
 		# Allow overriding via environment variable (for packaged deployments)
-		env_dir = os.environ.get('MEINANTRAG_TEMPLATES_DIR')
-		if env_dir and os.path.exists(env_dir):
-			return env_dir
+		override,
+		# Development checkout, or share/meinantrag when loaded as meinantrag_wsgi
+		dev_dir,
+		# Installed to bin/, data files are in share/meinantrag
+		os.path.join(script_dir, '..', 'share', 'meinantrag', name)
+	]
+	# Running from a Nix store path, look in share/meinantrag of the same store path
+	if '/nix/store/' in script_dir:
+		store_root = script_dir.split('/nix/store/')[1].split('/')[0]
+		candidates.append(os.path.join('/nix/store', store_root, 'share', 'meinantrag', name))
+	return next((c for c in candidates if c and os.path.isdir(c)), dev_dir)
 
-		# Get the directory where this script is located
-		script_dir = os.path.dirname(os.path.abspath(__file__))
+# Runs of up to four word characters and single punctuation marks, close to
+# what the Gemini and GPT tokenizers make of German text
+_TOKEN_PIECE = re.compile(r'\w{1,4}|[^\w\s]')
+_SENTENCE_END = re.compile(r'[.!?…](?=\s)|\n')
+
+def estimate_tokens(text):
+	"""Estimate the token count of text locally, without a tokenizer or an API call"""
+	return len(_TOKEN_PIECE.findall(text))
+
+def truncate_to_budget(text, budget):
+	"""Cut text after budget estimated tokens, at a sentence end in the second half if there is one"""
+	pieces = list(itertools.islice(_TOKEN_PIECE.finditer(text), budget + 1))
+	if budget <= 0 or len(pieces) <= budget:
+		return text
+	cut = pieces[budget - 1].end()
+	ends = [match.end() for match in _SENTENCE_END.finditer(text, 0, cut)]
+	if ends and ends[-1] >= cut // 2:
+		cut = ends[-1]
+	return text[:cut].rstrip() + ' […]'
+
+class Prompt(str):
+	"""A rendered prompt, knows the template it came from"""
+	
+	def __new__(cls, text, template):
+		prompt = super().__new__(cls, text)
+		prompt.template = template
+		return prompt
+
+class PromptTemplate:
+	"""A prompt file with one {anliegen} placeholder
+	
+	The text before the placeholder is the static prefix, identical for
+	every request and therefore cacheable by the provider. version is a hash
+	of the text and ends up in the keys of cached results.
+	"""
+	
+	def __init__(self, name, text):
+		prefix, placeholder, suffix = text.partition('{anliegen}')
+		if not placeholder:
+			raise ValueError(f"Prompt template {name} has no {{anliegen}} placeholder")
+		self.name = name
+		self.prefix = prefix
+		self.suffix = suffix
+		self.version = hashlib.sha256(text.encode('utf-8')).hexdigest()[:12]
+		self.prefix_tokens = estimate_tokens(prefix)
+		self.static_tokens = self.prefix_tokens + estimate_tokens(suffix)
+	
+	def render(self, anliegen):
+		"""The prompt for anliegen, its estimated tokens are counted per part"""
+		help_text = 'Prompt tokens sent to the LLM, estimated locally'
+		METRICS.inc('meinantrag_prompt_tokens_total', help_text, self.static_tokens, prompt=self.name, part='static')
+		METRICS.inc('meinantrag_prompt_tokens_total', help_text, estimate_tokens(anliegen), prompt=self.name, part='input')
+		return Prompt(self.prefix + anliegen + self.suffix, self)
+	
+	def snapshot(self):
+		return {'version': self.version, 'static_tokens': self.static_tokens}
+
+PROMPT_NAMES = ('antrag', 'email', 'structured', 'summary')
+
+def load_prompts(directory):
+	"""Read the prompt templates, one <name>.txt per prompt"""
+	prompts = {}
+	for filename in sorted(os.listdir(directory)):
+		if filename.endswith('.txt'):
+			name = filename[:-len('.txt')]
+			with open(os.path.join(directory, filename), encoding='utf-8') as f:
+				prompts[name] = PromptTemplate(name, f.read())
+	missing = [name for name in PROMPT_NAMES if name not in prompts]
+	if missing:
+		raise RuntimeError(f"Prompt templates missing in {directory}: {', '.join(missing)}")
+	return prompts
+
+# antrag and email are the two free-text prompts, structured the single call
+# alternative answered as JSON matching STRUCTURED_SCHEMA, summary condenses
+# over-long Anliegen
+PROMPTS_DIR = _find_data_dir('prompts', os.environ.get('MEINANTRAG_PROMPTS_DIR'))
+PROMPTS = load_prompts(PROMPTS_DIR)
+
+# Longer Anliegen (in estimated tokens) are truncated, or with summarize first
+# condensed by a call to the draft model. 0 sends them unchanged.
+INPUT_TOKEN_BUDGET = int(os.environ.get('MEINANTRAG_INPUT_TOKEN_BUDGET', '1000'))
+INPUT_OVERFLOW = os.environ.get('MEINANTRAG_INPUT_OVERFLOW', 'truncate').strip().lower()
+if INPUT_OVERFLOW not in ('truncate', 'summarize'):
+	print(f"Warning: Unknown MEINANTRAG_INPUT_OVERFLOW {INPUT_OVERFLOW!r}, truncating")
+	INPUT_OVERFLOW = 'truncate'
+
+# Gemini context caches for static prompt prefixes of at least
+# PROMPT_CACHE_MIN_TOKENS (the minimum of the model), kept for
+# PROMPT_CACHE_TTL seconds. 0 disables them. Shorter prefixes rely on the
+# implicit prefix caching of the providers.
+PROMPT_CACHE_TTL = int(os.environ.get('MEINANTRAG_PROMPT_CACHE_TTL', '3600'))
+PROMPT_CACHE_MIN_TOKENS = int(os.environ.get('MEINANTRAG_PROMPT_CACHE_MIN_TOKENS', '1024'))
+
+# Used when the e-mail generation fails, so the user still gets the Antrag
+FALLBACK_EMAIL = """Guten Tag,
+
+ich möchte Sie bitten, sich des folgenden Anliegens anzunehmen: {title}
+
+Eine Antragsvorlage dazu habe ich im Anhang beigefügt.
+
+Mit freundlichen Grüßen,"""
+
+# Fields of the answer to the structured prompt. Only keys that both the
+# Gemini SDK and OpenAI's JSON schema accept, the order of the fields comes
+# from the prompt (bench/schema.py builds the requests with the real SDKs).
+STRUCTURED_FIELDS = ('title', 'demand', 'justification', 'email_body')
+STRUCTURED_SCHEMA = {
+	'type': 'object',
+	'properties': {field: {'type': 'string'} for field in STRUCTURED_FIELDS},
+	'required': list(STRUCTURED_FIELDS)
+}
+
+# Share of generations (0 to 1) that use the structured prompt instead of the two
+# free-text prompts. Assigned by Anliegen, so repeated inputs stay in one arm.
+STRUCTURED_SHARE = min(1.0, max(0.0, float(os.environ.get('MEINANTRAG_STRUCTURED_SHARE', '0'))))
+
+# Change whenever one of the prompts or the input budget changes, so cached results of old prompts are not reused
+_INPUT_VERSION = f"{INPUT_TOKEN_BUDGET}:{INPUT_OVERFLOW}:{PROMPTS['summary'].version}"
+PROMPT_VERSION = hashlib.sha256('\x00'.join((PROMPTS['antrag'].version, PROMPTS['email'].version, _INPUT_VERSION)).encode('utf-8')).hexdigest()[:12]
+PROMPT_VERSIONS = {
+	'text': PROMPT_VERSION,
+	'structured': 's' + hashlib.sha256('\x00'.join((PROMPTS['structured'].version, json.dumps(STRUCTURED_SCHEMA, sort_keys=True), _INPUT_VERSION)).encode('utf-8')).hexdigest()[:11]
+}
+
+# Markdown and heading patterns, compiled once at import time. The emphasis
+# passes stay separate: merging them into one alternation changes the result
+# for nested or overlapping markers.
+_MD_BOLD = re.compile(r'\*\*(.+?)\*\*')
+_MD_ITALIC = re.compile(r'\*(.+?)\*')
+_MD_BOLD_UNDERSCORE = re.compile(r'__(.+?)__')
+_MD_ITALIC_UNDERSCORE = re.compile(r'_(.+?)_')
+# "/Heading" and "# Heading" in one pass, including "/ # Heading"
+_MD_LINE_PREFIX = re.compile(r'^(?:/\s*(?:#+\s*)?|#+\s*)', re.MULTILINE)
+_MD_LINE_START = re.compile(r'\n[/#]')
+_MD_CODE = re.compile(r'`(.+?)`')
+_MD_LINK = re.compile(r'\[(.+?)\]\(.+?\)')
+_JUSTIFICATION_SPLIT = re.compile(r'begründung|sachverhalt', re.IGNORECASE)
+_JUSTIFICATION_HEADING = re.compile(r'(?:begründung\s*/?\s*sachverhalt|sachverhalt|begründung)\s*:?\s*\n?', re.IGNORECASE)
+_JUSTIFICATION_HEADING_TRAILING = re.compile(r'(?:begründung\s*/?\s*sachverhalt|sachverhalt|begründung)\s*:?\s*\n?\s*', re.IGNORECASE)
+
+def remove_markdown(text):
+	"""Remove markdown formatting from text"""
+	if not text:
+		return text
+	
+	# Emphasis markers are removed first, they can expose a "/" or "#" at a line start
+	if '*' in text:
+		text = _MD_BOLD.sub(r'\1', text)
+		text = _MD_ITALIC.sub(r'\1', text)
+	if '_' in text:
+		text = _MD_BOLD_UNDERSCORE.sub(r'\1', text)
+		text = _MD_ITALIC_UNDERSCORE.sub(r'\1', text)
+	
+	# Remove heading markdown: /Heading or # Heading. The checks are much cheaper
+	# than the multiline pattern, which is tried at every position, and one
+	# search for both markers beats two substring scans for "\n/" and "\n#".
+	if text[:1] in ('/', '#') or (('/' in text or '#' in text) and _MD_LINE_START.search(text)):
+		text = _MD_LINE_PREFIX.sub('', text)
+	
+	# Remove other markdown elements
+	if '`' in text:
+		text = _MD_CODE.sub(r'\1', text)
+	if '[' in text:
+		text = _MD_LINK.sub(r'\1', text)
+	
+	return text.strip()
+
+def _strip_heading(pattern, text):
+	"""Remove a leading "Begründung/Sachverhalt" heading"""
+	match = pattern.match(text)
+	if match:
+		text = text[match.end():]
+	return text.strip()
+
+def parse_gemini_response(text):
+	"""Parse the response from Gemini into title, demand, and justification"""
+	# Remove markdown formatting first
+	text = remove_markdown(text)
+	
+	# Split at the first "Begründung/Sachverhalt" or similar
+	match = _JUSTIFICATION_SPLIT.search(text) if text else None
+	if match:
+		before_justification = text[:match.start()].strip()
+		justification = _strip_heading(_JUSTIFICATION_HEADING, text[match.end():].strip())
+	else:
+		# Try to split by paragraphs
+		paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
+		if len(paragraphs) >= 3:
+			before_justification = '\n\n'.join(paragraphs[:-1])
+			justification = _strip_heading(_JUSTIFICATION_HEADING, paragraphs[-1])
+		else:
+			before_justification = text
+			justification = ""
+	
+	# The title is the first line, the demand everything up to the justification
+	title = before_justification.partition('\n')[0].strip()
+	demand = before_justification[len(title):].strip()
+	
+	# Remove title from demand if it's duplicated
+	if demand.startswith(title):
+		demand = demand[len(title):].strip()
+	
+	# Splitting can expose markdown at the start of a part, e.g. "/Sachverhalt",
+	# so each part gets a second pass. Without it 5 of the 15 responses in
+	# bench/corpus parse differently; on text without markers it only runs the
+	# cheap checks in remove_markdown.
+	title = remove_markdown(title)
+	demand = remove_markdown(demand)
+	justification = remove_markdown(justification)
+	
+	# Final cleanup: remove any remaining "Sachverhalt" or "Begründung/Sachverhalt" at the start
+	justification = _strip_heading(_JUSTIFICATION_HEADING_TRAILING, justification)
+	
+	return {
+		'title': title,
+		'demand': demand,
+		'justification': justification
+	}
+
+def generation_mode(anliegen):
+	"""Return 'structured' or 'text' for this Anliegen according to STRUCTURED_SHARE"""
+	if STRUCTURED_SHARE <= 0:
+		return 'text'
+	if STRUCTURED_SHARE >= 1:
+		return 'structured'
+	bucket = int(hashlib.sha256(anliegen.encode('utf-8')).hexdigest()[:8], 16) / 0x100000000
+	return 'structured' if bucket < STRUCTURED_SHARE else 'text'
+
+_JSON_FENCE = re.compile(r'^\s*```(?:json)?\s*|\s*```\s*$')
+_STRUCTURED_PARTIAL_FIELD = re.compile(r'"(title|demand|justification)"\s*:\s*"((?:[^"\\]|\\.)*)')
+
+def parse_structured_response(text):
+	"""Validate a structured response against STRUCTURED_SCHEMA, returns every field, empty where it is not valid"""
+	try:
+		data = json.loads(_JSON_FENCE.sub('', text))
+	except ValueError:
+		data = None
+	if not isinstance(data, dict):
+		data = {}
+	return {field: remove_markdown(data[field]).strip() if isinstance(data.get(field), str) else '' for field in STRUCTURED_FIELDS}
+
+def parse_structured_partial(text):
+	"""Extract title, demand and justification from an incomplete structured response"""
+	parsed = {'title': '', 'demand': '', 'justification': ''}
+	for field, raw in _STRUCTURED_PARTIAL_FIELD.findall(text):
+		# The value may end inside an escape sequence
+		for cut in range(len(raw), max(-1, len(raw) - 7), -1):
+			try:
+				parsed[field] = remove_markdown(json.loads('"' + raw[:cut] + '"')).strip()
+				break
+			except ValueError:
+				continue
+	return parsed
+
+# Histogram buckets in seconds, from the parser (sub-millisecond) up to slow LLM calls
+METRICS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60)
+
+class Metrics:
+	"""Counters, histograms and gauges in Prometheus text format
+	
+	With a directory set (MEINANTRAG_METRICS_DIR), every process writes its
+	values to metrics-<pid>-<start time>.json there and render() sums the
+	files of all processes. Counters and histograms of exited processes stay
+	included so totals do not go backwards when uWSGI respawns a worker,
+	gauges only count for running processes.
+	"""
+	
+	def __init__(self, directory=None, flush_interval=1.0):
+		self.directory = directory
+		self.flush_interval = flush_interval
+		self._help = {}
+		self._counters = {}
+		self._histograms = {}
+		self._gauges = {}
+		self._lock = threading.Lock()
+		self._last_flush = 0.0
+		self._process = _process_identity()
+		if self.directory:
+			try:
+				os.makedirs(self.directory, exist_ok=True)
+			except OSError as e:
+				print(f"Warning: Metrics directory {self.directory} not usable: {e}")
+				self.directory = None
+		if hasattr(os, 'register_at_fork'):
+			os.register_at_fork(after_in_child=self._forked)
+	
+	def _forked(self):
+		# The uWSGI master imports the module and forks the workers: what was
+		# counted before belongs to the master, a worker starts empty
+		self._lock = threading.Lock()
+		self._counters = {}
+		self._histograms = {}
+		self._last_flush = 0.0
+		self._process = _process_identity()
+	
+	def _key(self, labels):
+		return tuple(sorted(labels.items())) if labels else ()
+	
+	def inc(self, name, help_text, value=1, **labels):
+		key = self._key(labels)
+		with self._lock:
+			self._help[name] = ('counter', help_text)
+			series = self._counters.setdefault(name, {})
+			series[key] = series.get(key, 0) + value
+	
+	def observe(self, name, help_text, value, **labels):
+		key = self._key(labels)
+		with self._lock:
+			self._help[name] = ('histogram', help_text)
+			series = self._histograms.setdefault(name, {})
+			histogram = series.get(key)
+			if histogram is None:
+				histogram = series[key] = {'buckets': [0] * len(METRICS_BUCKETS), 'sum': 0.0, 'count': 0}
+			for i, bound in enumerate(METRICS_BUCKETS):
+				if value <= bound:
+					histogram['buckets'][i] += 1
+					break
+			histogram['sum'] += value
+			histogram['count'] += 1
+	
+	def gauge(self, name, help_text, func):
+		"""Register func() as the current value of a gauge, read on export"""
+		with self._lock:
+			self._help[name] = ('gauge', help_text)
+			self._gauges[name] = func
+	
+	def snapshot(self):
+		with self._lock:
+			snapshot = {
+				'pid': self._process[0],
+				'started': self._process[1],
+				'help': dict(self._help),
+				'counters': {name: {json.dumps(key): value for key, value in series.items()} for name, series in self._counters.items()},
+				'histograms': {name: {json.dumps(key): dict(h, buckets=list(h['buckets'])) for key, h in series.items()} for name, series in self._histograms.items()},
+			}
+			gauges = dict(self._gauges)
+		snapshot['gauges'] = {}
+		for name, func in gauges.items():
+			try:
+				snapshot['gauges'][name] = {'[]': float(func())}
+			except Exception:
+				continue
+		return snapshot
+	
+	def flush(self, force=False):
+		"""Write this process' snapshot to the metrics directory, at most every flush_interval seconds"""
+		if not self.directory:
+			return
+		now = time.monotonic()
+		if not force and now - self._last_flush < self.flush_interval:
+			return
+		self._last_flush = now
+		# With the start time in the name, a process that gets the PID of a dead
+		# one cannot overwrite the counters the dead one left behind
+		path = os.path.join(self.directory, 'metrics-{}-{}.json'.format(*self._process))
+		try:
+			with open(path + '.tmp', 'w') as f:
+				json.dump(self.snapshot(), f)
+			os.replace(path + '.tmp', path)
+		except OSError as e:
+			print(f"Warning: Could not write metrics: {e}")
+	
+	def _snapshots(self):
+		if not self.directory:
+			return [self.snapshot()]
+		self.flush(force=True)
+		snapshots = []
+		for filename in os.listdir(self.directory):
+			if not (filename.startswith('metrics-') and filename.endswith('.json')):
+				continue
+			try:
+				with open(os.path.join(self.directory, filename)) as f:
+					snapshots.append(json.load(f))
+			except (OSError, ValueError):
+				continue
+		return snapshots
+	
+	def render(self):
+		"""Aggregate all processes and return the Prometheus text exposition"""
+		help_texts = {}
+		counters = {}
+		histograms = {}
+		gauges = {}
+		for snapshot in self._snapshots():
+			help_texts.update({name: tuple(value) for name, value in snapshot['help'].items()})
+			for name, series in snapshot['counters'].items():
+				merged = counters.setdefault(name, {})
+				for key, value in series.items():
+					merged[key] = merged.get(key, 0) + value
+			for name, series in snapshot['histograms'].items():
+				merged = histograms.setdefault(name, {})
+				for key, histogram in series.items():
+					target = merged.setdefault(key, {'buckets': [0] * len(METRICS_BUCKETS), 'sum': 0.0, 'count': 0})
+					target['buckets'] = [a + b for a, b in zip(target['buckets'], histogram['buckets'])]
+					target['sum'] += histogram['sum']
+					target['count'] += histogram['count']
+			if _process_alive(snapshot['pid'], snapshot.get('started')):
+				for name, series in snapshot['gauges'].items():
+					merged = gauges.setdefault(name, {})
+					for key, value in series.items():
+						merged[key] = merged.get(key, 0) + value
+		
+		lines = []
+		for name in sorted(help_texts):
+			kind, help_text = help_texts[name]
+			lines.append(f"# HELP {name} {help_text}")
+			lines.append(f"# TYPE {name} {kind}")
+			if kind == 'histogram':
+				for key, histogram in sorted(histograms.get(name, {}).items()):
+					cumulative = 0
+					for bound, count in zip(METRICS_BUCKETS, histogram['buckets']):
+						cumulative += count
+						lines.append(f"{name}_bucket{_format_labels(key, le=repr(float(bound)))} {cumulative}")
+					lines.append(f"{name}_bucket{_format_labels(key, le='+Inf')} {histogram['count']}")
+					lines.append(f"{name}_sum{_format_labels(key)} {histogram['sum']!r}")
+					lines.append(f"{name}_count{_format_labels(key)} {histogram['count']}")
+			else:
+				for key, value in sorted((counters if kind == 'counter' else gauges).get(name, {}).items()):
+					lines.append(f"{name}{_format_labels(key)} {value!r}")
+		return '\n'.join(lines) + '\n'
+
+def _format_labels(key, **extra):
+	labels = [(name, str(value)) for name, value in json.loads(key)] + list(extra.items())
+	if not labels:
+		return ''
+	escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+	return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+def _process_start(pid):
+	"""Start time of a process in clock ticks since boot, None without /proc"""
+	try:
+		with open(f'/proc/{pid}/stat') as f:
+			# starttime is field 22, the command name before it may contain spaces
+			return int(f.read().rpartition(')')[2].split()[19])
+	except (OSError, ValueError, IndexError):
+		return None
+
+def _process_identity():
+	"""PID and start time of this process, a random token instead of the start time without /proc"""
+	pid = os.getpid()
+	started = _process_start(pid)
+	return pid, started if started is not None else secrets.token_hex(4)
+
+def _process_alive(pid, started=None):
+	"""Whether the process that wrote a snapshot still runs, not just one with the same PID"""
+	if isinstance(started, int):
+		return _process_start(pid) == started
+	if pid == os.getpid():
+		return True
+	try:
+		os.kill(pid, 0)
+		return True
+	except ProcessLookupError:
+		return False
+	except OSError:
+		return True
+
+METRICS = Metrics(directory=os.environ.get('MEINANTRAG_METRICS_DIR') or None)
+
+def record_stage(stage, started):
+	"""Record the time since the perf_counter() value started in meinantrag_stage_seconds"""
+	METRICS.observe('meinantrag_stage_seconds', 'Duration of request processing stages', time.perf_counter() - started, stage=stage)
+
+@contextmanager
+def span(stage):
+	"""Time the with block as a stage"""
+	started = time.perf_counter()
+	try:
+		yield
+	finally:
+		record_stage(stage, started)
+
+
+class GenerationCache:
+	"""Cache for generation results with an in-process LRU tier and an optional shared SQLite tier"""
+	
+	def __init__(self, max_entries=512, ttl=86400, db_path=None, db_max_entries=10000):
+		self.max_entries = max_entries
+		self.ttl = ttl
+		self.db_path = db_path
+		self.db_max_entries = db_max_entries
+		self._entries = OrderedDict()
+		self._lock = threading.Lock()
+		self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'disk_errors': 0}
+		if self.db_path:
+			try:
+				with self._connect() as conn:
+					conn.execute('PRAGMA journal_mode=WAL')
+					conn.execute('CREATE TABLE IF NOT EXISTS generation_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)')
+					conn.execute('CREATE INDEX IF NOT EXISTS generation_cache_created ON generation_cache (created)')
+			except sqlite3.Error as e:
+				print(f"Warning: Could not open cache database {self.db_path}: {e}")
+				self.db_path = None
+	
+	@property
+	def enabled(self):
+		return self.max_entries > 0 or bool(self.db_path)
+	
+	def make_key(self, anliegen, party_id, mode='text'):
+		"""Build a content address from the normalized Anliegen, the party and the prompt version of the mode"""
+		# Copies of the same text often differ only in case, whitespace or unicode form
+		normalized = ' '.join(unicodedata.normalize('NFKC', anliegen).split()).casefold()
+		key = '\x00'.join((PROMPT_VERSIONS[mode], party_id, normalized))
+		return hashlib.sha256(key.encode('utf-8')).hexdigest()
+	
+	def _connect(self):
+		return sqlite3.connect(self.db_path, timeout=5)
+	
+	def get(self, key):
+		"""Return the cached result for key or None"""
+		now = time.time()
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is not None:
+				created, value = entry
+				if now - created < self.ttl:
+					self._entries.move_to_end(key)
+					self.stats['hits'] += 1
+					return value
+				del self._entries[key]
 		
-		# Try development templates first
-		dev_template_dir = os.path.join(script_dir, 'templates')
-		if os.path.exists(dev_template_dir):
-			return dev_template_dir
+		if self.db_path:
+			try:
+				with self._connect() as conn:
+					row = conn.execute('SELECT value, created FROM generation_cache WHERE key = ?', (key,)).fetchone()
+				if row and now - row[1] < self.ttl:
+					value = json.loads(row[0])
+					self._store_local(key, value, row[1])
+					with self._lock:
+						self.stats['disk_hits'] += 1
+					return value
+			except (sqlite3.Error, ValueError) as e:
+				print(f"Warning: Cache lookup failed: {e}")
+				with self._lock:
+					self.stats['disk_errors'] += 1
 		
-		# Try to find templates relative to the executable
+		with self._lock:
+			self.stats['misses'] += 1
+		return None
+	
+	def set(self, key, value):
+		"""Store a result in both tiers"""
+		now = time.time()
+		self._store_local(key, value, now)
+		if self.db_path:
+			try:
+				with self._connect() as conn:
+					conn.execute('INSERT OR REPLACE INTO generation_cache (key, value, created) VALUES (?, ?, ?)', (key, json.dumps(value), now))
+					# Keep the shared tier bounded: drop expired rows and the oldest rows above the cap
+					conn.execute('DELETE FROM generation_cache WHERE created < ?', (now - self.ttl,))
+					conn.execute('DELETE FROM generation_cache WHERE key IN (SELECT key FROM generation_cache ORDER BY created DESC LIMIT -1 OFFSET ?)', (self.db_max_entries,))
+			except sqlite3.Error as e:
+				print(f"Warning: Cache store failed: {e}")
+				with self._lock:
+					self.stats['disk_errors'] += 1
+	
+	def _store_local(self, key, value, created):
+		if self.max_entries <= 0:
+			return
+		with self._lock:
+			self._entries[key] = (created, value)
+			self._entries.move_to_end(key)
+			while len(self._entries) > self.max_entries:
+				self._entries.popitem(last=False)
+				self.stats['evictions'] += 1
+	
+	def snapshot(self):
+		"""Return the counters together with the current size"""
+		with self._lock:
+			stats = dict(self.stats)
+			stats['entries'] = len(self._entries)
+		lookups = stats['hits'] + stats['disk_hits'] + stats['misses']
+		stats['hit_ratio'] = round((stats['hits'] + stats['disk_hits']) / lookups, 4) if lookups else 0.0
+		return stats
+
+class SchedulerBusyError(Exception):
+	"""Raised when a generation cannot be admitted, retry_after is a hint in seconds"""
+	
+	def __init__(self, message, retry_after):
+		super().__init__(message)
+		self.retry_after = retry_after
+
+class GenerationScheduler:
+	"""Admission control for LLM generations
+	
+	At most max_concurrent generations run at once, up to max_queue more wait
+	in FIFO order. Waiters are threads (acquire), coroutines (acquire_async) or
+	callbacks (submit), so the WSGI app, the ASGI app and background jobs share
+	one queue. A released slot is handed directly to the next waiter.
+	"""
+	
+	def __init__(self, max_concurrent=4, max_queue=16, queue_timeout=20):
+		self.max_concurrent = max(1, max_concurrent)
+		self.max_queue = max(0, max_queue)
+		self.queue_timeout = queue_timeout
+		self._active = 0
+		self._waiters = deque()
+		self._lock = threading.Lock()
+		# Moving average of the slot hold time, used for Retry-After
+		self._service_time = LLM_TIMEOUT / 2
+		self.stats = {'admitted': 0, 'queued': 0, 'rejected': 0, 'timeouts': 0, 'cancelled': 0, 'wait_total': 0.0, 'wait_max': 0.0}
+	
+	def retry_after(self):
+		"""Seconds until a slot is likely to be free for a new request"""
+		with self._lock:
+			return self._retry_after()
+	
+	def _retry_after(self):
+		rounds = (len(self._waiters) + 1) / self.max_concurrent
+		return max(1, int(math.ceil(self._service_time * rounds)))
+	
+	def _enqueue(self, wake):
+		"""Take a slot right away (returns None) or queue wake() to be called with the slot"""
+		with self._lock:
+			if self._active < self.max_concurrent and not self._waiters:
+				self._active += 1
+				self.stats['admitted'] += 1
+				return None
+			if len(self._waiters) >= self.max_queue:
+				self.stats['rejected'] += 1
+				raise SchedulerBusyError('Zu viele gleichzeitige Anfragen, bitte später erneut versuchen', self._retry_after())
+			waiter = {'wake': wake, 'granted': False, 'queued': time.monotonic()}
+			self._waiters.append(waiter)
+			self.stats['queued'] += 1
+			return waiter
+	
+	def _cancel(self, waiter, reason='timeouts'):
+		"""Remove a waiter that gave up, returns False if it already got the slot"""
+		with self._lock:
+			if waiter['granted']:
+				return False
+			self._waiters.remove(waiter)
+			self.stats[reason] += 1
+			return True
+	
+	def _record_wait(self, waiter):
+		waited = time.monotonic() - waiter['queued']
+		with self._lock:
+			self.stats['wait_total'] += waited
+			self.stats['wait_max'] = max(self.stats['wait_max'], waited)
+	
+	def release(self, held=None):
+		"""Give the slot to the next waiter or free it, held is the hold time in seconds"""
+		with self._lock:
+			if held is not None:
+				self._service_time = 0.8 * self._service_time + 0.2 * held
+			if not self._waiters:
+				self._active -= 1
+				return
+			# The active count stays, the slot changes hands
+			waiter = self._waiters.popleft()
+			waiter['granted'] = True
+			self.stats['admitted'] += 1
+		self._record_wait(waiter)
+		waiter['wake']()
+	
+	def acquire(self, timeout=None):
+		"""Block until a slot is free, raises SchedulerBusyError if the queue is full or the wait times out"""
+		event = threading.Event()
+		waiter = self._enqueue(event.set)
+		if waiter is None:
+			return
+		if not event.wait(self.queue_timeout if timeout is None else timeout) and self._cancel(waiter):
+			raise SchedulerBusyError('Zeitüberschreitung in der Warteschlange', self.retry_after())
+	
+	async def acquire_async(self, timeout=None):
+		"""Like acquire, without blocking the event loop"""
+		loop = asyncio.get_running_loop()
+		future = loop.create_future()
+		
+		def wake():
+			loop.call_soon_threadsafe(lambda: future.done() or future.set_result(True))
+		
+		waiter = self._enqueue(wake)
+		if waiter is None:
+			return
 		try:
-			# If we're running from a Nix store, look for templates in share/meinantrag
-			if '/nix/store/' in script_dir:
-				# Go up from bin to share/meinantrag/templates
-				share_dir = os.path.join(script_dir, '..', 'share', 'meinantrag', 'templates')
-				if os.path.exists(share_dir):
-					return share_dir
-				
-				# Alternative: look for templates in the same store path
-				store_root = script_dir.split('/nix/store/')[1].split('/')[0]
-				store_path = f"/nix/store/{store_root}"
-				alt_share_dir = os.path.join(store_path, 'share', 'meinantrag', 'templates')
-				if os.path.exists(alt_share_dir):
-					return alt_share_dir
-		except Exception:
-			pass
+			await asyncio.wait_for(asyncio.shield(future), self.queue_timeout if timeout is None else timeout)
+		except asyncio.TimeoutError:
+			if self._cancel(waiter):
+				raise SchedulerBusyError('Zeitüberschreitung in der Warteschlange', self.retry_after())
+		except asyncio.CancelledError:
+			# The client went away, pass on a slot that was already handed over
+			if not self._cancel(waiter, 'cancelled'):
+				self.release()
+			raise
+	
+	def submit(self, start):
+		"""Call start() once a slot is free, start() owns the slot and has to release it"""
+		if self._enqueue(start) is None:
+			start()
+	
+	@contextmanager
+	def slot(self):
+		self.acquire()
+		started = time.monotonic()
+		try:
+			yield
+		finally:
+			self.release(time.monotonic() - started)
+	
+	@asynccontextmanager
+	async def slot_async(self):
+		await self.acquire_async()
+		started = time.monotonic()
+		try:
+			yield
+		finally:
+			self.release(time.monotonic() - started)
+	
+	def snapshot(self):
+		"""Return the counters together with the current load"""
+		with self._lock:
+			stats = dict(self.stats)
+			stats['active'] = self._active
+			stats['queue_depth'] = len(self._waiters)
+			stats['oldest_wait'] = round(time.monotonic() - self._waiters[0]['queued'], 3) if self._waiters else 0.0
+			stats['service_time'] = round(self._service_time, 3)
+		stats['max_concurrent'] = self.max_concurrent
+		stats['max_queue'] = self.max_queue
+		waited = stats['queued'] - stats['timeouts'] - stats['cancelled'] - stats['queue_depth']
+		stats['wait_avg'] = round(stats['wait_total'] / waited, 3) if waited > 0 else 0.0
+		stats['wait_total'] = round(stats['wait_total'], 3)
+		stats['wait_max'] = round(stats['wait_max'], 3)
+		return stats
+
+class SlotStream:
+	"""Response stream that holds a scheduler slot until it is exhausted or closed"""
+	
+	def __init__(self, stream, scheduler):
+		self.stream = stream
+		self.scheduler = scheduler
+		self.started = time.monotonic()
+		self._released = False
+	
+	def _release(self):
+		if not self._released:
+			self._released = True
+			self.scheduler.release(time.monotonic() - self.started)
+	
+	def __iter__(self):
+		return self
+	
+	def __next__(self):
+		try:
+			return next(self.stream)
+		except BaseException:
+			self._release()
+			raise
+	
+	def close(self):
+		# Called by the WSGI server, also when the client went away mid-stream
+		try:
+			self.stream.close()
+		finally:
+			self._release()
+
+class AsyncSlotStream(SlotStream):
+	"""SlotStream for async generators, falcon.asgi awaits close()"""
+	
+	def __aiter__(self):
+		return self
+	
+	async def __anext__(self):
+		try:
+			return await self.stream.__anext__()
+		except BaseException:
+			self._release()
+			raise
+	
+	async def close(self):
+		try:
+			await self.stream.aclose()
+		finally:
+			self._release()
+
+class JobStore:
+	"""State of background generation jobs, in memory or in a SQLite file shared by all processes
+	
+	Without db_path a job can only be polled from the process that runs it,
+	so with several uWSGI processes MEINANTRAG_JOBS_DB has to be set.
+	"""
+	
+	def __init__(self, ttl=3600, max_entries=1024, db_path=None):
+		self.ttl = ttl
+		self.max_entries = max_entries
+		self.db_path = db_path
+		self._jobs = OrderedDict()
+		self._lock = threading.Lock()
+		if self.db_path:
+			try:
+				with self._connect() as conn:
+					conn.execute('PRAGMA journal_mode=WAL')
+					conn.execute('CREATE TABLE IF NOT EXISTS generation_jobs (id TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)')
+					conn.execute('CREATE INDEX IF NOT EXISTS generation_jobs_created ON generation_jobs (created)')
+			except sqlite3.Error as e:
+				print(f"Warning: Could not open job database {self.db_path}: {e}")
+				self.db_path = None
+	
+	def _connect(self):
+		return sqlite3.connect(self.db_path, timeout=5)
+	
+	def create(self, party_name):
+		"""Register a queued job and return its ID"""
+		job_id = secrets.token_urlsafe(16)
+		self._put(job_id, {'status': 'queued', 'party_name': party_name, 'created': time.time()}, new=True)
+		return job_id
+	
+	def update(self, job_id, **fields):
+		job = self.get(job_id)
+		if job is not None:
+			job.update(fields)
+			self._put(job_id, job)
+	
+	def get(self, job_id):
+		"""Return the job as a dict or None if it is unknown or expired"""
+		now = time.time()
+		if self.db_path:
+			try:
+				with self._connect() as conn:
+					row = conn.execute('SELECT value FROM generation_jobs WHERE id = ? AND created >= ?', (job_id, now - self.ttl)).fetchone()
+				return json.loads(row[0]) if row else None
+			except (sqlite3.Error, ValueError) as e:
+				print(f"Warning: Job lookup failed: {e}")
+				return None
+		with self._lock:
+			job = self._jobs.get(job_id)
+			if job is None or now - job['created'] >= self.ttl:
+				return None
+			return dict(job)
+	
+	def _put(self, job_id, job, new=False):
+		if self.db_path:
+			try:
+				with self._connect() as conn:
+					conn.execute('INSERT OR REPLACE INTO generation_jobs (id, value, created) VALUES (?, ?, ?)', (job_id, json.dumps(job), job['created']))
+					if new:
+						conn.execute('DELETE FROM generation_jobs WHERE created < ?', (time.time() - self.ttl,))
+				return
+			except sqlite3.Error as e:
+				print(f"Warning: Job store failed: {e}")
+				return
+		with self._lock:
+			self._jobs[job_id] = job
+			while len(self._jobs) > self.max_entries:
+				self._jobs.popitem(last=False)
+	
+	def __len__(self):
+		if self.db_path:
+			try:
+				with self._connect() as conn:
+					return conn.execute('SELECT COUNT(*) FROM generation_jobs WHERE created >= ?', (time.time() - self.ttl,)).fetchone()[0]
+			except sqlite3.Error:
+				return 0
+		with self._lock:
+			return len(self._jobs)
+
+# Personal data an Anliegen may carry over into the generated text
+_ANONYMIZE_PATTERNS = (
+	(re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+'), '[E-Mail]'),
+	(re.compile(r'\b[A-Z]{2}\d{2}(?: ?[0-9A-Z]{4}){3,7}(?: ?[0-9A-Z]{1,3})?\b'), '[IBAN]'),
+	(re.compile(r'(?<![\w.,])(?:\+\d{2}|0)[\d /()-]{6,}\d'), '[Telefon]'),
+)
+_SEARCH_TERM = re.compile(r'\w{4,}')
+_COMBINING_MARKS = re.compile('[\u0300-\u036f]')
+
+def _fold(text):
+	"""Lower case without diacritics, like the unicode61 tokenizer of the FTS index"""
+	return _COMBINING_MARKS.sub('', unicodedata.normalize('NFKD', text.lower()))
+
+# Words that appear in almost every Anliegen and would match everything
+_SEARCH_STOPWORDS = frozenset(_fold(word) for word in (
+	'aber', 'alle', 'auch', 'beim', 'bitte', 'dass', 'damit', 'dann', 'denn', 'diese', 'dieser', 'dieses', 'doch', 'dort',
+	'durch', 'eine', 'einem', 'einen', 'einer', 'eines', 'einige', 'gegen', 'gibt', 'haben', 'habe', 'hier', 'immer',
+	'kann', 'können', 'mehr', 'mein', 'meine', 'muss', 'müssen', 'nach', 'nicht', 'noch', 'oder', 'ohne', 'schon',
+	'sehr', 'sein', 'seine', 'sind', 'soll', 'sollen', 'sollte', 'sowie', 'über', 'unser', 'unsere', 'unter', 'viele',
+	'wäre', 'weil', 'wenn', 'werden', 'wird', 'würde', 'wurde', 'zwischen',
+	'antrag', 'anfrage', 'gemeinderat', 'karlsruhe', 'stadt', 'stadtverwaltung', 'fraktion',
+))
+
+def anonymize(text):
+	"""Replace e-mail addresses, IBANs and phone numbers with placeholders"""
+	for pattern, placeholder in _ANONYMIZE_PATTERNS:
+		text = pattern.sub(placeholder, text)
+	return text
+
+def search_terms(text, max_terms=12):
+	"""Significant words of a search text, cut to a stem for prefix matching"""
+	terms = []
+	for word in _SEARCH_TERM.findall(_fold(text)):
+		if word in _SEARCH_STOPWORDS or word.isdigit():
+			continue
+		# Crude stemming for German: Radwege, Radwegen, Radwegenetz all start with radweg
+		stem = word[:max(4, len(word) - 2)]
+		if stem not in terms:
+			terms.append(stem)
+			if len(terms) == max_terms:
+				break
+	return terms
+
+class AntragLibrary:
+	"""Generated Anträge in a SQLite file with an FTS5 index, suggested while an Anliegen is typed
+	
+	Only title, demand, justification, party and the time of creation are
+	stored, never the Anliegen or the e-mail. With anonymize=True e-mail
+	addresses, IBANs and phone numbers are replaced and the time is cut to
+	the day. Entries older than retention seconds are deleted, 0 keeps them.
+	Writes go through a single background thread, so storing a result does
+	not delay the response.
+	"""
+	
+	def __init__(self, db_path, retention=365 * 86400, anonymize=True):
+		self.db_path = db_path
+		self.retention = retention
+		self.anonymize = anonymize
+		self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='meinantrag-library')
+		self._local = threading.local()
+		self._abandoned = []
+		self._lock = threading.Lock()
+		self.stats = {'added': 0, 'duplicates': 0, 'searches': 0, 'hits': 0, 'errors': 0}
+		if self.db_path:
+			try:
+				# Not a cached connection, this runs at import in the uWSGI master before it forks
+				with closing(sqlite3.connect(self.db_path, timeout=5)) as conn, conn:
+					conn.execute('PRAGMA journal_mode=WAL')
+					conn.executescript("""
+						CREATE TABLE IF NOT EXISTS antrag_library (
+							id INTEGER PRIMARY KEY, digest TEXT UNIQUE NOT NULL, title TEXT NOT NULL, demand TEXT NOT NULL,
+							justification TEXT NOT NULL, party TEXT NOT NULL, created REAL NOT NULL
+						);
+						CREATE INDEX IF NOT EXISTS antrag_library_created ON antrag_library (created);
+						CREATE VIRTUAL TABLE IF NOT EXISTS antrag_library_fts USING fts5(
+							title, demand, justification, content='antrag_library', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+						);
+						CREATE TRIGGER IF NOT EXISTS antrag_library_insert AFTER INSERT ON antrag_library BEGIN
+							INSERT INTO antrag_library_fts (rowid, title, demand, justification) VALUES (new.id, new.title, new.demand, new.justification);
+						END;
+						CREATE TRIGGER IF NOT EXISTS antrag_library_delete AFTER DELETE ON antrag_library BEGIN
+							INSERT INTO antrag_library_fts (antrag_library_fts, rowid, title, demand, justification) VALUES ('delete', old.id, old.title, old.demand, old.justification);
+						END;
+					""")
+			except sqlite3.Error as e:
+				# Also raised when SQLite was built without FTS5
+				print(f"Warning: Could not open library database {self.db_path}: {e}")
+				self.db_path = None
+	
+	@property
+	def enabled(self):
+		return bool(self.db_path)
+	
+	def _connect(self):
+		# One connection per thread: closing the last connection checkpoints and
+		# removes the WAL file, and concurrent searches would wait for its recreation
+		conn = getattr(self._local, 'conn', None)
+		if conn is None or self._local.pid != os.getpid():
+			if conn is not None:
+				# Inherited through fork(), SQLite connections must not be used in the child.
+				# Closing it here could checkpoint or remove the WAL file the parent still uses.
+				self._abandoned.append(conn)
+			conn = self._local.conn = sqlite3.connect(self.db_path, timeout=5)
+			self._local.pid = os.getpid()
+		return conn
+	
+	def _count(self, name):
+		with self._lock:
+			self.stats[name] += 1
+	
+	def add(self, result, party_name):
+		"""Queue a generated Antrag for storing"""
+		if self.enabled and result.get('title') and result.get('demand'):
+			return self._writer.submit(self._insert, result['title'], result['demand'], result['justification'], party_name)
+	
+	def _insert(self, title, demand, justification, party_name):
+		now = time.time()
+		created = now
+		if self.anonymize:
+			title, demand, justification = anonymize(title), anonymize(demand), anonymize(justification)
+			created = now - now % 86400
+		# The same Antrag is stored once, however often it was generated
+		normalized = ' '.join(' '.join((title, demand)).split()).casefold()
+		digest = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+		try:
+			with self._connect() as conn:
+				cursor = conn.execute(
+					'INSERT OR IGNORE INTO antrag_library (digest, title, demand, justification, party, created) VALUES (?, ?, ?, ?, ?, ?)',
+					(digest, title, demand, justification, party_name, created)
+				)
+				if self.retention > 0:
+					conn.execute('DELETE FROM antrag_library WHERE created < ?', (now - self.retention,))
+			self._count('added' if cursor.rowcount else 'duplicates')
+		except sqlite3.Error as e:
+			print(f"Warning: Library store failed: {e}")
+			self._count('errors')
+	
+	def search(self, text, limit=5):
+		"""Return stored Anträge similar to text, best first"""
+		terms = search_terms(text)
+		if not self.enabled or not terms:
+			return []
+		self._count('searches')
+		# Any term may match, the candidates are then filtered by how many terms they contain
+		query = ' OR '.join(f'"{term}"*' for term in terms)
+		cutoff = time.time() - self.retention if self.retention > 0 else 0
+		try:
+			with self._connect() as conn:
+				rows = conn.execute(
+					'SELECT l.id, l.title, l.demand, l.justification, l.party, l.created FROM antrag_library_fts '
+					'JOIN antrag_library l ON l.id = antrag_library_fts.rowid '
+					'WHERE antrag_library_fts MATCH ? AND l.created >= ? '
+					'ORDER BY bm25(antrag_library_fts, 4.0, 2.0, 1.0) LIMIT ?',
+					(query, cutoff, limit * 4)
+				).fetchall()
+		except sqlite3.Error as e:
+			print(f"Warning: Library search failed: {e}")
+			self._count('errors')
+			return []
+		required = min(2, len(terms))
+		results = []
+		for entry_id, title, demand, justification, party, created in rows:
+			words = set(_SEARCH_TERM.findall(_fold(f"{title} {demand} {justification}")))
+			matched = sum(1 for term in terms if any(word.startswith(term) for word in words))
+			if matched < required:
+				continue
+			results.append({
+				'id': entry_id,
+				'title': title,
+				'demand': demand,
+				'justification': justification,
+				'party_name': party,
+				'created': datetime.fromtimestamp(created).strftime('%Y-%m-%d'),
+				'email_body': FALLBACK_EMAIL.format(title=title)
+			})
+			if len(results) == limit:
+				break
+		if results:
+			self._count('hits')
+		return results
+	
+	def snapshot(self):
+		with self._lock:
+			stats = dict(self.stats)
+		stats['enabled'] = self.enabled
+		return stats
+
+class RateLimiter:
+	"""Token buckets per key, in memory or in a SQLite file shared by all processes
+	
+	A bucket holds up to capacity tokens and gains capacity / period tokens
+	per second, every request takes one. Without db_path the buckets are per
+	process, so with several uWSGI processes MEINANTRAG_RATE_LIMIT_DB has to
+	be set for the limits to hold. Buckets idle for idle_timeout seconds are
+	full again and get dropped. A failing database lets requests through.
+	"""
+	
+	def __init__(self, db_path=None, idle_timeout=3600, max_entries=10000):
+		self.db_path = db_path
+		self.idle_timeout = idle_timeout
+		self.max_entries = max_entries
+		self._buckets = OrderedDict()
+		self._local = threading.local()
+		self._lock = threading.Lock()
+		self._abandoned = []
+		self._takes = 0
+		self.stats = {'allowed': 0, 'limited': 0, 'errors': 0}
+		if self.db_path:
+			try:
+				# Not a cached connection, this runs at import in the uWSGI master before it forks
+				with closing(sqlite3.connect(self.db_path, timeout=5)) as conn, conn:
+					conn.execute('PRAGMA journal_mode=WAL')
+					conn.execute('CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+					conn.execute('CREATE INDEX IF NOT EXISTS rate_limits_updated ON rate_limits (updated)')
+			except sqlite3.Error as e:
+				print(f"Warning: Could not open rate limit database {self.db_path}: {e}")
+				self.db_path = None
+	
+	def _connect(self):
+		# One connection per thread, the lookup is on the path of every limited request
+		conn = getattr(self._local, 'conn', None)
+		if conn is None or self._local.pid != os.getpid():
+			if conn is not None:
+				# Inherited through fork(), SQLite connections must not be used in the child.
+				# Closing it here could checkpoint or remove the WAL file the parent still uses.
+				self._abandoned.append(conn)
+			conn = self._local.conn = sqlite3.connect(self.db_path, timeout=1)
+			self._local.pid = os.getpid()
+			# A lost bucket update after a power failure does not matter, skip the fsync
+			conn.execute('PRAGMA synchronous=NORMAL')
+		return conn
+	
+	def take(self, key, capacity, period):
+		"""Take a token from the bucket of key, returns 0 or the seconds until one is available"""
+		rate = capacity / period
+		now = time.time()
+		with self._lock:
+			self._takes += 1
+			prune = self._takes % 1000 == 0
+		try:
+			wait = self._take_shared(key, capacity, rate, now, prune) if self.db_path else self._take_local(key, capacity, rate, now)
+		except sqlite3.Error as e:
+			print(f"Warning: Rate limit lookup failed: {e}")
+			with self._lock:
+				self.stats['errors'] += 1
+			return 0
+		with self._lock:
+			self.stats['limited' if wait else 'allowed'] += 1
+		return wait
+	
+	def _take_local(self, key, capacity, rate, now):
+		with self._lock:
+			bucket = self._buckets.get(key)
+			tokens = capacity if bucket is None else min(capacity, bucket[0] + (now - bucket[1]) * rate)
+			if tokens < 1:
+				return (1 - tokens) / rate
+			self._buckets[key] = (tokens - 1, now)
+			self._buckets.move_to_end(key)
+			while len(self._buckets) > self.max_entries:
+				self._buckets.popitem(last=False)
+			return 0
+	
+	def _take_shared(self, key, capacity, rate, now, prune):
+		conn = self._connect()
+		with conn:
+			# One statement, so concurrent processes cannot both take the last token
+			cursor = conn.execute(
+				'INSERT INTO rate_limits (key, tokens, updated) VALUES (?, ?, ?) '
+				'ON CONFLICT (key) DO UPDATE SET tokens = min(?, tokens + (excluded.updated - updated) * ?) - 1, updated = excluded.updated '
+				'WHERE min(?, tokens + (excluded.updated - updated) * ?) >= 1',
+				(key, capacity - 1, now, capacity, rate, capacity, rate)
+			)
+			if prune:
+				conn.execute('DELETE FROM rate_limits WHERE updated < ?', (now - self.idle_timeout,))
+			if cursor.rowcount:
+				return 0
+			row = conn.execute('SELECT tokens, updated FROM rate_limits WHERE key = ?', (key,)).fetchone()
+		tokens = min(capacity, row[0] + (now - row[1]) * rate)
+		return max(0.0, (1 - tokens) / rate)
+	
+	def snapshot(self):
+		with self._lock:
+			return dict(self.stats, shared=bool(self.db_path))
+
+def _accepted_encodings(header):
+	"""Return the content codings of an Accept-Encoding header that are not refused with q=0"""
+	encodings = set()
+	for item in (header or '').split(','):
+		coding, _, params = item.partition(';')
+		coding = coding.strip().lower()
+		params = params.replace(' ', '')
+		quality = 1.0
+		if params.startswith('q='):
+			try:
+				quality = float(params[2:])
+			except ValueError:
+				quality = 0.0
+		if coding and quality > 0:
+			encodings.add(coding)
+	return encodings
+
+class PrerenderedPage:
+	"""Immutable response body with precompressed variants and strong ETags
+	
+	precompressed maps 'gzip' and 'br' to bodies compressed elsewhere (e.g. by
+	the asset build); with compress=False no other variants are created.
+	"""
+	
+	def __init__(self, content_type, body, cache_control=None, compress=True, precompressed=None, brotli_quality=11):
+		self.content_type = content_type
+		self.cache_control = cache_control or PAGE_CACHE_CONTROL
+		digest = hashlib.sha256(body).hexdigest()[:32]
+		precompressed = precompressed or {}
+		self.variants = {None: (body, f'"{digest}"')}
+		if 'gzip' in precompressed or compress:
+			self.variants['gzip'] = (precompressed.get('gzip') or gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gzip"')
+		if 'br' in precompressed or (compress and BROTLI_AVAILABLE):
+			self.variants['br'] = (precompressed.get('br') or brotli.compress(body, quality=brotli_quality), f'"{digest}-br"')
+	
+	def respond(self, req, resp):
+		"""Send the best variant for the client, or 304 if it already has it"""
+		accepted = _accepted_encodings(req.get_header('Accept-Encoding'))
+		encoding = None
+		if 'br' in accepted and 'br' in self.variants:
+			encoding = 'br'
+		elif 'gzip' in accepted and 'gzip' in self.variants:
+			encoding = 'gzip'
+		body, etag = self.variants[encoding]
 		
-		# Last resort: try to find any templates directory
-		for root, dirs, files in os.walk('/nix/store'):
-			if 'templates' in dirs and 'index.html' in os.listdir(os.path.join(root, 'templates')):
-				return os.path.join(root, 'templates')
+		resp.set_header('ETag', etag)
+		resp.set_header('Cache-Control', self.cache_control)
+		if len(self.variants) > 1:
+			resp.set_header('Vary', 'Accept-Encoding')
 		
-		# Fallback to current directory
-		return dev_template_dir
+		if_none_match = req.get_header('If-None-Match')
+		if if_none_match:
+			# If-None-Match uses the weak comparison
+			candidates = [tag.strip()[2:] if tag.strip().startswith('W/') else tag.strip() for tag in if_none_match.split(',')]
+			if etag in candidates or '*' in candidates:
+				resp.status = falcon.HTTP_304
+				return
+		
+		resp.content_type = self.content_type
+		if encoding:
+			resp.set_header('Content-Encoding', encoding)
+		resp.data = body
 
-class MeinAntragApp(BaseTemplateResource):
-	def __init__(self):
-		# Setup Jinja2 template environment
-		template_dir = self._get_template_dir()
-		print(f"Using template directory: {template_dir}")
-		self.jinja_env = Environment(loader=FileSystemLoader(template_dir))
+class PrerenderedResource:
+	"""Base class for GET resources whose output only depends on the configuration
+	
+	The body is rendered once and served from memory. With MEINANTRAG_DEV_RELOAD
+	set, it is rendered again whenever one of _source_files() changes.
+	"""
+	
+	content_type = 'text/html; charset=utf-8'
+	
+	def render(self):
+		"""Return the response body as text"""
+		raise NotImplementedError
+	
+	def _source_files(self):
+		"""Files the body is rendered from"""
+		return ()
+	
+	def _source_mtimes(self):
+		mtimes = []
+		for path in self._source_files():
+			try:
+				mtimes.append(os.stat(path).st_mtime_ns)
+			except OSError:
+				mtimes.append(None)
+		return mtimes
+	
+	def _get_page(self):
+		page = getattr(self, '_page', None)
+		if page is not None and DEV_RELOAD:
+			mtimes = self._source_mtimes()
+			if mtimes != self._page_mtimes:
+				page = None
+		if page is None:
+			self._page_mtimes = self._source_mtimes() if DEV_RELOAD else None
+			page = self._page = PrerenderedPage(self.content_type, self.render().encode('utf-8'))
+		return page
 	
 	def on_get(self, req, resp):
-		"""Serve the main page"""
-		template = self.jinja_env.get_template('index.html')
-		resp.content_type = 'text/html; charset=utf-8'
-		resp.text = template.render(
+		self._get_page().respond(req, resp)
+
+# Content-hashed file names, e.g. dist/app.3f2a9c1b7e4d.css, never change their content
+_HASHED_ASSET = re.compile(r'\.[0-9a-f]{8,}\.[A-Za-z0-9]+$')
+STATIC_CACHE_CONTROL = f"public, max-age={int(os.environ.get('MEINANTRAG_STATIC_MAX_AGE', '3600'))}"
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+_COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'application/xml', 'image/svg+xml')
+
+class StaticResource:
+	"""Files below a directory, read once and served from memory with gzip and brotli variants
+	
+	The .gz and .br siblings written by the asset build are used as they are,
+	other text files are compressed on first use. Content-hashed file names
+	are sent with Cache-Control: immutable. With MEINANTRAG_DEV_RELOAD set, a
+	file is read again when it changes.
+	"""
+	
+	# Larger files are read from disk on every request instead of being kept in memory
+	max_cached_size = 4 * 1024 * 1024
+	
+	def __init__(self, directory):
+		self.directory = os.path.realpath(directory)
+		self._files = {}
+		self._lock = threading.Lock()
+	
+	def _resolve(self, path):
+		"""Absolute path of a file below the directory, None for anything else"""
+		if '\x00' in path:
+			return None
+		full = os.path.realpath(os.path.join(self.directory, path))
+		if not full.startswith(self.directory + os.sep) or not os.path.isfile(full):
+			return None
+		return full
+	
+	def _read_sibling(self, full, suffix, stat):
+		try:
+			sibling = os.stat(full + suffix)
+			# A stale sibling from an older build would serve old content
+			if sibling.st_mtime_ns < stat.st_mtime_ns:
+				return None
+			with open(full + suffix, 'rb') as f:
+				return f.read()
+		except OSError:
+			return None
+	
+	def _content_type(self, full):
+		content_type = mimetypes.guess_type(full)[0] or 'application/octet-stream'
+		if content_type.startswith('text/') or content_type == 'application/javascript':
+			content_type += '; charset=utf-8'
+		return content_type
+	
+	def _load(self, full, stat):
+		with open(full, 'rb') as f:
+			body = f.read()
+		content_type = self._content_type(full)
+		precompressed = {}
+		for encoding, suffix in (('gzip', '.gz'), ('br', '.br')):
+			data = self._read_sibling(full, suffix, stat)
+			if data is not None:
+				precompressed[encoding] = data
+		compress = len(body) > 512 and content_type.startswith(_COMPRESSIBLE_TYPES)
+		cache_control = IMMUTABLE_CACHE_CONTROL if _HASHED_ASSET.search(full) else STATIC_CACHE_CONTROL
+		# Brotli's highest quality takes too long for a first request of a large file
+		return PrerenderedPage(content_type, body, cache_control=cache_control, compress=compress, precompressed=precompressed, brotli_quality=9)
+	
+	def get(self, path):
+		"""Return the PrerenderedPage for path, the absolute path of a file too large to cache, or None"""
+		cached = self._files.get(path)
+		if cached is not None and not DEV_RELOAD:
+			return cached[1]
+		full = self._resolve(path)
+		if full is None:
+			return None
+		stat = os.stat(full)
+		if stat.st_size > self.max_cached_size:
+			return full
+		key = (stat.st_mtime_ns, stat.st_size)
+		if cached is not None and cached[0] == key:
+			return cached[1]
+		page = self._load(full, stat)
+		with self._lock:
+			self._files[path] = (key, page)
+		return page
+	
+	def on_get(self, req, resp, path):
+		page = self.get(path)
+		if page is None:
+			raise falcon.HTTPNotFound()
+		if isinstance(page, str):
+			resp.content_type = self._content_type(page)
+			resp.set_header('Cache-Control', STATIC_CACHE_CONTROL)
+			resp.content_length = os.path.getsize(page)
+			resp.stream = open(page, 'rb')
+			return
+		page.respond(req, resp)
+	
+	on_head = on_get
+
+_asset_manifest = None
+
+def asset_manifest():
+	"""Bundle names and their content-hashed paths below /static, from dist/manifest.json of the asset build"""
+	global _asset_manifest
+	if _asset_manifest is None or DEV_RELOAD:
+		manifest = {}
+		if STATIC_DIR:
+			try:
+				with open(os.path.join(STATIC_DIR, 'dist', 'manifest.json')) as f:
+					manifest = json.load(f)
+			except (OSError, ValueError):
+				pass
+		_asset_manifest = manifest
+	return _asset_manifest
+
+def asset_url(name):
+	"""URL of a static file, the content-hashed bundle if the manifest has one"""
+	return '/static/' + asset_manifest().get(name, name)
+
+def has_asset_bundle(name):
+	"""Whether the asset build produced the bundle, templates fall back to the single files otherwise"""
+	return name in asset_manifest()
+
+_template_dir = None
+_jinja_env = None
+_jinja_lock = threading.Lock()
+
+def get_template_dir():
+	"""Get the template directory path, handling both development and installed environments"""
+	global _template_dir
+	if _template_dir is not None:
+		return _template_dir
+	
+	_template_dir = _find_data_dir('templates', os.environ.get('MEINANTRAG_TEMPLATES_DIR'))
+	return _template_dir
+
+def _get_compiled_templates_dir(template_dir):
+	"""Directory with templates precompiled by --compile-templates, if there is one"""
+	compiled_dir = os.environ.get('MEINANTRAG_COMPILED_TEMPLATES_DIR')
+	if not compiled_dir:
+		compiled_dir = os.path.join(os.path.dirname(os.path.abspath(template_dir)), 'templates-compiled')
+	return compiled_dir if os.path.isdir(compiled_dir) else None
+
+def _create_jinja_env(template_dir, compiled_dir=None):
+	from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, ModuleLoader, ChoiceLoader
+	
+	loader = FileSystemLoader(template_dir)
+	if compiled_dir:
+		# Compiled templates first, the sources stay as fallback for templates added later
+		loader = ChoiceLoader([ModuleLoader(compiled_dir), loader])
+	
+	bytecode_cache = None
+	if not compiled_dir:
+		cache_dir = os.environ.get('MEINANTRAG_TEMPLATE_CACHE_DIR')
+		try:
+			if cache_dir:
+				os.makedirs(cache_dir, exist_ok=True)
+				bytecode_cache = FileSystemBytecodeCache(cache_dir)
+			else:
+				# Per-user directory in the system temp dir
+				bytecode_cache = FileSystemBytecodeCache()
+		except Exception as e:
+			print(f"Warning: Template bytecode cache disabled: {e}")
+	
+	# Checking template mtimes is only needed while developing
+	env = Environment(loader=loader, bytecode_cache=bytecode_cache, auto_reload=DEV_RELOAD)
+	env.globals.update(asset_url=asset_url, has_asset_bundle=has_asset_bundle)
+	return env
+
+def get_jinja_env():
+	"""Process-wide Jinja2 environment shared by all resources"""
+	global _jinja_env
+	with _jinja_lock:
+		if _jinja_env is None:
+			template_dir = get_template_dir()
+			compiled_dir = None if DEV_RELOAD else _get_compiled_templates_dir(template_dir)
+			print(f"Using template directory: {template_dir}" + (f" (compiled: {compiled_dir})" if compiled_dir else ""))
+			_jinja_env = _create_jinja_env(template_dir, compiled_dir)
+		return _jinja_env
+
+def compile_templates(target_dir):
+	"""Compile all templates to Python modules, e.g. at package build time"""
+	env = _create_jinja_env(get_template_dir())
+	env.compile_templates(target_dir, zip=None, ignore_errors=False)
+	print(f"Compiled templates from {get_template_dir()} to {target_dir}")
+
+class BaseTemplateResource(PrerenderedResource):
+	"""Base class for resources that need template rendering"""
+	
+	template_name = None
+	
+	@property
+	def jinja_env(self):
+		return get_jinja_env()
+	
+	def _source_files(self):
+		# Pages extend base.html, so a change there affects all of them
+		template_dir = get_template_dir()
+		sources = [os.path.join(template_dir, name) for name in (self.template_name, 'base.html')]
+		# A new asset build changes the bundle URLs
+		if STATIC_DIR:
+			sources.append(os.path.join(STATIC_DIR, 'dist', 'manifest.json'))
+		return sources
+
+class MeinAntragApp(BaseTemplateResource):
+	template_name = 'index.html'
+	
+	def render(self):
+		"""Render the main page"""
+		template = self.jinja_env.get_template(self.template_name)
+		return template.render(
 			meta_title='MeinAntrag – Anträge an die Karlsruher Stadtverwaltung',
 			meta_description='Erstelle einfach Vorlagen für Anfragen oder Anträge an die Karlsruher Stadtverwaltung zu deinem persönlichen Thema und schicke diese direkt an eine Stadtratsfraktion!',
-			canonical_url=f"{SITE_BASE_URL}/"
+			canonical_url=f"{SITE_BASE_URL}/",
+			max_anliegen_length=MAX_ANLIEGEN_LENGTH,
+			library_enabled=antrag_library.enabled
 		)
 
 class ImpressumResource(BaseTemplateResource):
-	def __init__(self):
-		template_dir = self._get_template_dir()
-		self.jinja_env = Environment(loader=FileSystemLoader(template_dir))
+	template_name = 'impressum.html'
 	
-	def on_get(self, req, resp):
-		"""Serve the Impressum page"""
-		template = self.jinja_env.get_template('impressum.html')
-		resp.content_type = 'text/html; charset=utf-8'
-		resp.text = template.render(
+	def render(self):
+		"""Render the Impressum page"""
+		template = self.jinja_env.get_template(self.template_name)
+		return template.render(
 			meta_title='Impressum – MeinAntrag',
 			meta_description='Impressum für MeinAntrag.',
 			canonical_url=f"{SITE_BASE_URL}/impressum",
@@ -102,218 +1626,1470 @@ class ImpressumResource(BaseTemplateResource):
 		)
 
 class DatenschutzResource(BaseTemplateResource):
-	def __init__(self):
-		template_dir = self._get_template_dir()
-		self.jinja_env = Environment(loader=FileSystemLoader(template_dir))
+	template_name = 'datenschutz.html'
 	
-	def on_get(self, req, resp):
-		"""Serve the Datenschutz page"""
-		template = self.jinja_env.get_template('datenschutz.html')
-		resp.content_type = 'text/html; charset=utf-8'
-		resp.text = template.render(
+	def render(self):
+		"""Render the Datenschutz page"""
+		template = self.jinja_env.get_template(self.template_name)
+		return template.render(
 			meta_title='Datenschutz – MeinAntrag',
 			meta_description='Datenschutzerklärung für MeinAntrag. Keine Cookies, es werden nur Anfragen an die FragDenStaat-API gestellt.',
 			canonical_url=f"{SITE_BASE_URL}/datenschutz",
-			noindex=True
+			noindex=True,
+			library_enabled=antrag_library.enabled,
+			library_retention_days=round(antrag_library.retention / 86400),
+			library_anonymize=antrag_library.anonymize
 		)
 
-class GenerateAntragResource:
-	def __init__(self):
-		# Initialize Gemini API
-		api_key = os.environ.get('GOOGLE_GEMINI_API_KEY')
+class LLMBackend:
+	"""Text generation backend
+	
+	generate() returns the complete text, stream() yields it in pieces. With
+	structured=True the answer is JSON for STRUCTURED_SCHEMA, timeout limits
+	the upstream request (default LLM_TIMEOUT). The async variants default to
+	running the blocking ones in a worker thread.
+	"""
+	
+	name = None
+	
+	def __init__(self, model):
+		self.model = model
+	
+	def generate(self, prompt, structured=False, timeout=None):
+		raise NotImplementedError
+	
+	def is_transient(self, error):
+		"""Whether a failed call may succeed when it is repeated"""
+		return isinstance(error, (TimeoutError, FutureTimeoutError, asyncio.TimeoutError, ConnectionError))
+	
+	def _count_tokens(self, prompt_tokens, completion_tokens, cached_tokens=0):
+		"""Record the token usage reported by the upstream API, cached tokens are part of the prompt tokens"""
+		for kind, count in (('prompt', prompt_tokens), ('completion', completion_tokens), ('cached', cached_tokens)):
+			if count:
+				METRICS.inc('meinantrag_llm_tokens_total', 'Tokens used by LLM calls', count, backend=self.name, model=self.model, kind=kind)
+	
+	def stream(self, prompt, structured=False, timeout=None):
+		yield self.generate(prompt, structured, timeout)
+	
+	async def generate_async(self, prompt, structured=False, timeout=None):
+		return await run_in_thread(self.generate, prompt, structured, timeout)
+	
+	async def stream_async(self, prompt, structured=False, timeout=None):
+		async for piece in iterate_in_thread(self.stream(prompt, structured, timeout)):
+			yield piece
+
+class GeminiBackend(LLMBackend):
+	"""Gemini API, static prompt prefixes go into context caches once they are long enough"""
+	
+	name = 'gemini'
+	
+	def __init__(self, model, api_key):
+		super().__init__(model)
+		import google.generativeai as genai
+		genai.configure(api_key=api_key)
+		self.genai = genai
+		self.client = genai.GenerativeModel(model)
+		# Template version: (model on the context cache or None, renew at)
+		self._context_caches = {}
+		self._context_lock = threading.Lock()
+	
+	def _request(self, prompt):
+		"""Model and contents for prompt, only the variable part if the prefix is in a context cache"""
+		template = getattr(prompt, 'template', None)
+		if template is None or PROMPT_CACHE_TTL <= 0 or template.prefix_tokens < PROMPT_CACHE_MIN_TOKENS:
+			return self.client, prompt
+		now = time.monotonic()
+		with self._context_lock:
+			client, renew_at = self._context_caches.get(template.version, (None, 0.0))
+			if now >= renew_at:
+				# Requests keep going without the new cache until it exists
+				self._context_caches[template.version] = (client, now + PROMPT_CACHE_TTL)
+				threading.Thread(target=self._create_context_cache, args=(template,), name='meinantrag-context-cache', daemon=True).start()
+		if client is None:
+			return self.client, prompt
+		return client, prompt[len(template.prefix):]
+	
+	def _create_context_cache(self, template):
+		from google.generativeai import caching
+		try:
+			cached = caching.CachedContent.create(
+				model=self.model,
+				display_name=f"meinantrag-{template.name}-{template.version}",
+				contents=[template.prefix],
+				ttl=timedelta(seconds=PROMPT_CACHE_TTL)
+			)
+			client = self.genai.GenerativeModel.from_cached_content(cached_content=cached)
+		except Exception as e:
+			# E.g. a prefix below the minimum of the model, tried again after the TTL
+			print(f"Warning: Could not create a context cache for the {template.name} prompt: {e}")
+			with self._context_lock:
+				self._context_caches[template.version] = (None, time.monotonic() + PROMPT_CACHE_TTL)
+			return
+		METRICS.inc('meinantrag_llm_context_caches_total', 'Context caches created for static prompt prefixes', backend=self.name, model=self.model, prompt=template.name)
+		with self._context_lock:
+			# Renewed before it expires upstream
+			self._context_caches[template.version] = (client, time.monotonic() + PROMPT_CACHE_TTL * 0.9)
+	
+	def _kwargs(self, structured, timeout):
+		kwargs = {'request_options': {'timeout': timeout or LLM_TIMEOUT}}
+		if structured:
+			kwargs['generation_config'] = {'response_mime_type': 'application/json', 'response_schema': STRUCTURED_SCHEMA}
+		return kwargs
+	
+	def _text(self, chunk):
+		try:
+			return chunk.text
+		except ValueError:
+			# Chunks without text parts (e.g. only safety ratings)
+			return ''
+	
+	def _usage(self, response):
+		usage = getattr(response, 'usage_metadata', None)
+		if usage is not None:
+			self._count_tokens(getattr(usage, 'prompt_token_count', 0), getattr(usage, 'candidates_token_count', 0), getattr(usage, 'cached_content_token_count', 0))
+	
+	def is_transient(self, error):
+		from google.api_core import exceptions
+		# ServerError covers 500, 503 and 504 (DeadlineExceeded)
+		return isinstance(error, (exceptions.ServerError, exceptions.TooManyRequests)) or super().is_transient(error)
+	
+	def generate(self, prompt, structured=False, timeout=None):
+		client, contents = self._request(prompt)
+		response = client.generate_content(contents, **self._kwargs(structured, timeout))
+		self._usage(response)
+		return response.text
+	
+	def stream(self, prompt, structured=False, timeout=None):
+		client, contents = self._request(prompt)
+		# The usage of the last chunk covers the whole answer
+		chunk = None
+		for chunk in client.generate_content(contents, stream=True, **self._kwargs(structured, timeout)):
+			text = self._text(chunk)
+			if text:
+				yield text
+		self._usage(chunk)
+	
+	async def generate_async(self, prompt, structured=False, timeout=None):
+		client, contents = self._request(prompt)
+		response = await client.generate_content_async(contents, **self._kwargs(structured, timeout))
+		self._usage(response)
+		return response.text
+	
+	async def stream_async(self, prompt, structured=False, timeout=None):
+		client, contents = self._request(prompt)
+		response = await client.generate_content_async(contents, stream=True, **self._kwargs(structured, timeout))
+		chunk = None
+		async for chunk in response:
+			text = self._text(chunk)
+			if text:
+				yield text
+		self._usage(chunk)
+
+class OpenAICompatibleBackend(LLMBackend):
+	"""Chat completions API of OpenAI or a compatible server (llama.cpp, vLLM, Ollama)"""
+	
+	name = 'openai'
+	
+	def __init__(self, model, base_url, api_key=None):
+		super().__init__(model)
+		import requests
+		self.url = base_url.rstrip('/') + '/chat/completions'
+		self.session = requests.Session()
 		if api_key:
-			genai.configure(api_key=api_key)
-			self.model = genai.GenerativeModel('gemini-3-pro-preview')
+			self.session.headers['Authorization'] = f'Bearer {api_key}'
+	
+	def _payload(self, prompt, structured, stream=False):
+		payload = {'model': self.model, 'messages': [{'role': 'user', 'content': prompt}], 'stream': stream}
+		if stream:
+			# Ask for a final chunk with the token usage
+			payload['stream_options'] = {'include_usage': True}
+		if structured:
+			schema = dict(STRUCTURED_SCHEMA, additionalProperties=False)
+			payload['response_format'] = {'type': 'json_schema', 'json_schema': {'name': 'antrag', 'strict': True, 'schema': schema}}
+		return payload
+	
+	def is_transient(self, error):
+		import requests
+		if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+			return True
+		if isinstance(error, requests.HTTPError) and error.response is not None:
+			status = error.response.status_code
+			return status in (408, 429) or status >= 500
+		return super().is_transient(error)
+	
+	def generate(self, prompt, structured=False, timeout=None):
+		response = self.session.post(self.url, json=self._payload(prompt, structured), timeout=timeout or LLM_TIMEOUT)
+		response.raise_for_status()
+		data = response.json()
+		self._usage(data)
+		return data['choices'][0]['message']['content'] or ''
+	
+	def _usage(self, data):
+		usage = data.get('usage')
+		if usage:
+			# Servers cache prompt prefixes of 1024 tokens and more on their own
+			details = usage.get('prompt_tokens_details') or {}
+			self._count_tokens(usage.get('prompt_tokens'), usage.get('completion_tokens'), details.get('cached_tokens'))
+	
+	def stream(self, prompt, structured=False, timeout=None):
+		with self.session.post(self.url, json=self._payload(prompt, structured, stream=True), timeout=timeout or LLM_TIMEOUT, stream=True) as response:
+			response.raise_for_status()
+			response.encoding = 'utf-8'
+			for line in response.iter_lines(decode_unicode=True):
+				if not line or not line.startswith('data:'):
+					continue
+				data = line[5:].strip()
+				if data == '[DONE]':
+					return
+				data = json.loads(data)
+				self._usage(data)
+				choices = data.get('choices') or [{}]
+				text = (choices[0].get('delta') or {}).get('content')
+				if text:
+					yield text
+
+class FakeBackend(LLMBackend):
+	"""Deterministic offline backend for load tests, answers after MEINANTRAG_FAKE_LATENCY seconds"""
+	
+	name = 'fake'
+	
+	def __init__(self, model='fake', latency=0.0, chunks=8):
+		super().__init__(model)
+		self.latency = latency
+		self.chunks = chunks
+	
+	def _answer(self, prompt, structured):
+		digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+		antrag_prefix = PROMPTS['antrag'].prefix
+		anliegen = prompt[len(antrag_prefix):] if prompt.startswith(antrag_prefix) else prompt.rpartition('Anliegen:')[2]
+		topic = ' '.join(anliegen.split()[:8])
+		title = f"Testantrag {digest[:8]}"
+		demand = f"Die Stadtverwaltung wird beauftragt, das Anliegen „{topic}“ zu prüfen und dem Gemeinderat zu berichten."
+		justification = f"Das Anliegen wurde von Bürgerinnen und Bürgern eingebracht. Prüfnummer {digest[8:16]}."
+		email_body = f"Guten Tag,\n\nich möchte Sie bitten, sich des Anliegens „{topic}“ anzunehmen. Eine Antragsvorlage habe ich im Anhang beigefügt.\n\nMit freundlichen Grüßen,"
+		if structured:
+			answer = json.dumps({'title': title, 'demand': demand, 'justification': justification, 'email_body': email_body}, ensure_ascii=False)
+		elif prompt.startswith(PROMPTS['email'].prefix[:40]):
+			answer = email_body
+		elif prompt.startswith(PROMPTS['summary'].prefix[:40]):
+			answer = ' '.join(anliegen.split()[:60])
 		else:
-			self.model = None
+			answer = f"{title}\n\n{demand}\n\nBegründung\n{justification}"
+		self._count_tokens(estimate_tokens(prompt), estimate_tokens(answer))
+		return answer
 	
-	def _remove_markdown(self, text):
-		"""Remove markdown formatting from text"""
-		if not text:
+	def _pieces(self, text):
+		size = max(1, -(-len(text) // self.chunks))
+		return [text[i:i + size] for i in range(0, len(text), size)]
+	
+	def _timed_out(self, timeout):
+		return timeout is not None and self.latency > timeout
+	
+	def generate(self, prompt, structured=False, timeout=None):
+		if self._timed_out(timeout):
+			time.sleep(timeout)
+			raise TimeoutError('fake backend timed out')
+		time.sleep(self.latency)
+		return self._answer(prompt, structured)
+	
+	def stream(self, prompt, structured=False, timeout=None):
+		pieces = self._pieces(self._answer(prompt, structured))
+		for piece in pieces:
+			time.sleep(self.latency / len(pieces))
+			yield piece
+	
+	async def generate_async(self, prompt, structured=False, timeout=None):
+		if self._timed_out(timeout):
+			await asyncio.sleep(timeout)
+			raise TimeoutError('fake backend timed out')
+		await asyncio.sleep(self.latency)
+		return self._answer(prompt, structured)
+	
+	async def stream_async(self, prompt, structured=False, timeout=None):
+		pieces = self._pieces(self._answer(prompt, structured))
+		for piece in pieces:
+			await asyncio.sleep(self.latency / len(pieces))
+			yield piece
+
+class CircuitOpenError(Exception):
+	"""Raised while the circuit breaker rejects LLM calls, retry_after is a hint in seconds"""
+	
+	def __init__(self, message, retry_after):
+		super().__init__(message)
+		self.retry_after = retry_after
+
+class CircuitBreaker:
+	"""Fail fast while the upstream LLM API is down
+	
+	After failure_threshold failed attempts in a row the circuit opens and
+	calls are rejected for reset_timeout seconds. Then a single probe call is
+	let through (half-open): its success closes the circuit, a failure opens
+	it again.
+	"""
+	
+	def __init__(self, failure_threshold=5, reset_timeout=30.0):
+		self.failure_threshold = failure_threshold
+		self.reset_timeout = reset_timeout
+		self.state = 'closed'
+		self.failures = 0
+		self._opened_at = 0.0
+		self._probing = False
+		self._lock = threading.Lock()
+		self.stats = {'opened': 0, 'rejected': 0}
+	
+	def _reject(self, retry_after):
+		self.stats['rejected'] += 1
+		METRICS.inc('meinantrag_llm_circuit_rejected_total', 'LLM calls rejected by the open circuit breaker')
+		return CircuitOpenError('Das Sprachmodell ist derzeit nicht erreichbar, bitte später erneut versuchen', retry_after)
+	
+	def before_call(self):
+		"""Raise CircuitOpenError unless a call may go upstream now"""
+		if self.failure_threshold <= 0:
+			return
+		with self._lock:
+			if self.state == 'open':
+				remaining = self._opened_at + self.reset_timeout - time.monotonic()
+				if remaining > 0:
+					raise self._reject(max(1, math.ceil(remaining)))
+				self.state = 'half-open'
+			if self.state == 'half-open':
+				if self._probing:
+					raise self._reject(1)
+				self._probing = True
+	
+	def record_success(self):
+		"""The upstream answered, also used for errors that are not its fault"""
+		with self._lock:
+			self.state = 'closed'
+			self.failures = 0
+			self._probing = False
+	
+	def record_failure(self):
+		with self._lock:
+			self.failures += 1
+			self._probing = False
+			if self.state == 'half-open' or (self.state == 'closed' and self.failures >= self.failure_threshold):
+				self.state = 'open'
+				self._opened_at = time.monotonic()
+				self.stats['opened'] += 1
+				METRICS.inc('meinantrag_llm_circuit_opened_total', 'Times the LLM circuit breaker opened')
+				print(f"LLM circuit breaker open for {self.reset_timeout:g} s after {self.failures} failed attempts")
+	
+	def release(self):
+		"""Give up the probe of a call that ended without a result, e.g. cancelled"""
+		with self._lock:
+			self._probing = False
+	
+	def snapshot(self):
+		with self._lock:
+			return dict(self.stats, state=self.state, failures=self.failures)
+
+class LatencyWindow:
+	"""Durations of the last successful calls, for the hedging delay"""
+	
+	def __init__(self, size=200, min_samples=20):
+		self._samples = deque(maxlen=size)
+		self.min_samples = min_samples
+	
+	def add(self, seconds):
+		self._samples.append(seconds)
+	
+	def percentile(self, fraction):
+		"""None until there are min_samples durations"""
+		samples = sorted(self._samples)
+		if len(samples) < self.min_samples:
+			return None
+		return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+class ResilientBackend(LLMBackend):
+	"""Deadlines, retries, hedging and a circuit breaker around another backend
+	
+	A call has timeout seconds (default LLM_TIMEOUT) in total, every attempt
+	at most attempt_timeout of them. Transient errors are retried with full
+	jitter exponential backoff while the deadline allows it. With hedge=True a
+	second request is sent when the first one is still running after the p95
+	of recent calls, the first answer wins. Streams are retried only until the
+	first piece arrived and are never hedged. GenerationTimeoutError is raised
+	when the deadline is used up.
+	"""
+	
+	def __init__(self, backend, breaker, retries=2, attempt_timeout=None, hedge=False, backoff_base=0.25, backoff_max=4.0):
+		super().__init__(backend.model)
+		self.backend = backend
+		self.name = backend.name
+		self.breaker = breaker
+		self.retries = retries
+		self.attempt_timeout = attempt_timeout or LLM_TIMEOUT
+		self.hedge = hedge
+		self.backoff_base = backoff_base
+		self.backoff_max = backoff_max
+		self.latencies = LatencyWindow()
+		self._executor = None
+		self._executor_lock = threading.Lock()
+	
+	def is_transient(self, error):
+		return self.backend.is_transient(error)
+	
+	def _hedge_executor(self):
+		# Callers already run in LLM_EXECUTOR, the attempts need their own threads
+		with self._executor_lock:
+			if self._executor is None:
+				self._executor = ThreadPoolExecutor(max_workers=2 * LLM_WORKERS, thread_name_prefix='meinantrag-hedge')
+			return self._executor
+	
+	def _hedge_delay(self, attempt_timeout):
+		"""Seconds after which a hedge request is sent, None for no hedging"""
+		if not self.hedge:
+			return None
+		delay = self.latencies.percentile(0.95)
+		return delay if delay is not None and delay < attempt_timeout else None
+	
+	def _remaining(self, deadline):
+		remaining = deadline - time.monotonic()
+		if remaining <= 0:
+			raise GenerationTimeoutError('Zeitüberschreitung bei der Generierung des Antrags')
+		return remaining
+	
+	def _count(self, outcome):
+		METRICS.inc('meinantrag_llm_attempts_total', 'Upstream LLM attempts including retries and hedges', backend=self.name, model=self.model, outcome=outcome)
+	
+	def _failed(self, error, attempt, deadline):
+		"""Handle a failed attempt, returns the backoff in seconds or raises"""
+		if not self.is_transient(error):
+			# The upstream answered, e.g. 400 for an invalid request
+			self.breaker.record_success()
+			self._count('error')
+			raise error
+		self.breaker.record_failure()
+		self._count('transient')
+		remaining = deadline - time.monotonic()
+		if remaining <= 0:
+			raise GenerationTimeoutError('Zeitüberschreitung bei der Generierung des Antrags') from error
+		if attempt >= self.retries:
+			raise error
+		print(f"LLM attempt {attempt + 1} failed, retrying: {error!r}")
+		METRICS.inc('meinantrag_llm_retries_total', 'Retried LLM attempts', backend=self.name, model=self.model)
+		return min(remaining, random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+	
+	def _succeeded(self, started):
+		self.breaker.record_success()
+		self.latencies.add(time.monotonic() - started)
+		self._count('ok')
+	
+	def _hedged(self, winner):
+		METRICS.inc('meinantrag_llm_hedges_total', 'Hedge requests sent for slow LLM calls', backend=self.name, model=self.model, winner=winner)
+	
+	def _attempt(self, prompt, structured, deadline):
+		attempt_timeout = min(self.attempt_timeout, self._remaining(deadline))
+		delay = self._hedge_delay(attempt_timeout)
+		if delay is None:
+			return self.backend.generate(prompt, structured, attempt_timeout)
+		executor = self._hedge_executor()
+		primary = executor.submit(self.backend.generate, prompt, structured, attempt_timeout)
+		done, _ = wait([primary], timeout=delay)
+		if done:
+			return primary.result()
+		hedge = executor.submit(self.backend.generate, prompt, structured, min(self.attempt_timeout, self._remaining(deadline)))
+		pending = {primary, hedge}
+		error = None
+		# The loser keeps running until its own timeout, the result is dropped
+		while pending:
+			done, pending = wait(pending, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+			if not done:
+				break
+			for future in done:
+				if future.exception() is None:
+					self._hedged('hedge' if future is hedge else 'primary')
+					return future.result()
+				error = future.exception()
+		self._hedged('none')
+		raise error or TimeoutError('LLM attempt timed out')
+	
+	async def _attempt_async(self, prompt, structured, deadline):
+		attempt_timeout = min(self.attempt_timeout, self._remaining(deadline))
+		delay = self._hedge_delay(attempt_timeout)
+		if delay is None:
+			return await self.backend.generate_async(prompt, structured, attempt_timeout)
+		primary = asyncio.ensure_future(self.backend.generate_async(prompt, structured, attempt_timeout))
+		pending = {primary}
+		try:
+			done, _ = await asyncio.wait(pending, timeout=delay)
+			if done:
+				return primary.result()
+			hedge = asyncio.ensure_future(self.backend.generate_async(prompt, structured, min(self.attempt_timeout, self._remaining(deadline))))
+			pending.add(hedge)
+			error = None
+			while pending:
+				done, pending = await asyncio.wait(pending, timeout=max(0, deadline - time.monotonic()), return_when=asyncio.FIRST_COMPLETED)
+				if not done:
+					break
+				for task in done:
+					if task.exception() is None:
+						self._hedged('hedge' if task is hedge else 'primary')
+						return task.result()
+					error = task.exception()
+			self._hedged('none')
+			raise error or TimeoutError('LLM attempt timed out')
+		finally:
+			for task in pending:
+				task.cancel()
+	
+	def generate(self, prompt, structured=False, timeout=None):
+		deadline = time.monotonic() + (timeout or LLM_TIMEOUT)
+		attempt = 0
+		while True:
+			self.breaker.before_call()
+			started = time.monotonic()
+			try:
+				text = self._attempt(prompt, structured, deadline)
+			except GenerationTimeoutError:
+				self.breaker.release()
+				raise
+			except Exception as e:
+				time.sleep(self._failed(e, attempt, deadline))
+				attempt += 1
+				continue
+			self._succeeded(started)
 			return text
+	
+	async def generate_async(self, prompt, structured=False, timeout=None):
+		deadline = time.monotonic() + (timeout or LLM_TIMEOUT)
+		attempt = 0
+		while True:
+			self.breaker.before_call()
+			started = time.monotonic()
+			try:
+				text = await self._attempt_async(prompt, structured, deadline)
+			except (GenerationTimeoutError, asyncio.CancelledError):
+				self.breaker.release()
+				raise
+			except Exception as e:
+				await asyncio.sleep(self._failed(e, attempt, deadline))
+				attempt += 1
+				continue
+			self._succeeded(started)
+			return text
+	
+	def stream(self, prompt, structured=False, timeout=None):
+		deadline = time.monotonic() + (timeout or LLM_TIMEOUT)
+		attempt = 0
+		while True:
+			self.breaker.before_call()
+			started = time.monotonic()
+			try:
+				# The whole answer has to arrive within the deadline, not only the first piece
+				pieces = self.backend.stream(prompt, structured, self._remaining(deadline))
+				first = next(pieces, None)
+			except GenerationTimeoutError:
+				self.breaker.release()
+				raise
+			except Exception as e:
+				time.sleep(self._failed(e, attempt, deadline))
+				attempt += 1
+				continue
+			break
+		self._succeeded(started)
+		try:
+			if first is not None:
+				yield first
+				yield from pieces
+		finally:
+			pieces.close()
+	
+	async def stream_async(self, prompt, structured=False, timeout=None):
+		deadline = time.monotonic() + (timeout or LLM_TIMEOUT)
+		attempt = 0
+		while True:
+			self.breaker.before_call()
+			started = time.monotonic()
+			try:
+				pieces = self.backend.stream_async(prompt, structured, self._remaining(deadline)).__aiter__()
+				first = await pieces.__anext__()
+			except StopAsyncIteration:
+				first = None
+			except (GenerationTimeoutError, asyncio.CancelledError):
+				self.breaker.release()
+				raise
+			except Exception as e:
+				await asyncio.sleep(self._failed(e, attempt, deadline))
+				attempt += 1
+				continue
+			break
+		self._succeeded(started)
+		try:
+			if first is not None:
+				yield first
+				async for piece in pieces:
+					yield piece
+		finally:
+			await pieces.aclose()
+
+# One breaker per process for all backends, they share the upstream API
+LLM_CIRCUIT = CircuitBreaker(LLM_CIRCUIT_THRESHOLD, LLM_CIRCUIT_RESET)
+METRICS.gauge('meinantrag_llm_circuit_open', 'Whether the LLM circuit breaker rejects calls', lambda: int(LLM_CIRCUIT.state != 'closed'))
+
+def create_llm_backend(model=None):
+	"""Create the backend selected by MEINANTRAG_LLM_BACKEND with retries and circuit breaker, None if it is not configured"""
+	backend = _create_upstream_backend(model)
+	if backend is None:
+		return None
+	return ResilientBackend(backend, LLM_CIRCUIT, retries=LLM_RETRIES, attempt_timeout=LLM_ATTEMPT_TIMEOUT, hedge=LLM_HEDGE)
+
+def _create_upstream_backend(model):
+	if LLM_BACKEND == 'fake':
+		return FakeBackend(model or 'fake', latency=FAKE_LATENCY)
+	if LLM_BACKEND == 'openai':
+		return OpenAICompatibleBackend(model or LLM_MODEL or 'default', LLM_BASE_URL, os.environ.get('MEINANTRAG_LLM_API_KEY'))
+	if LLM_BACKEND == 'gemini':
+		api_key = os.environ.get('GOOGLE_GEMINI_API_KEY')
+		if not api_key:
+			return None
+		return GeminiBackend(model or LLM_MODEL or 'gemini-3-pro-preview', api_key)
+	raise ValueError(f"Unknown MEINANTRAG_LLM_BACKEND: {LLM_BACKEND}")
+
+@contextmanager
+def llm_call(backend, stage):
+	"""Time an upstream LLM call as a stage and count it by outcome"""
+	outcome = 'error'
+	try:
+		with span(stage):
+			yield
+		outcome = 'ok'
+	except (GeneratorExit, asyncio.CancelledError):
+		# Client went away, e.g. in the middle of a stream
+		outcome = 'cancelled'
+		raise
+	finally:
+		METRICS.inc('meinantrag_llm_calls_total', 'Upstream LLM calls', backend=backend.name, model=backend.model, outcome=outcome)
+
+class SingleFlight:
+	"""Coalesce concurrent identical calls, followers wait for the result of the first caller"""
+	
+	def __init__(self):
+		self._calls = {}
+		self._tasks = {}
+		self._lock = threading.Lock()
+		self.stats = {'calls': 0, 'coalesced': 0}
+	
+	def do(self, key, func):
+		with self._lock:
+			self.stats['calls'] += 1
+			future = self._calls.get(key)
+			leader = future is None
+			if leader:
+				future = self._calls[key] = Future()
+			else:
+				self.stats['coalesced'] += 1
+		if not leader:
+			return future.result()
+		try:
+			result = func()
+			future.set_result(result)
+			return result
+		except BaseException as e:
+			future.set_exception(e)
+			raise
+		finally:
+			with self._lock:
+				del self._calls[key]
+	
+	async def do_async(self, key, func):
+		"""Like do() for coroutine functions, the shared call survives a cancelled caller"""
+		with self._lock:
+			self.stats['calls'] += 1
+			task = self._tasks.get(key)
+			if task is None:
+				task = self._tasks[key] = asyncio.ensure_future(func())
+				task.add_done_callback(functools.partial(self._task_done, key))
+			else:
+				self.stats['coalesced'] += 1
+		return await asyncio.shield(task)
+	
+	def _task_done(self, key, task):
+		with self._lock:
+			if self._tasks.get(key) is task:
+				del self._tasks[key]
+		# Retrieve the exception, in case every caller was cancelled
+		if not task.cancelled():
+			task.exception()
+	
+	def snapshot(self):
+		with self._lock:
+			return dict(self.stats, in_flight=len(self._calls) + len(self._tasks))
+
+class GenerationTimeoutError(Exception):
+	pass
+
+class GenerateAntragResource:
+	def __init__(self, cache=None, scheduler=None, library=None):
+		self.cache = cache
+		self.library = library
+		# Without a scheduler, e.g. in scripts, generations are not limited
+		self.scheduler = scheduler if scheduler is not None else GenerationScheduler(max_concurrent=sys.maxsize, max_queue=0)
+		self.mode_stats = {mode: {'generations': 0, 'fallbacks': 0, 'errors': 0, 'seconds': 0.0} for mode in PROMPT_VERSIONS}
+		self._stats_lock = threading.Lock()
+		self.single_flight = SingleFlight()
+		self._backend = None
+		self._draft_backend = None
+		self._backend_lock = threading.Lock()
+	
+	def _load_backends(self):
+		# The backend modules (e.g. google.generativeai) are imported on first use
+		with self._backend_lock:
+			if self._backend is None:
+				backend = create_llm_backend()
+				if backend is None:
+					return
+				self._draft_backend = create_llm_backend(LLM_DRAFT_MODEL) if LLM_DRAFT_MODEL else backend
+				self._backend = backend
+	
+	@property
+	def backend(self):
+		"""LLM backend, None if it is not configured (e.g. no Gemini API key)"""
+		if self._backend is None:
+			self._load_backends()
+		return self._backend
+	
+	@property
+	def draft_backend(self):
+		"""Backend for the e-mail draft, MEINANTRAG_LLM_DRAFT_MODEL or the main backend"""
+		if self._backend is None:
+			self._load_backends()
+		return self._draft_backend
+	
+	def _flight_key(self, backend, prompt, structured):
+		return hashlib.sha256('\x00'.join((backend.name, backend.model, str(structured), prompt)).encode('utf-8')).hexdigest()
+	
+	def _generate(self, prompt, structured=False, draft=False):
+		"""Run a single LLM call and return the text, identical concurrent calls share one upstream call"""
+		backend = self.draft_backend if draft else self.backend
 		
-		# Remove bold/italic markdown: **text** or *text* or __text__ or _text_
-		text = re.sub(r'\*\*(.+?)\*\*', r'\1', text)
-		text = re.sub(r'\*(.+?)\*', r'\1', text)
-		text = re.sub(r'__(.+?)__', r'\1', text)
-		text = re.sub(r'_(.+?)_', r'\1', text)
-		
-		# Remove heading markdown: /Heading or # Heading
-		text = re.sub(r'^/\s*', '', text, flags=re.MULTILINE)
-		text = re.sub(r'^#+\s*', '', text, flags=re.MULTILINE)
-		
-		# Remove other markdown elements
-		text = re.sub(r'`(.+?)`', r'\1', text)  # Code
-		text = re.sub(r'\[(.+?)\]\(.+?\)', r'\1', text)  # Links
+		def call():
+			with llm_call(backend, self._llm_stage(structured, draft)):
+				return backend.generate(prompt, structured)
 		
-		return text.strip()
+		return self.single_flight.do(self._flight_key(backend, prompt, structured), call)
+	
+	def _llm_stage(self, structured=False, draft=False, stream=False):
+		if structured:
+			return 'llm_structured_stream' if stream else 'llm_structured'
+		if draft:
+			return 'llm_email'
+		return 'llm_antrag_stream' if stream else 'llm_antrag'
+	
+	def _over_budget(self, anliegen):
+		tokens = estimate_tokens(anliegen)
+		METRICS.inc('meinantrag_input_tokens_total', 'Estimated tokens of the submitted Anliegen', tokens)
+		return 0 < INPUT_TOKEN_BUDGET < tokens
+	
+	def _within_budget(self, text, action):
+		METRICS.inc('meinantrag_input_over_budget_total', 'Anliegen over MEINANTRAG_INPUT_TOKEN_BUDGET', action=action)
+		return truncate_to_budget(text, INPUT_TOKEN_BUDGET)
+	
+	def _fit_input(self, anliegen):
+		"""Keep the Anliegen within INPUT_TOKEN_BUDGET, it is sent with every prompt of the generation"""
+		if not self._over_budget(anliegen):
+			return anliegen
+		summary = None
+		if INPUT_OVERFLOW == 'summarize':
+			with self._summarizing():
+				summary = self.draft_backend.generate(PROMPTS['summary'].render(anliegen), timeout=LLM_TIMEOUT / 2)
+		return self._fitted(anliegen, summary)
+	
+	@contextmanager
+	def _summarizing(self):
+		"""Around the summary call of _fit_input and _fit_input_async, a failed summary means truncating"""
+		try:
+			with llm_call(self.draft_backend, 'llm_summary'):
+				yield
+		except CircuitOpenError:
+			raise
+		except Exception as e:
+			print(f"Summarizing the Anliegen failed, truncating it: {e!r}")
+	
+	def _fitted(self, anliegen, summary):
+		summary = summary.strip() if summary else ''
+		if summary:
+			return self._within_budget(self._remove_markdown(summary), 'summarized')
+		return self._within_budget(anliegen, 'truncated')
+	
+	def _record(self, mode, started, fallback=False, error=False):
+		"""Count a finished generation for the comparison of the modes in /api/stats"""
+		with self._stats_lock:
+			stats = self.mode_stats[mode]
+			stats['generations'] += 1
+			stats['seconds'] += time.monotonic() - started
+			stats['fallbacks'] += fallback
+			stats['errors'] += error
+	
+	def mode_snapshot(self):
+		with self._stats_lock:
+			snapshot = {mode: dict(stats) for mode, stats in self.mode_stats.items()}
+		for stats in snapshot.values():
+			stats['avg_seconds'] = round(stats['seconds'] / stats['generations'], 3) if stats['generations'] else 0.0
+			stats['seconds'] = round(stats['seconds'], 3)
+		snapshot['structured_share'] = STRUCTURED_SHARE
+		snapshot['backend'] = LLM_BACKEND
+		snapshot['single_flight'] = self.single_flight.snapshot()
+		snapshot['circuit'] = LLM_CIRCUIT.snapshot()
+		snapshot['prompts'] = {name: template.snapshot() for name, template in PROMPTS.items()}
+		snapshot['input_budget'] = {'tokens': INPUT_TOKEN_BUDGET, 'overflow': INPUT_OVERFLOW}
+		return snapshot
+	
+	def _remove_markdown(self, text):
+		"""Remove markdown formatting from text"""
+		with span('remove_markdown'):
+			return remove_markdown(text)
 	
 	def _parse_gemini_response(self, text):
 		"""Parse the response from Gemini into title, demand, and justification"""
-		# Remove markdown formatting first
-		text = self._remove_markdown(text)
-		
-		# Split by "Begründung/Sachverhalt" or similar patterns
-		parts = re.split(r'(begründung|sachverhalt|begründung/sachverhalt)', text, maxsplit=1, flags=re.IGNORECASE)
-		
-		if len(parts) >= 3:
-			# We have a split at "Begründung/Sachverhalt"
-			before_justification = parts[0].strip()
-			justification = parts[2].strip() if len(parts) > 2 else ""
-			
-			# Remove "Begründung/Sachverhalt" or "Sachverhalt" from the beginning of justification
-			justification = re.sub(r'^(begründung\s*/?\s*sachverhalt|sachverhalt|begründung)\s*:?\s*\n?', '', justification, flags=re.IGNORECASE).strip()
-		else:
-			# Try to split by paragraphs
-			paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
-			if len(paragraphs) >= 3:
-				before_justification = '\n\n'.join(paragraphs[:-1])
-				justification = paragraphs[-1]
-				# Remove "Begründung/Sachverhalt" or "Sachverhalt" from the beginning
-				justification = re.sub(r'^(begründung\s*/?\s*sachverhalt|sachverhalt|begründung)\s*:?\s*\n?', '', justification, flags=re.IGNORECASE).strip()
-			else:
-				before_justification = text
-				justification = ""
-		
-		# Extract title (first line or first paragraph)
-		title_match = re.match(r'^(.+?)(?:\n\n|\n|$)', before_justification)
-		if title_match:
-			title = title_match.group(1).strip()
-			demand = before_justification[len(title):].strip()
-		else:
-			lines = before_justification.split('\n', 1)
-			title = lines[0].strip()
-			demand = lines[1].strip() if len(lines) > 1 else ""
-		
-		# Remove title from demand if it's duplicated
-		if demand.startswith(title):
-			demand = demand[len(title):].strip()
-		
-		# Remove markdown from each part
-		title = self._remove_markdown(title)
-		demand = self._remove_markdown(demand)
-		justification = self._remove_markdown(justification)
-		
-		# Final cleanup: remove any remaining "Sachverhalt" or "Begründung/Sachverhalt" at the start
-		justification = re.sub(r'^(begründung\s*/?\s*sachverhalt|sachverhalt|begründung)\s*:?\s*\n?\s*', '', justification, flags=re.IGNORECASE).strip()
-		
-		return {
-			'title': title,
-			'demand': demand,
-			'justification': justification
+		with span('parse'):
+			return parse_gemini_response(text)
+	
+	def _collect_email(self, email_future, deadline, title):
+		"""Wait for the e-mail generation, returns the text and whether the fallback was used"""
+		# Partial result: a failed e-mail generation should not cost the user the Antrag
+		try:
+			email_text = email_future.result(timeout=max(0, deadline - time.monotonic()))
+			return self._remove_markdown(email_text).strip(), False
+		except Exception as e:
+			print(f"E-mail generation failed, using fallback: {e!r}")
+			return FALLBACK_EMAIL.format(title=title), True
+	
+	def _read_form(self, req):
+		"""Read anliegen and party_id from the request"""
+		# The body was parsed by BodyParserMiddleware
+		anliegen = form_value(req, 'anliegen').strip()
+		party_id = form_value(req, 'party_id').strip()
+		return anliegen, party_id
+	
+	def _lookup_cache(self, anliegen, party_id):
+		"""Return the cache key and the cached result, or None for either"""
+		# Identical Anliegen (e.g. copied from a shared post) are answered from the cache
+		if self.cache is None or not self.cache.enabled:
+			return None, None
+		cache_key = self.cache.make_key(anliegen, party_id, generation_mode(anliegen))
+		return cache_key, self.cache.get(cache_key)
+	
+	def _finish(self, parsed, email_text, email_failed, cache_key, party_name=''):
+		"""Assemble the result, cache it and add it to the library"""
+		result = {
+			'title': parsed['title'],
+			'demand': parsed['demand'],
+			'justification': parsed['justification'],
+			'email_body': email_text
 		}
+		# Partial results are not cached, the next request should get a real e-mail
+		if cache_key and not email_failed:
+			self.cache.set(cache_key, result)
+		if self.library is not None:
+			self.library.add(result, party_name)
+		return result
+	
+	def _parse_structured(self, text):
+		"""Validate a structured response, returns its fields and the Antrag, None if it has to be generated again"""
+		with span('parse_structured'):
+			fields = parse_structured_response(text)
+		if not fields['email_body']:
+			print("Structured response has no valid e-mail, generating it separately")
+		if not fields['title'] or not fields['demand']:
+			# Never parse the JSON as free text, its syntax would end up in the Antrag
+			print("Structured response failed validation, generating the Antrag from the text prompt")
+			return fields, None
+		return fields, {'title': fields['title'], 'demand': fields['demand'], 'justification': fields['justification']}
+	
+	def _structured_result(self, text, anliegen, deadline):
+		"""Returns parsed fields, e-mail and whether the fallback was used, generates only what failed validation"""
+		fields, parsed = self._parse_structured(text)
+		email_future = None if fields['email_body'] else LLM_EXECUTOR.submit(self._generate, PROMPTS['email'].render(anliegen), draft=True)
+		if parsed is None:
+			parsed = self._text_antrag(anliegen, deadline, email_future)
+		if email_future is None:
+			return parsed, fields['email_body'], False
+		email_text, email_failed = self._collect_email(email_future, deadline, parsed['title'])
+		return parsed, email_text, email_failed
+	
+	def _run_generation(self, anliegen, cache_key, party_name=''):
+		"""Generate Antrag and e-mail, raises GenerationTimeoutError if the Antrag takes too long"""
+		mode = generation_mode(anliegen)
+		started = time.monotonic()
+		try:
+			anliegen = self._fit_input(anliegen)
+			if mode == 'structured':
+				result, fallback = self._run_structured(anliegen, cache_key, party_name)
+			else:
+				result, fallback = self._run_text(anliegen, cache_key, party_name)
+		except Exception:
+			self._record(mode, started, error=True)
+			raise
+		self._record(mode, started, fallback=fallback)
+		return result
+	
+	def _run_structured(self, anliegen, cache_key, party_name):
+		"""One call for all four fields"""
+		deadline = time.monotonic() + LLM_TIMEOUT
+		future = LLM_EXECUTOR.submit(self._generate, PROMPTS['structured'].render(anliegen), True)
+		try:
+			text = future.result(timeout=LLM_TIMEOUT)
+		except FutureTimeoutError:
+			raise GenerationTimeoutError('Zeitüberschreitung bei der Generierung des Antrags')
+		parsed, email_text, fallback = self._structured_result(text, anliegen, deadline)
+		return self._finish(parsed, email_text, fallback, cache_key, party_name), fallback
+	
+	def _run_text(self, anliegen, cache_key, party_name):
+		"""Antrag and e-mail from two free-text prompts"""
+		# Run the Antrag and the e-mail prompt concurrently, the e-mail
+		# only depends on the Anliegen and not on the generated Antrag
+		deadline = time.monotonic() + LLM_TIMEOUT
+		email_future = LLM_EXECUTOR.submit(self._generate, PROMPTS['email'].render(anliegen), draft=True)
+		parsed = self._text_antrag(anliegen, deadline, email_future)
+		email_text, email_failed = self._collect_email(email_future, deadline, parsed['title'])
+		return self._finish(parsed, email_text, email_failed, cache_key, party_name), email_failed
+	
+	def _text_antrag(self, anliegen, deadline, email_future=None):
+		"""Antrag from the free-text prompt, cancels the e-mail generation if it fails"""
+		antrag_future = LLM_EXECUTOR.submit(self._generate, PROMPTS['antrag'].render(anliegen))
+		try:
+			generated_text = antrag_future.result(timeout=max(0, deadline - time.monotonic()))
+		except FutureTimeoutError:
+			if email_future is not None:
+				email_future.cancel()
+			raise GenerationTimeoutError('Zeitüberschreitung bei der Generierung des Antrags')
+		except Exception:
+			if email_future is not None:
+				email_future.cancel()
+			raise
+		return self._parse_gemini_response(generated_text)
+	
+	def _error(self, resp, status, message):
+		resp.status = status
+		resp.content_type = 'application/json'
+		resp.text = json.dumps({
+			'success': False,
+			'error': message
+		})
+	
+	def _busy(self, resp, e):
+		"""Answer 503 when the scheduler does not admit the generation or the LLM circuit is open"""
+		resp.set_header('Retry-After', str(e.retry_after))
+		self._error(resp, falcon.HTTP_503, str(e))
+	
+	def _check_request(self, req, resp):
+		"""Read the form, returns (anliegen, party_id) or None after sending an error"""
+		if not self.backend:
+			self._error(resp, falcon.HTTP_500, f'LLM backend {LLM_BACKEND} not configured')
+			return None
+		
+		with span('form'):
+			anliegen, party_id = self._read_form(req)
+		return self._validate_form(resp, anliegen, party_id)
+	
+	def _validate_form(self, resp, anliegen, party_id):
+		if not anliegen:
+			self._error(resp, falcon.HTTP_400, 'Anliegen-Feld ist erforderlich')
+			return None
+		# Every character is sent to the LLM and paid for in tokens
+		if len(anliegen) > MAX_ANLIEGEN_LENGTH:
+			self._error(resp, falcon.HTTP_413, f"Das Anliegen ist zu lang (höchstens {MAX_ANLIEGEN_LENGTH} Zeichen)")
+			return None
+		return anliegen, party_id
 	
 	def on_post(self, req, resp):
 		"""Generate text from user input using Gemini API"""
 		try:
-			if not self.model:
-				resp.status = falcon.HTTP_500
-				resp.content_type = 'application/json'
-				resp.text = json.dumps({
-					'success': False,
-					'error': 'Gemini API key not configured'
-				})
+			form = self._check_request(req, resp)
+			if form is None:
 				return
+			anliegen, party_id = form
 			
-			# Get form data - try multiple methods for Falcon compatibility
-			anliegen = ''
-			party_id = ''
-			
-			# Method 1: Try get_param (works for URL-encoded form data)
-			anliegen = req.get_param('anliegen', default='') or ''
-			party_id = req.get_param('party_id', default='') or ''
-			
-			# Method 2: If empty, try to read from stream and parse manually
-			if not anliegen:
-				try:
-					# Read the raw body - use bounded_stream if available, otherwise stream
-					stream = getattr(req, 'bounded_stream', req.stream)
-					raw_body = stream.read().decode('utf-8')
-					# Parse URL-encoded data manually
-					parsed = parse_qs(raw_body)
-					anliegen = parsed.get('anliegen', [''])[0]
-					party_id = parsed.get('party_id', [''])[0]
-				except Exception as e:
-					# Log the exception for debugging
-					print(f"Error parsing form data: {e}")
-					pass
-			
-			# Remove any whitespace and check if actually empty
-			anliegen = anliegen.strip() if anliegen else ''
-			party_id = party_id.strip() if party_id else ''
-			
-			if not anliegen:
-				resp.status = falcon.HTTP_400
-				resp.content_type = 'application/json'
-				resp.text = json.dumps({
-					'success': False,
-					'error': 'Anliegen-Feld ist erforderlich'
-				})
+			cache_key, result = self._lookup_cache(anliegen, party_id)
+			if result is None:
+				with self.scheduler.slot():
+					result = self._run_generation(anliegen, cache_key, party_id)
+			self._respond(resp, result, party_id)
+		except Exception as e:
+			self._generation_failed(resp, e)
+	
+	def _respond(self, resp, result, party_id):
+		"""Return JSON with the generated text parts"""
+		resp.content_type = 'application/json'
+		with span('json_encode'):
+			resp.text = json.dumps(dict(result, success=True, party_name=party_id))
+	
+	def _generation_failed(self, resp, e):
+		"""503 when the generation was not admitted, 504 when it took too long, 500 otherwise"""
+		if isinstance(e, (SchedulerBusyError, CircuitOpenError)):
+			self._busy(resp, e)
+		elif isinstance(e, GenerationTimeoutError):
+			self._error(resp, falcon.HTTP_504, str(e))
+		else:
+			import traceback
+			traceback.print_exc()
+			self._error(resp, falcon.HTTP_500, str(e))
+
+	def on_post_stream(self, req, resp):
+		"""Generate text like on_post, but send partial results as Server-Sent Events"""
+		form = self._check_request(req, resp)
+		if form is None:
+			return
+		anliegen, party_id = form
+		
+		cache_key, cached = self._lookup_cache(anliegen, party_id)
+		if cached is None:
+			# Admission happens before the headers, so a full queue can still answer 503
+			try:
+				self.scheduler.acquire()
+			except SchedulerBusyError as e:
+				self._busy(resp, e)
+				return
+		if self._event_stream(resp, cached, party_id):
+			resp.stream = SlotStream(self._stream_events(anliegen, party_id, cache_key), self.scheduler)
+	
+	def _event_stream(self, resp, cached, party_name):
+		"""Start the SSE response, a cached result is its only event. Returns whether the events still have to be generated"""
+		resp.content_type = 'text/event-stream; charset=utf-8'
+		resp.set_header('Cache-Control', 'no-cache')
+		# Disable response buffering in nginx so events reach the browser immediately
+		resp.set_header('X-Accel-Buffering', 'no')
+		if cached is not None:
+			resp.data = self._sse('done', dict(cached, success=True, party_name=party_name))
+			return False
+		return True
+	
+	def _sse(self, event, data):
+		"""Encode a single Server-Sent Event"""
+		return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode('utf-8')
+	
+	def _stream_events(self, anliegen, party_name, cache_key):
+		"""Yield SSE events with the growing parse result, then the complete result"""
+		events = GenerationEvents(self, anliegen)
+		# Send the first bytes right away, the e-mail runs in the background meanwhile
+		yield b': generating\n\n'
+		try:
+			anliegen = self._fit_input(anliegen)
+		except Exception as e:
+			yield events.failed(e)
+			return
+		prompt = events.prompt(anliegen)
+		email_future = None if events.structured else LLM_EXECUTOR.submit(self._generate, PROMPTS['email'].render(anliegen), draft=True)
+		try:
+			try:
+				with llm_call(self.backend, events.stage):
+					for text in self.backend.stream(prompt, events.structured):
+						event = events.piece(text)
+						if event is not None:
+							yield event
+			except Exception as e:
+				yield events.failed(e)
 				return
 			
-			# Create prompt for Gemini
-			prompt = """Erzeuge aus dem folgenden Anliegen-Text je nach Anliegen eine Anfrage oder einen Antrag an die Karlsruher Stadtverwaltung im Namen einer Stadtratsfraktion. 
+			if events.structured:
+				parsed, email_text, email_failed = self._structured_result(events.text, anliegen, events.deadline)
+			else:
+				parsed = self._parse_gemini_response(events.text)
+				email_text, email_failed = self._collect_email(email_future, events.deadline, parsed['title'])
+			result = self._finish(parsed, email_text, email_failed, cache_key, party_name)
+			yield events.done(result, party_name, email_failed)
+		finally:
+			# Also reached when the server closes the generator because the client disconnected
+			if email_future is not None and not email_future.done():
+				email_future.cancel()
 
-Der Antrag soll im sachlichen, offiziellen Ton einer Fraktion verfasst sein - KEINE persönliche Anrede, KEINE "ich" oder "wir" Formulierungen. Verwende die dritte Person oder Passiv-Formulierungen.
+class GenerationEvents:
+	"""State of a streamed generation, shared by _stream_events and _stream_events_async
+	
+	The two only differ in how they wait for the LLM: partial parses, the
+	deadline, the events and the statistics are kept here.
+	"""
+	
+	def __init__(self, generator, anliegen):
+		self.generator = generator
+		self.mode = generation_mode(anliegen)
+		self.structured = self.mode == 'structured'
+		self.stage = generator._llm_stage(self.structured, stream=True)
+		self.started = time.monotonic()
+		self.deadline = None
+		self.text = ''
+		# Partial parses are not timed, only the final parse counts as the parse stage
+		self._parse_partial = parse_structured_partial if self.structured else parse_gemini_response
+		self._last_parsed = None
+	
+	def prompt(self, anliegen):
+		"""Start the deadline, returns the prompt for the fitted Anliegen"""
+		self.deadline = time.monotonic() + LLM_TIMEOUT
+		return PROMPTS['structured'].render(anliegen) if self.structured else PROMPTS['antrag'].render(anliegen)
+	
+	def piece(self, text):
+		"""Add a streamed piece, returns the fields event if the parse changed"""
+		self.text += text
+		if time.monotonic() > self.deadline:
+			raise TimeoutError('Zeitüberschreitung bei der Generierung des Antrags')
+		parsed = self._parse_partial(self.text)
+		if parsed == self._last_parsed:
+			return None
+		self._last_parsed = parsed
+		return self.generator._sse('fields', parsed)
+	
+	def failed(self, error):
+		import traceback
+		traceback.print_exc()
+		self.generator._record(self.mode, self.started, error=True)
+		return self.generator._sse('error', {'success': False, 'error': str(error)})
+	
+	def done(self, result, party_name, fallback):
+		self.generator._record(self.mode, self.started, fallback=fallback)
+		return self.generator._sse('done', dict(result, success=True, party_name=party_name))
 
-Struktur:
-- Die erste Zeile ist der Antragstitel. Der Titel soll PRÄGNANT, EINFACH und EINPRÄGSAM sein - maximal 8-10 Wörter. Vermeide komplizierte Formulierungen, technische Fachbegriffe oder zu lange Titel. Der Titel soll eine gute Außenwirkung haben und das Anliegen klar und verständlich kommunizieren. Beispiele für gute Titel: "Nachtabsenkung der öffentlichen Straßenbeleuchtung", "Vielfalt in Bewegung – Kulturelle Begleitmaßnahmen World Games 2029", "Prüfung digitaler Zahlungsdienstleister und WERO-Alternative"
-- Der zweite Absatz ist der Forderungsteil. Je nachdem: Entweder Sätze und oder Liste von Forderungen.
-- Der letzte Teil ist Begründung/Sachverhalt (ohne diesen Titel im Text)
+class GenerationJobResource:
+	"""Job-ID mode: POST answers right away with a job ID, the client polls GET /api/jobs/{job_id}
+	
+	The generation runs in the background under the same scheduler as the
+	direct endpoints, so slow LLM calls do not hold an HTTP worker.
+	"""
+	
+	def __init__(self, generator, jobs):
+		self.generator = generator
+		self.jobs = jobs
+		self.executor = ThreadPoolExecutor(max_workers=min(generator.scheduler.max_concurrent, 64), thread_name_prefix='meinantrag-job')
+	
+	def _accepted(self, resp, job_id):
+		job = self.jobs.get(job_id) or {'status': 'queued'}
+		resp.status = falcon.HTTP_202
+		resp.content_type = 'application/json'
+		resp.set_header('Location', f'/api/jobs/{job_id}')
+		resp.text = json.dumps({
+			'success': True,
+			'job_id': job_id,
+			'status': job['status'],
+			'status_url': f'/api/jobs/{job_id}'
+		})
+	
+	def _start(self, job_id, start):
+		"""Queue start() with the scheduler, a rejected job is marked as failed"""
+		try:
+			self.generator.scheduler.submit(start)
+		except SchedulerBusyError as e:
+			self.jobs.update(job_id, status='error', error=str(e))
+			raise
+	
+	def _run(self, job_id, anliegen, cache_key, party_name):
+		started = time.monotonic()
+		try:
+			self.jobs.update(job_id, status='running')
+			result = self.generator._run_generation(anliegen, cache_key, party_name)
+			self.jobs.update(job_id, status='done', result=result)
+		except Exception as e:
+			self._failed(job_id, e)
+		finally:
+			self.generator.scheduler.release(time.monotonic() - started)
+	
+	def _failed(self, job_id, e):
+		import traceback
+		traceback.print_exception(type(e), e, e.__traceback__)
+		self.jobs.update(job_id, status='error', error=str(e))
+	
+	def on_post(self, req, resp):
+		"""Create a generation job from the same form as /api/generate-antrag"""
+		form = self.generator._check_request(req, resp)
+		if form is None:
+			return
+		self._submit(resp, form, lambda *job: self.executor.submit(self._run, *job))
+	
+	def _submit(self, resp, form, run):
+		"""Create the job and queue run(job_id, anliegen, cache_key, party_name) unless the result is cached"""
+		anliegen, party_id = form
+		cache_key, cached = self.generator._lookup_cache(anliegen, party_id)
+		job_id = self.jobs.create(party_id)
+		if cached is not None:
+			self.jobs.update(job_id, status='done', result=cached)
+		else:
+			try:
+				self._start(job_id, lambda: run(job_id, anliegen, cache_key, party_id))
+			except SchedulerBusyError as e:
+				self.generator._busy(resp, e)
+				return
+		self._accepted(resp, job_id)
+	
+	def on_get_job(self, req, resp, job_id):
+		"""Return the state of a job, including the result once it is done"""
+		job = self.jobs.get(job_id)
+		if job is None:
+			self.generator._error(resp, falcon.HTTP_404, 'Job nicht gefunden')
+			return
+		
+		body = {'success': job['status'] != 'error', 'job_id': job_id, 'status': job['status']}
+		if job['status'] == 'done':
+			body.update(job['result'], party_name=job['party_name'])
+		elif job['status'] == 'error':
+			body['error'] = job.get('error', '')
+		else:
+			# Polling hint for clients
+			resp.set_header('Retry-After', '1')
+		resp.content_type = 'application/json'
+		resp.cache_control = ['no-store']
+		resp.text = json.dumps(body)
 
-WICHTIG: 
-- Reinen Text, verwende KEINE Markdown-Formatierung oder sonstige Formatierungen, ausgenommen Listen und Aufzählungen.
-- Sachlicher, offizieller Ton einer Fraktion, keine persönlichen Formulierungen.
+# A private use character marks sentinels, it never occurs in generated text
+_DOCX_SENTINEL_MARK = '\ue000'
+_DOCX_SENTINELS = {name: f"{_DOCX_SENTINEL_MARK}{name}{_DOCX_SENTINEL_MARK}" for name in ('title', 'demand', 'justification', 'party_name', 'date')}
+_DOCX_PLACEHOLDERS = ('FRAKTION', 'XX.XX.XXXX', 'ANTRAGSTITEL', 'ANTRAGSTEXT', 'BEGRÜNDUNGSTEXT')
+# python-docx turns these into <w:tab/>/<w:br/> elements or rejects them
+_DOCX_CONTROL_CHARS = re.compile(r'[\x00-\x1f]')
+_DOCX_CONTROL_CHARS_MULTILINE = re.compile(r'[\x00-\x09\x0b-\x1f]')
 
-"""
-			prompt += anliegen
-			
-			# Call Gemini API
-			response = self.model.generate_content(prompt)
-			generated_text = response.text
-			
-			# Parse the response
-			parsed = self._parse_gemini_response(generated_text)
-			
-			# Generate email text
-			email_prompt = f"""Erstelle einen kurzen, höflichen E-Mail-Text in der ERSTEN PERSON (persönlich, ich-rede) an eine Fraktion. 
-Die E-Mail soll:
-- Mit "Guten Tag," beginnen
-- Das Anliegen kurz erklären und prägnant
-- Erwähnen, dass eine Antragsvorlage im Anhang beigefügt ist
-- Mit "Mit freundlichen Grüßen," enden
-- Verwende KEINE Markdown-Formatierung
-- Schreibe keinen Betreff-Entwurf dazu
-
-Anliegen: {anliegen}
-"""
-			
-			email_response = self.model.generate_content(email_prompt)
-			email_text = self._remove_markdown(email_response.text)
-			
-			# Ensure proper format - clean up and ensure structure
-			email_text = email_text.strip()
+# Template parts without placeholders: 'deflated' once when the template is
+# compiled, or 'stored' uncompressed (larger responses, no deflate at all)
+DOCX_STATIC_PARTS = os.environ.get('MEINANTRAG_DOCX_STATIC_PARTS', 'deflated').strip().lower()
+
+_ZIP_LOCAL_HEADER = struct.Struct('<4sHHHHHLLLHH')
+_ZIP_CENTRAL_HEADER = struct.Struct('<4sHHHHHHLLLHHHHHLL')
+_ZIP_END_RECORD = struct.Struct('<4sHHHHLLH')
+# Parts from this size on are passed on as their own chunk instead of being copied
+_ZIP_CHUNK_SIZE = 16384
+
+def _xml_escape(text):
+	return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+class ZipEntry:
+	"""A compressed member of a ZIP package with its local file header"""
+	
+	__slots__ = ('name', 'method', 'crc', 'size', 'data', 'dos_time', 'dos_date', 'header')
+	
+	def __init__(self, name, data, date_time, compress=True, level=6):
+		self.name = name.encode('utf-8')
+		self.crc = zlib.crc32(data)
+		self.size = len(data)
+		if compress:
+			compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+			self.data = compressor.compress(data) + compressor.flush()
+			self.method = zipfile.ZIP_DEFLATED
+		else:
+			self.data = data
+			self.method = zipfile.ZIP_STORED
+		year, month, day, hour, minute, second = date_time
+		self.dos_date = (max(year, 1980) - 1980) << 9 | month << 5 | day
+		self.dos_time = hour << 11 | minute << 5 | second // 2
+		self.header = _ZIP_LOCAL_HEADER.pack(
+			b'PK\x03\x04', 20, self._flags(), self.method, self.dos_time, self.dos_date,
+			self.crc, len(self.data), self.size, len(self.name), 0
+		) + self.name
+	
+	def _flags(self):
+		# Bit 11: the name is UTF-8
+		return 0 if self.name.isascii() else 0x800
+	
+	def central_header(self, offset):
+		return _ZIP_CENTRAL_HEADER.pack(
+			b'PK\x01\x02', 20, 20, self._flags(), self.method, self.dos_time, self.dos_date,
+			self.crc, len(self.data), self.size, len(self.name), 0, 0, 0, 0, 0o600 << 16, offset
+		) + self.name
+
+def zip_chunks(entries):
+	"""Return a ZIP package of the entries as a list of byte strings
+	
+	Large entry data is passed on as is, so the chunks share the bytes of
+	cached entries; headers and small entries are joined into one chunk.
+	"""
+	chunks = []
+	pending = bytearray()
+	central = bytearray()
+	offset = 0
+	for entry in entries:
+		central += entry.central_header(offset)
+		pending += entry.header
+		if len(entry.data) >= _ZIP_CHUNK_SIZE:
+			chunks.append(bytes(pending))
+			chunks.append(entry.data)
+			pending = bytearray()
+		else:
+			pending += entry.data
+		offset += len(entry.header) + len(entry.data)
+	pending += central
+	pending += _ZIP_END_RECORD.pack(b'PK\x05\x06', 0, 0, len(entries), len(entries), len(central), offset, 0)
+	chunks.append(bytes(pending))
+	return chunks
+
+class CompiledDocxTemplate:
+	"""Word template rendered once with sentinel values, requests only splice their values into the cached parts
+	
+	The template is rendered through the python-docx code path with sentinels
+	in place of title, demand, justification, party and date, once with and
+	once without a party (python-docx treats an empty party differently). The
+	saved package is split at the sentinels, so a request only joins byte
+	strings and deflates the parts with placeholders. Parts without
+	placeholders are compressed once here (see MEINANTRAG_DOCX_STATIC_PARTS).
+	Values the python-docx path would turn into a
+	different XML structure (tabs, control characters, surrounding whitespace,
+	empty title, placeholders inside values) are not handled here: render()
+	returns None and the caller falls back to python-docx.
+	"""
+	
+	def __init__(self, render_document):
+		self.variants = {
+			True: self._compile(render_document, with_party=True),
+			False: self._compile(render_document, with_party=False)
+		}
+	
+	def _compile(self, render_document, with_party):
+		sentinels = _DOCX_SENTINELS
+		# Two lines per multi-line field, so the XML of a line break run can be recovered
+		buffer = render_document(
+			sentinels['title'],
+			f"{sentinels['demand']}\n{sentinels['demand']}",
+			f"{sentinels['justification']}\n{sentinels['justification']}",
+			sentinels['party_name'] if with_party else '',
+			sentinels['date']
+		)
+		
+		# A line of a multi-line field is a plain run, the whole block becomes one token
+		tokens = {}
+		for name in ('demand', 'justification'):
+			tokens[name] = f"<w:r><w:t>{sentinels[name]}</w:t></w:r>".encode('utf-8')
+		for name in ('title', 'party_name', 'date'):
+			tokens[name] = sentinels[name].encode('utf-8')
+		names = {token: name for name, token in tokens.items()}
+		pattern = re.compile(b'(' + b'|'.join(re.escape(token) for token in tokens.values()) + b')')
+		
+		parts = []
+		self.line_break = None
+		with zipfile.ZipFile(buffer) as package:
+			for info in package.infolist():
+				data = package.read(info)
+				if _DOCX_SENTINEL_MARK.encode('utf-8') not in data:
+					compress = info.compress_type == zipfile.ZIP_DEFLATED and DOCX_STATIC_PARTS != 'stored'
+					parts.append(ZipEntry(info.filename, data, info.date_time, compress=compress, level=9))
+					continue
 				
-			# Return JSON with the generated text parts
-			resp.content_type = 'application/json'
-			resp.text = json.dumps({
-				'success': True,
-				'title': parsed['title'],
-				'demand': parsed['demand'],
-				'justification': parsed['justification'],
-				'email_body': email_text,
-				'party_name': party_id if party_id else ""
-			})
-			
-		except Exception as e:
-			import traceback
-			traceback.print_exc()
-			resp.status = falcon.HTTP_500
-			resp.content_type = 'application/json'
-			resp.text = json.dumps({
-				'success': False,
-				'error': str(e)
-			})
+				# Collapse the two-line blocks into a single token per field
+				for name in ('demand', 'justification'):
+					run = tokens[name]
+					first = data.find(run)
+					if first < 0:
+						continue
+					second = data.find(run, first + len(run))
+					if second < 0:
+						raise ValueError(f"{name} placeholder has an unexpected structure")
+					line_break = data[first + len(run):second]
+					if self.line_break is not None and line_break != self.line_break:
+						raise ValueError("Inconsistent line break runs")
+					self.line_break = line_break
+					data = data[:first] + run + data[second + len(run):]
+				
+				segments = []
+				for i, piece in enumerate(pattern.split(data)):
+					if i % 2:
+						segments.append(names[piece])
+					elif piece:
+						if _DOCX_SENTINEL_MARK.encode('utf-8') in piece:
+							raise ValueError(f"Unexpected placeholder structure in {info.filename}")
+						segments.append(piece)
+				parts.append((info.filename, info.compress_type, info.date_time, segments))
+		
+		if self.line_break is None:
+			raise ValueError("Template has no ANTRAGSTEXT or BEGRÜNDUNGSTEXT placeholder")
+		return parts
+	
+	def _is_simple(self, value):
+		"""Whether python-docx writes the value as a single plain text node"""
+		if not value or value != value.strip() or _DOCX_SENTINEL_MARK in value:
+			return False
+		if _DOCX_CONTROL_CHARS.search(value):
+			return False
+		return not any(placeholder in value for placeholder in _DOCX_PLACEHOLDERS)
+	
+	def _lines_xml(self, text):
+		"""XML for the runs python-docx appends for a multi-line field"""
+		lines = text.split('\n')
+		runs = []
+		for i, line in enumerate(lines):
+			line = line.strip()
+			if line:
+				runs.append(b'<w:r><w:t>' + _xml_escape(line).encode('utf-8') + b'</w:t></w:r>')
+				if i < len(lines) - 1:
+					runs.append(self.line_break)
+		return b''.join(runs)
+	
+	def render(self, title, demand, justification, party_name, current_date):
+		"""Return the document as a buffer, or None if the values need python-docx"""
+		chunks = self.render_chunks(title, demand, justification, party_name, current_date)
+		return BytesIO(b''.join(chunks)) if chunks is not None else None
+	
+	def render_chunks(self, title, demand, justification, party_name, current_date):
+		"""Return the document as a list of byte strings, or None if the values need python-docx"""
+		if not self._is_simple(title) or not self._is_simple(current_date):
+			return None
+		if party_name and not self._is_simple(party_name):
+			return None
+		for text in (demand, justification):
+			if _DOCX_SENTINEL_MARK in text or _DOCX_CONTROL_CHARS_MULTILINE.search(text):
+				return None
+			if any(placeholder in text for placeholder in _DOCX_PLACEHOLDERS):
+				return None
+		
+		values = {
+			'title': _xml_escape(title).encode('utf-8'),
+			'party_name': _xml_escape(party_name).encode('utf-8'),
+			'date': _xml_escape(current_date).encode('utf-8'),
+			'demand': self._lines_xml(demand),
+			'justification': self._lines_xml(justification)
+		}
+		entries = []
+		for part in self.variants[bool(party_name)]:
+			if isinstance(part, ZipEntry):
+				entries.append(part)
+				continue
+			name, compress_type, date_time, segments = part
+			data = b''.join(values[s] if isinstance(s, str) else s for s in segments)
+			entries.append(ZipEntry(name, data, date_time, compress=compress_type == zipfile.ZIP_DEFLATED))
+		return zip_chunks(entries)
+
+def slugify(text):
+	"""File name part for a text, e.g. 'FDP/FW' -> 'fdp-fw' and 'GRÜNEN' -> 'gruenen'"""
+	text = text.strip().lower().replace('ä', 'ae').replace('ö', 'oe').replace('ü', 'ue').replace('ß', 'ss')
+	text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+	return re.sub(r'[^a-z0-9]+', '-', text).strip('-')
+
+def _python_executable():
+	"""Interpreter for worker processes, under uWSGI sys.executable is the uwsgi binary"""
+	if os.path.basename(sys.executable).startswith('python'):
+		return sys.executable
+	candidate = os.path.join(sys.exec_prefix, 'bin', f'python{sys.version_info[0]}.{sys.version_info[1]}')
+	return candidate if os.path.exists(candidate) else sys.executable
+
+# Batch workers import this module only for the Word renderer, the name
+# reaches the spawned interpreter before the import
+BATCH_WORKER_NAME = 'meinantrag-docx'
+
+class _BatchWorkerContext(multiprocessing.context.SpawnContext):
+	"""Fresh interpreters instead of fork(), named so the module can tell it runs in one"""
+	
+	def Process(self, *args, **kwargs):
+		return multiprocessing.context.SpawnProcess(*args, name=BATCH_WORKER_NAME, **kwargs)
+
+def in_batch_worker():
+	return multiprocessing.current_process().name == BATCH_WORKER_NAME
+
+def _render_batch_item(title, demand, justification, party_name):
+	"""Render one document of a batch, runs in a worker process"""
+	return b''.join(generate_word._generate_word_chunks(title, demand, justification, party_name))
+
+class _ZipChunks:
+	"""Write target for zipfile that keeps the written bytes until they are taken"""
+	
+	def __init__(self):
+		self.chunks = []
+	
+	def write(self, data):
+		self.chunks.append(bytes(data))
+		return len(data)
+	
+	def flush(self):
+		pass
+	
+	def take(self):
+		data = b''.join(self.chunks)
+		self.chunks = []
+		return data
 
 class GenerateWordResource:
 	def __init__(self):
@@ -324,18 +3100,88 @@ class GenerateWordResource:
 		if not os.path.exists(self.template_path):
 			assets_dir = os.path.join(script_dir, '..', 'assets')
 			self.template_path = os.path.join(assets_dir, 'antrag_vorlage.docx')
+		# Compiled templates by path, False if the template could not be compiled
+		self._compiled = {}
+		self._compiled_lock = threading.Lock()
+		self._party_templates = None
+		self._executor = None
+	
+	def _compiled_for(self, template_path):
+		compiled = self._compiled.get(template_path)
+		if compiled is None:
+			with self._compiled_lock:
+				compiled = self._compiled.get(template_path)
+				if compiled is None:
+					try:
+						compiled = CompiledDocxTemplate(functools.partial(self._render_document, template_path=template_path))
+					except Exception as e:
+						print(f"Warning: Could not precompile Word template {template_path}, using python-docx per request: {e}")
+						compiled = False
+					self._compiled[template_path] = compiled
+		return compiled or None
+	
+	@property
+	def compiled(self):
+		"""Template rendered once on first use, requests then only splice in their values"""
+		return self._compiled_for(self.template_path)
+	
+	def template_for(self, party_name):
+		"""Path of antrag_vorlage_<party slug>.docx next to the default template, or the default template"""
+		if self._party_templates is None:
+			# Scanned once, so arbitrary party names do not cause a stat() per request
+			templates = {}
+			template_dir = os.path.dirname(self.template_path)
+			try:
+				for filename in os.listdir(template_dir):
+					if filename.startswith('antrag_vorlage_') and filename.endswith('.docx'):
+						templates[filename[len('antrag_vorlage_'):-len('.docx')]] = os.path.join(template_dir, filename)
+			except OSError:
+				pass
+			self._party_templates = templates
+		return self._party_templates.get(slugify(party_name), self.template_path)
 	
 	def _generate_word(self, title, demand, justification, party_name=""):
 		"""Generate a Word document using the template"""
-		# Load template
-		if os.path.exists(self.template_path):
-			doc = Document(self.template_path)
-		else:
-			# Fallback: create new document if template not found
-			doc = Document()
-		
+		return BytesIO(b''.join(self._generate_word_chunks(title, demand, justification, party_name)))
+	
+	def _generate_word_chunks(self, title, demand, justification, party_name=""):
+		"""Generate a Word document as a list of byte strings, large template parts are shared and not copied"""
 		# Get current date in DD.MM.YYYY format
 		current_date = datetime.now().strftime("%d.%m.%Y")
+		template_path = self.template_for(party_name)
+		
+		compiled = self._compiled_for(template_path)
+		if compiled is not None:
+			with span('docx_compiled'):
+				chunks = compiled.render_chunks(title, demand, justification, party_name, current_date)
+			if chunks is not None:
+				return chunks
+		
+		return [self._render_document(title, demand, justification, party_name, current_date, template_path).getvalue()]
+	
+	def _read_form(self, req):
+		"""Read title, demand, justification and party_name from the request"""
+		return tuple(form_value(req, name) for name in ('title', 'demand', 'justification', 'party_name'))
+	
+	def _send_document(self, resp, chunks):
+		"""Stream the document chunks with a Content-Length"""
+		resp.content_type = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+		resp.set_header('Content-Disposition', 'attachment; filename="antrag.docx"')
+		resp.content_length = sum(len(chunk) for chunk in chunks)
+		resp.stream = iter(chunks)
+	
+	def _render_document(self, title, demand, justification, party_name, current_date, template_path=None):
+		"""Fill the template with python-docx"""
+		Document = _import_docx()
+		template_path = template_path or self.template_path
+		# Load template
+		with span('docx_load'):
+			if os.path.exists(template_path):
+				doc = Document(template_path)
+			else:
+				# Fallback: create new document if template not found
+				doc = Document()
+		replace_started = time.perf_counter()
 		
 		# Use demand directly without heading
 		antragtext = demand
@@ -463,16 +3309,19 @@ class GenerateWordResource:
 									if i < len(lines) - 1:
 										paragraph.add_run('\n')
 		
+		record_stage('docx_replace', replace_started)
+		
 		# Save to buffer
 		buffer = BytesIO()
-		doc.save(buffer)
+		with span('docx_save'):
+			doc.save(buffer)
 		buffer.seek(0)
 		return buffer
 	
 	def on_post(self, req, resp):
 		"""Generate Word document from form data"""
 		try:
-			if not DOCX_AVAILABLE:
+			if not docx_available():
 				resp.status = falcon.HTTP_500
 				resp.content_type = 'application/json'
 				resp.text = json.dumps({
@@ -481,32 +3330,14 @@ class GenerateWordResource:
 				})
 				return
 			
-			# Get form data
-			title = req.get_param('title', default='') or ''
-			demand = req.get_param('demand', default='') or ''
-			justification = req.get_param('justification', default='') or ''
-			party_name = req.get_param('party_name', default='') or ''
-			
-			# If empty, try to read from stream
-			if not title:
-				try:
-					stream = getattr(req, 'bounded_stream', req.stream)
-					raw_body = stream.read().decode('utf-8')
-					parsed = parse_qs(raw_body)
-					title = parsed.get('title', [''])[0]
-					demand = parsed.get('demand', [''])[0]
-					justification = parsed.get('justification', [''])[0]
-					party_name = parsed.get('party_name', [''])[0]
-				except Exception:
-					pass
+			# Get form data, the body was parsed by BodyParserMiddleware
+			title, demand, justification, party_name = self._read_form(req)
 			
 			# Generate Word document
-			word_buffer = self._generate_word(title, demand, justification, party_name)
+			chunks = self._generate_word_chunks(title, demand, justification, party_name)
 			
 			# Return Word document
-			resp.content_type = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-			resp.set_header('Content-Disposition', 'attachment; filename="antrag.docx"')
-			resp.data = word_buffer.read()
+			self._send_document(resp, chunks)
 			
 		except Exception as e:
 			import traceback
@@ -518,18 +3349,141 @@ class GenerateWordResource:
 				'error': str(e)
 			})
 
-class RobotsResource:
-	def on_get(self, req, resp):
-		resp.content_type = 'text/plain; charset=utf-8'
-		resp.text = f"""User-agent: *
+	def _batch_executor(self):
+		"""Pool for batch rendering, started on the first batch"""
+		if self._executor is None:
+			with self._compiled_lock:
+				if self._executor is None:
+					if BATCH_WORKERS > 0:
+						# Fresh interpreters instead of fork(), this process runs other threads
+						context = _BatchWorkerContext()
+						context.set_executable(_python_executable())
+						self._executor = ProcessPoolExecutor(max_workers=BATCH_WORKERS, mp_context=context)
+					else:
+						self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='meinantrag-docx')
+		return self._executor
+	
+	def _parse_batch(self, items):
+		"""Validate a JSON batch, returns the list of items or raises ValueError with the message for the client"""
+		if items is None:
+			raise ValueError('Erwartet wird ein JSON-Body (Content-Type: application/json)')
+		if isinstance(items, dict):
+			items = items.get('items')
+		if not isinstance(items, list) or not items:
+			raise ValueError('Erwartet wird eine nicht leere Liste von Anträgen')
+		
+		batch = []
+		for item in items:
+			if not isinstance(item, dict):
+				raise ValueError('Jeder Antrag muss ein Objekt sein')
+			fields = {}
+			for name in ('title', 'demand', 'justification', 'party_name'):
+				value = item.get(name) or ''
+				if not isinstance(value, str):
+					raise ValueError(f"Feld {name} muss ein Text sein")
+				fields[name] = value
+			batch.append(fields)
+		return batch
+	
+	def _batch_filename(self, index, item):
+		return f"{index + 1:03d}-{slugify(item['title'])[:60] or 'antrag'}.docx"
+	
+	def _batch_chunks(self, items):
+		"""Yield a ZIP archive with one document per item, each document is written as soon as it is finished"""
+		executor = self._batch_executor()
+		in_flight = 2 * max(1, BATCH_WORKERS)
+		writer = _ZipChunks()
+		pending = {}
+		next_index = 0
+		try:
+			# The documents are compressed already, stored entries avoid deflating them twice
+			with zipfile.ZipFile(writer, 'w', compression=zipfile.ZIP_STORED) as archive:
+				while next_index < len(items) or pending:
+					# Only a few documents are in flight, so a slow client does not pile up results in memory
+					while next_index < len(items) and len(pending) < in_flight:
+						item = items[next_index]
+						args = (item['title'], item['demand'], item['justification'], item['party_name'])
+						try:
+							future = executor.submit(_render_batch_item, *args)
+						except BrokenProcessPool:
+							# A worker died in an earlier batch, start a new pool
+							self._executor = None
+							executor = self._batch_executor()
+							future = executor.submit(_render_batch_item, *args)
+						pending[future] = next_index
+						next_index += 1
+					done, _ = wait(pending, return_when=FIRST_COMPLETED)
+					for future in sorted(done, key=pending.get):
+						index = pending.pop(future)
+						try:
+							archive.writestr(self._batch_filename(index, items[index]), future.result())
+							METRICS.inc('meinantrag_docx_batch_documents_total', 'Documents rendered for batch exports', outcome='ok')
+						except Exception as e:
+							print(f"Batch document {index + 1} failed: {e!r}")
+							archive.writestr(f"{index + 1:03d}-fehler.txt", f"Antrag {index + 1} konnte nicht erzeugt werden: {e}\n")
+							METRICS.inc('meinantrag_docx_batch_documents_total', 'Documents rendered for batch exports', outcome='error')
+						yield writer.take()
+			# Central directory
+			yield writer.take()
+		finally:
+			for future in pending:
+				future.cancel()
+	
+	def _batch_response(self, resp, body):
+		"""Validate the batch and prepare the headers, returns the items or None after sending an error"""
+		if not docx_available():
+			resp.status = falcon.HTTP_500
+			resp.content_type = 'application/json'
+			resp.text = json.dumps({
+				'success': False,
+				'error': 'python-docx not installed'
+			})
+			return None
+		
+		try:
+			items = self._parse_batch(body)
+		except ValueError as e:
+			resp.status = falcon.HTTP_400
+			resp.content_type = 'application/json'
+			resp.text = json.dumps({
+				'success': False,
+				'error': str(e)
+			})
+			return None
+		
+		if len(items) > BATCH_MAX_ITEMS:
+			resp.status = falcon.HTTP_413
+			resp.content_type = 'application/json'
+			resp.text = json.dumps({
+				'success': False,
+				'error': f"Zu viele Anträge, höchstens {BATCH_MAX_ITEMS} pro Anfrage"
+			})
+			return None
+		
+		resp.content_type = 'application/zip'
+		resp.set_header('Content-Disposition', 'attachment; filename="antraege.zip"')
+		return items
+	
+	def on_post_batch(self, req, resp):
+		"""Generate a ZIP archive of Word documents from a JSON list of {title, demand, justification, party_name}"""
+		items = self._batch_response(resp, req.context.json)
+		if items is not None:
+			resp.stream = self._batch_chunks(items)
+
+class RobotsResource(PrerenderedResource):
+	content_type = 'text/plain; charset=utf-8'
+	
+	def render(self):
+		return f"""User-agent: *
 Allow: /
 Sitemap: {SITE_BASE_URL}/sitemap.xml
 """
 
-class SitemapResource:
-	def on_get(self, req, resp):
-		resp.content_type = 'application/xml; charset=utf-8'
-		resp.text = f"""<?xml version="1.0" encoding="UTF-8"?>
+class SitemapResource(PrerenderedResource):
+	content_type = 'application/xml; charset=utf-8'
+	
+	def render(self):
+		return f"""<?xml version="1.0" encoding="UTF-8"?>
 <urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
   <url><loc>{SITE_BASE_URL}/</loc></url>
   <url><loc>{SITE_BASE_URL}/impressum</loc></url>
@@ -537,8 +3491,546 @@ class SitemapResource:
 </urlset>
 """
 
+class StatsResource:
+	def __init__(self, cache=None, scheduler=None, jobs=None, generator=None, library=None, limiter=None):
+		self.cache = cache
+		self.scheduler = scheduler
+		self.jobs = jobs
+		self.generator = generator
+		self.library = library
+		self.limiter = limiter
+	
+	def on_get(self, req, resp):
+		"""Report runtime counters of this worker process"""
+		resp.content_type = 'application/json'
+		resp.text = json.dumps({
+			'pid': os.getpid(),
+			'cache': self.cache.snapshot() if self.cache is not None else None,
+			'scheduler': self.scheduler.snapshot() if self.scheduler is not None else None,
+			'jobs': len(self.jobs) if self.jobs is not None else None,
+			'generation': self.generator.mode_snapshot() if self.generator is not None else None,
+			'library': self.library.snapshot() if self.library is not None else None,
+			'rate_limit': self.limiter.snapshot() if self.limiter is not None else None
+		})
+
+class MetricsMiddleware:
+	"""Count requests and their latency per route, method and status"""
+	
+	def __init__(self, metrics=METRICS):
+		self.metrics = metrics
+	
+	def process_request(self, req, resp):
+		req.context.metrics_started = time.perf_counter()
+	
+	def process_response(self, req, resp, resource, req_succeeded):
+		started = getattr(req.context, 'metrics_started', None)
+		if started is None:
+			return
+		# The route template keeps the number of series bounded, unknown paths share one label
+		route = req.uri_template or 'unmatched'
+		labels = {'route': route, 'method': req.method, 'status': str(resp.status_code)}
+		self.metrics.inc('meinantrag_http_requests_total', 'HTTP requests', **labels)
+		# For streams this is the time to the first byte, the body is sent afterwards
+		self.metrics.observe('meinantrag_http_request_seconds', 'HTTP request latency until the response is handed to the server', time.perf_counter() - started, **labels)
+		self.metrics.flush()
+	
+	async def process_request_async(self, req, resp):
+		self.process_request(req, resp)
+	
+	async def process_response_async(self, req, resp, resource, req_succeeded):
+		self.process_response(req, resp, resource, req_succeeded)
+
+class StackSampler:
+	"""Record the stack of one thread every interval seconds as collapsed stacks
+	
+	The samples are taken from a separate thread with sys._current_frames(),
+	the profiled thread is not slowed down apart from the GIL switches.
+	"""
+	
+	def __init__(self, thread_id, interval=0.005):
+		self.thread_id = thread_id
+		self.interval = interval
+		self.stacks = {}
+		self._stop = threading.Event()
+		self._thread = threading.Thread(target=self._run, name='meinantrag-sampler', daemon=True)
+	
+	def enable(self):
+		self._thread.start()
+	
+	def disable(self):
+		self._stop.set()
+		self._thread.join()
+	
+	def _run(self):
+		while not self._stop.wait(self.interval):
+			frame = sys._current_frames().get(self.thread_id)
+			names = []
+			while frame is not None:
+				code = frame.f_code
+				names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+				frame = frame.f_back
+			if names:
+				stack = ';'.join(reversed(names))
+				self.stacks[stack] = self.stacks.get(stack, 0) + 1
+	
+	def dump(self, path):
+		"""Write one 'frame;frame;frame count' line per stack, the input format of flamegraph.pl and speedscope"""
+		with open(path, 'w', encoding='utf-8') as f:
+			for stack, count in sorted(self.stacks.items()):
+				f.write(f"{stack} {count}\n")
+
+class ProfileMiddleware:
+	"""Profile single requests and keep the results in a directory
+	
+	A request is profiled when it carries the header X-Profile with the
+	secret token, or by chance with sample_rate. mode 'cprofile' writes a
+	pstats file (python -m pstats, snakeviz), mode 'sample' a collapsed
+	stack file for flame graphs. Only the thread handling the request is
+	profiled, from before the body is parsed until the responder returns;
+	streamed bodies and work in other threads or processes show up as
+	waiting. One request per process is profiled at a time, cProfile cannot
+	run twice. The newest keep profiles are kept, each with a .json file of
+	its request. Without a directory the middleware is not installed.
+	"""
+	
+	def __init__(self, directory, token=None, sample_rate=0.0, mode='cprofile', keep=200, interval=0.005):
+		if mode not in ('cprofile', 'sample'):
+			raise ValueError(f"Unknown profiling mode {mode!r}, expected 'cprofile' or 'sample'")
+		self.directory = directory
+		self.token = token
+		self.sample_rate = sample_rate
+		self.mode = mode
+		self.keep = keep
+		self.interval = interval
+		self._lock = threading.Lock()
+		os.makedirs(directory, exist_ok=True)
+	
+	def _token_matches(self, value):
+		return bool(self.token and value) and secrets.compare_digest(value.encode('utf-8'), self.token.encode('utf-8'))
+	
+	def authorized(self, req):
+		"""Whether the request carries the token, as X-Profile or as bearer token"""
+		auth = req.get_header('Authorization') or ''
+		if auth.startswith('Bearer '):
+			return self._token_matches(auth[len('Bearer '):])
+		return self._token_matches(req.get_header('X-Profile'))
+	
+	def _wanted(self, req):
+		if self._token_matches(req.get_header('X-Profile')):
+			return True
+		return self.sample_rate > 0 and random.random() < self.sample_rate
+	
+	def process_request(self, req, resp):
+		if not self._wanted(req) or not self._lock.acquire(blocking=False):
+			return
+		try:
+			if self.mode == 'sample':
+				profiler = StackSampler(threading.get_ident(), self.interval)
+			else:
+				import cProfile
+				profiler = cProfile.Profile()
+			profiler.enable()
+		except Exception as e:
+			self._lock.release()
+			print(f"Warning: Could not start profiling: {e}")
+			return
+		req.context.profile = (profiler, time.time(), time.perf_counter())
+	
+	def _stop(self, req, resp):
+		"""Stop the profiler of the request, returns it and the request details or None"""
+		profile = getattr(req.context, 'profile', None)
+		if profile is None:
+			return None
+		req.context.profile = None
+		profiler, started_at, started = profile
+		try:
+			profiler.disable()
+		finally:
+			self._lock.release()
+		return profiler, {
+			'method': req.method,
+			'path': req.path,
+			'route': req.uri_template or 'unmatched',
+			'status': resp.status_code,
+			'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+			'started': datetime.fromtimestamp(started_at).isoformat(timespec='milliseconds'),
+			'pid': os.getpid(),
+			'mode': self.mode,
+		}
+	
+	def save(self, profiler, info):
+		"""Write the profile and its .json file, then drop the oldest profiles beyond keep"""
+		name = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{os.getpid()}"
+		info['file'] = name + ('.collapsed' if self.mode == 'sample' else '.prof')
+		try:
+			if self.mode == 'sample':
+				profiler.dump(os.path.join(self.directory, info['file']))
+			else:
+				profiler.dump_stats(os.path.join(self.directory, info['file']))
+			with open(os.path.join(self.directory, name + '.json'), 'w', encoding='utf-8') as f:
+				json.dump(info, f)
+			self._prune()
+		except OSError as e:
+			print(f"Warning: Could not write profile to {self.directory}: {e}")
+			return
+		METRICS.inc('meinantrag_profiles_total', 'Profiled requests', route=info['route'])
+	
+	def _prune(self):
+		# The names start with the time, so the oldest sort first
+		names = sorted(name for name in os.listdir(self.directory) if name.endswith('.json'))
+		for name in names[:max(0, len(names) - self.keep)]:
+			stem = name[:-len('.json')]
+			for suffix in ('.json', '.prof', '.collapsed'):
+				try:
+					os.unlink(os.path.join(self.directory, stem + suffix))
+				except FileNotFoundError:
+					pass
+	
+	def slowest(self, limit=20):
+		"""The slowest of the kept profiles, of all processes"""
+		profiles = []
+		for name in os.listdir(self.directory):
+			if not name.endswith('.json'):
+				continue
+			try:
+				with open(os.path.join(self.directory, name), encoding='utf-8') as f:
+					profiles.append(json.load(f))
+			except (OSError, ValueError):
+				# Removed by another process or still being written
+				continue
+		profiles.sort(key=lambda info: info.get('duration_ms', 0), reverse=True)
+		return profiles[:limit]
+	
+	def process_response(self, req, resp, resource, req_succeeded):
+		stopped = self._stop(req, resp)
+		if stopped is not None:
+			self.save(*stopped)
+	
+	async def process_request_async(self, req, resp):
+		# On the event loop the other requests running meanwhile end up in the profile too
+		self.process_request(req, resp)
+	
+	async def process_response_async(self, req, resp, resource, req_succeeded):
+		stopped = self._stop(req, resp)
+		if stopped is not None:
+			await run_in_thread(self.save, *stopped)
+
+def form_value(req, name):
+	"""Value of a field from the query string or the body parsed by BodyParserMiddleware, '' if missing"""
+	value = req.get_param(name, default='')
+	if not value:
+		value = getattr(req.context, 'form', {}).get(name, '')
+	return value or ''
+
+class BodyParserError(Exception):
+	def __init__(self, status, message):
+		super().__init__(message)
+		self.status = status
+
+class BodyParserMiddleware:
+	"""Parse urlencoded, multipart and JSON bodies once per request
+	
+	Text fields end up in req.context.form, a JSON body additionally in
+	req.context.json. Content-Length is checked before anything is read, and
+	at most max_body_size + 1 bytes are read, so chunked uploads cannot get
+	past the limit either. Oversize bodies and fields are answered with 413.
+	"""
+	
+	methods = ('POST', 'PUT', 'PATCH')
+	
+	def __init__(self, max_body_size=MAX_BODY_SIZE, max_field_size=MAX_FIELD_SIZE, max_fields=100):
+		self.max_body_size = max_body_size
+		self.max_field_size = max_field_size
+		self.max_fields = max_fields
+		self._multipart = None
+	
+	def _prepare(self, req):
+		"""Returns whether the request has a body to read"""
+		req.context.form = {}
+		req.context.json = None
+		if req.method not in self.methods:
+			return False
+		if req.content_length is not None and req.content_length > self.max_body_size:
+			raise BodyParserError(falcon.HTTP_413, f"Die Anfrage ist zu groß (höchstens {self.max_body_size} Bytes)")
+		return True
+	
+	def _media_type(self, req):
+		return (req.content_type or '').partition(';')[0].strip().lower()
+	
+	def _parse(self, req, body):
+		if len(body) > self.max_body_size:
+			raise BodyParserError(falcon.HTTP_413, f"Die Anfrage ist zu groß (höchstens {self.max_body_size} Bytes)")
+		if not body:
+			return
+		media_type = self._media_type(req)
+		if media_type == 'application/x-www-form-urlencoded':
+			try:
+				parsed = parse_qs(body.decode('utf-8'), keep_blank_values=True, max_num_fields=self.max_fields)
+			except UnicodeDecodeError:
+				raise BodyParserError(falcon.HTTP_400, 'Ungültige Zeichenkodierung, erwartet wird UTF-8')
+			except ValueError:
+				raise BodyParserError(falcon.HTTP_400, 'Zu viele Formularfelder')
+			form = {name: values[0] for name, values in parsed.items()}
+		elif media_type == 'multipart/form-data':
+			form = self._parse_multipart(req, body)
+		elif media_type == 'application/json' or media_type.endswith('+json'):
+			try:
+				data = json.loads(body)
+			except ValueError:
+				raise BodyParserError(falcon.HTTP_400, 'Ungültiges JSON')
+			self._check_json(data)
+			req.context.json = data
+			form = {name: value for name, value in data.items() if isinstance(value, str)} if isinstance(data, dict) else {}
+		else:
+			return
+		for name, value in form.items():
+			self._check_field(name, value)
+		req.context.form = form
+	
+	def _parse_multipart(self, req, body):
+		if self._multipart is None:
+			handler = falcon.media.MultipartFormHandler()
+			# The body is complete already, the field limit is checked on the text
+			handler.parse_options.max_body_part_buffer_size = self.max_body_size
+			handler.parse_options.max_body_part_count = self.max_fields
+			self._multipart = handler
+		form = {}
+		try:
+			for part in self._multipart.deserialize(BytesIO(body), req.content_type, len(body)):
+				data = part.stream.read()
+				# Uploaded files are not used by any endpoint
+				if part.filename or part.name is None:
+					continue
+				try:
+					form.setdefault(part.name, data.decode('utf-8'))
+				except UnicodeDecodeError:
+					raise BodyParserError(falcon.HTTP_400, 'Ungültige Zeichenkodierung, erwartet wird UTF-8')
+		except falcon.MediaMalformedError:
+			raise BodyParserError(falcon.HTTP_400, 'Ungültiger multipart/form-data-Body')
+		return form
+	
+	def _check_json(self, value, name='JSON'):
+		if isinstance(value, str):
+			self._check_field(name, value)
+		elif isinstance(value, dict):
+			for key, item in value.items():
+				self._check_json(item, key)
+		elif isinstance(value, list):
+			for item in value:
+				self._check_json(item, name)
+	
+	def _check_field(self, name, value):
+		if len(value) > self.max_field_size:
+			raise BodyParserError(falcon.HTTP_413, f"Feld {name} ist zu lang (höchstens {self.max_field_size} Zeichen)")
+	
+	def _reject(self, resp, e):
+		resp.status = e.status
+		resp.content_type = 'application/json'
+		resp.text = json.dumps({
+			'success': False,
+			'error': str(e)
+		})
+		# Skip the responder, the remaining middleware still runs
+		resp.complete = True
+	
+	def process_request(self, req, resp):
+		try:
+			if self._prepare(req):
+				self._parse(req, req.bounded_stream.read(self.max_body_size + 1))
+		except BodyParserError as e:
+			self._reject(resp, e)
+	
+	async def process_request_async(self, req, resp):
+		try:
+			if self._prepare(req):
+				self._parse(req, await req.stream.read(self.max_body_size + 1))
+		except BodyParserError as e:
+			self._reject(resp, e)
+
+class RateLimitMiddleware:
+	"""Answer 429 with Retry-After when a client exceeds the limit of a route group
+	
+	Only the routes in RATE_LIMIT_ROUTES are limited, for every other request
+	the check is a dictionary lookup. Clients are identified by their address,
+	IPv6 clients by their /64 network. X-Forwarded-For is only followed
+	through the proxies in trusted_proxies.
+	"""
+	
+	def __init__(self, limiter, limits=RATE_LIMITS, routes=RATE_LIMIT_ROUTES, trusted_proxies=TRUSTED_PROXIES):
+		self.limiter = limiter
+		self.limits = limits
+		self.routes = routes
+		self.trusted_proxies = trusted_proxies
+	
+	def _trusted(self, address):
+		try:
+			ip = ipaddress.ip_address(address)
+		except ValueError:
+			return False
+		return any(ip in network for network in self.trusted_proxies)
+	
+	def client_address(self, req):
+		"""Address of the client, the last X-Forwarded-For hop that is not a trusted proxy"""
+		address = req.remote_addr
+		forwarded = req.get_header('X-Forwarded-For')
+		if forwarded and self._trusted(address):
+			for hop in reversed(forwarded.split(',')):
+				address = hop.strip()
+				if not self._trusted(address):
+					break
+		return address
+	
+	def client_key(self, req):
+		address = self.client_address(req)
+		try:
+			ip = ipaddress.ip_address(address)
+		except ValueError:
+			return address or 'unknown'
+		# An IPv6 client usually gets a whole /64 and could rotate through it
+		if ip.version == 6 and ip.ipv4_mapped is None:
+			return str(ipaddress.ip_network(f"{ip}/64", strict=False))
+		return str(ip)
+	
+	def process_request(self, req, resp):
+		group = self.routes.get((req.method, req.path))
+		limit = self.limits.get(group) if group else None
+		if limit is None:
+			return
+		wait = self.limiter.take(f"{group}:{self.client_key(req)}", *limit)
+		if not wait:
+			return
+		retry_after = max(1, math.ceil(wait))
+		METRICS.inc('meinantrag_rate_limited_total', 'Requests rejected by the rate limiter', group=group)
+		resp.status = falcon.HTTP_429
+		resp.content_type = 'application/json'
+		resp.set_header('Retry-After', str(retry_after))
+		resp.text = json.dumps({
+			'success': False,
+			'error': f"Zu viele Anfragen, bitte in {retry_after} Sekunden erneut versuchen"
+		})
+		# Skip the body parser and the responder
+		resp.complete = True
+	
+	async def process_request_async(self, req, resp):
+		# A locked SQLite file can take the whole busy timeout, not on the event loop
+		if self.limiter.db_path and (req.method, req.path) in self.routes:
+			await run_in_thread(self.process_request, req, resp)
+		else:
+			self.process_request(req, resp)
+
+class LibraryResource:
+	"""Search the library of generated Anträge, the form asks while the Anliegen is typed"""
+	
+	def __init__(self, library):
+		self.library = library
+	
+	def _query(self, req):
+		text = (req.get_param('q') or '')[:MAX_ANLIEGEN_LENGTH]
+		limit = min(max(req.get_param_as_int('limit') or 5, 1), 10)
+		return text, limit
+	
+	def _search(self, text, limit):
+		with span('library_search'):
+			results = self.library.search(text, limit)
+		METRICS.inc('meinantrag_library_searches_total', 'Searches in the library of generated Anträge', result='hit' if results else 'miss')
+		return results
+	
+	def _respond(self, resp, results):
+		resp.content_type = 'application/json'
+		# Results change only when an Antrag is generated, a short shared cache is fine
+		resp.set_header('Cache-Control', 'public, max-age=60')
+		resp.text = json.dumps({'success': True, 'enabled': self.library.enabled, 'results': results})
+	
+	def on_get_search(self, req, resp):
+		"""Return stored Anträge similar to the text in q"""
+		self._respond(resp, self._search(*self._query(req)))
+
+class AsyncLibraryResource(LibraryResource):
+	async def on_get_search(self, req, resp):
+		self._respond(resp, await run_in_thread(self._search, *self._query(req)))
+
+class MetricsResource:
+	def __init__(self, metrics=METRICS):
+		self.metrics = metrics
+	
+	def on_get(self, req, resp):
+		"""Export the metrics of all worker processes in the Prometheus text format"""
+		resp.content_type = 'text/plain; version=0.0.4; charset=utf-8'
+		resp.set_header('Cache-Control', 'no-store')
+		resp.text = self.metrics.render()
+
+class AsyncMetricsResource(MetricsResource):
+	async def on_get(self, req, resp):
+		# Aggregating reads a file per worker process
+		resp.content_type = 'text/plain; version=0.0.4; charset=utf-8'
+		resp.set_header('Cache-Control', 'no-store')
+		resp.text = await run_in_thread(self.metrics.render)
+
+class ProfilesResource:
+	"""List the slowest recent profiled requests, needs MEINANTRAG_PROFILE_TOKEN"""
+	
+	def __init__(self, profiler):
+		self.profiler = profiler
+	
+	def _limit(self, req):
+		try:
+			return max(1, min(int(req.get_param('limit') or 20), 200))
+		except ValueError:
+			return 20
+	
+	def _respond(self, req, resp, profiles):
+		resp.content_type = 'application/json'
+		resp.set_header('Cache-Control', 'no-store')
+		resp.text = json.dumps({'success': True, 'directory': self.profiler.directory, 'profiles': profiles})
+	
+	def _forbidden(self, resp):
+		resp.status = falcon.HTTP_403
+		resp.content_type = 'application/json'
+		resp.text = json.dumps({'success': False, 'error': 'Nicht berechtigt'})
+	
+	def on_get(self, req, resp):
+		if not self.profiler.authorized(req):
+			self._forbidden(resp)
+			return
+		self._respond(req, resp, self.profiler.slowest(self._limit(req)))
+
+class AsyncProfilesResource(ProfilesResource):
+	async def on_get(self, req, resp):
+		if not self.profiler.authorized(req):
+			self._forbidden(resp)
+			return
+		self._respond(req, resp, await run_in_thread(self.profiler.slowest, self._limit(req)))
+
 # Create Falcon application
-app = falcon.App()
+rate_limiter = RateLimiter(
+	db_path=os.environ.get('MEINANTRAG_RATE_LIMIT_DB') or None,
+	idle_timeout=max([period for _, period in filter(None, RATE_LIMITS.values())] + [60])
+)
+
+# Opt-in request profiling, nothing is installed without a directory
+PROFILE_DIR = os.environ.get('MEINANTRAG_PROFILE_DIR') or None
+request_profiler = None
+if PROFILE_DIR:
+	try:
+		request_profiler = ProfileMiddleware(
+			PROFILE_DIR,
+			token=os.environ.get('MEINANTRAG_PROFILE_TOKEN') or None,
+			sample_rate=float(os.environ.get('MEINANTRAG_PROFILE_SAMPLE_RATE', '0')),
+			mode=os.environ.get('MEINANTRAG_PROFILE_MODE', 'cprofile'),
+			keep=int(os.environ.get('MEINANTRAG_PROFILE_KEEP', '200'))
+		)
+	except (OSError, ValueError) as e:
+		print(f"Warning: Request profiling disabled: {e}")
+
+def create_middleware():
+	middleware = [MetricsMiddleware(), RateLimitMiddleware(rate_limiter)]
+	if request_profiler is not None:
+		# Before the body parser, so parsing is part of the profile
+		middleware.append(request_profiler)
+	middleware.append(BodyParserMiddleware())
+	return middleware
+
+app = falcon.App(middleware=create_middleware())
 
 # Discover static assets directory
 STATIC_DIR = os.environ.get('MEINANTRAG_STATIC_DIR')
@@ -557,33 +4049,473 @@ if not STATIC_DIR:
 			# Fallback to packaged location under share
 			STATIC_DIR = os.path.join(script_dir, '..', 'share', 'meinantrag', 'assets')
 
+# Result cache for /api/generate-antrag
+generation_cache = GenerationCache(
+	max_entries=int(os.environ.get('MEINANTRAG_CACHE_SIZE', '512')),
+	ttl=float(os.environ.get('MEINANTRAG_CACHE_TTL', '86400')),
+	db_path=os.environ.get('MEINANTRAG_CACHE_DB') or None,
+	db_max_entries=int(os.environ.get('MEINANTRAG_CACHE_DB_SIZE', '10000'))
+)
+
+# Searchable library of generated Anträge, only with a database file
+antrag_library = AntragLibrary(
+	db_path=os.environ.get('MEINANTRAG_LIBRARY_DB') or None,
+	retention=float(os.environ.get('MEINANTRAG_LIBRARY_RETENTION_DAYS', '365')) * 86400,
+	anonymize=os.environ.get('MEINANTRAG_LIBRARY_ANONYMIZE', '1') not in ('', '0')
+)
+
+# Admission control for generations, per process
+generation_scheduler = GenerationScheduler(
+	max_concurrent=int(os.environ.get('MEINANTRAG_MAX_CONCURRENT', '4')),
+	max_queue=int(os.environ.get('MEINANTRAG_QUEUE_SIZE', '16')),
+	queue_timeout=float(os.environ.get('MEINANTRAG_QUEUE_TIMEOUT', '20'))
+)
+
+# Background jobs for /api/jobs
+generation_jobs = JobStore(
+	ttl=float(os.environ.get('MEINANTRAG_JOB_TTL', '3600')),
+	db_path=os.environ.get('MEINANTRAG_JOBS_DB') or None
+)
+
+METRICS.gauge('meinantrag_generations_active', 'Generations holding a scheduler slot', lambda: generation_scheduler._active)
+METRICS.gauge('meinantrag_generations_queued', 'Generations waiting for a scheduler slot', lambda: len(generation_scheduler._waiters))
+
 # Add routes
 meinantrag = MeinAntragApp()
 impressum = ImpressumResource()
 datenschutz = DatenschutzResource()
-generate_antrag = GenerateAntragResource()
+generate_antrag = GenerateAntragResource(cache=generation_cache, scheduler=generation_scheduler, library=antrag_library)
+generation_job = GenerationJobResource(generate_antrag, generation_jobs)
 generate_word = GenerateWordResource()
 robots = RobotsResource()
 sitemap = SitemapResource()
+stats = StatsResource(cache=generation_cache, scheduler=generation_scheduler, jobs=generation_jobs, generator=generate_antrag, library=antrag_library, limiter=rate_limiter)
 
 app.add_route('/', meinantrag)
 app.add_route('/impressum', impressum)
 app.add_route('/datenschutz', datenschutz)
 app.add_route('/api/generate-antrag', generate_antrag)
+app.add_route('/api/generate-antrag/stream', generate_antrag, suffix='stream')
+app.add_route('/api/jobs', generation_job)
+app.add_route('/api/jobs/{job_id}', generation_job, suffix='job')
 app.add_route('/api/generate-word', generate_word)
+app.add_route('/api/generate-word/batch', generate_word, suffix='batch')
 app.add_route('/robots.txt', robots)
 app.add_route('/sitemap.xml', sitemap)
+app.add_route('/api/library/search', LibraryResource(antrag_library), suffix='search')
+app.add_route('/api/stats', stats)
+app.add_route('/metrics', MetricsResource())
+if request_profiler is not None:
+	app.add_route('/api/admin/profiles', ProfilesResource(request_profiler))
 
 # Static file route
-if STATIC_DIR and os.path.isdir(STATIC_DIR):
-	app.add_static_route('/static', STATIC_DIR)
+static_files = StaticResource(STATIC_DIR) if STATIC_DIR and os.path.isdir(STATIC_DIR) else None
+if static_files is not None:
+	app.add_route('/static/{path:path}', static_files)
+
+def preload():
+	"""Import the lazy dependencies and render everything that is otherwise done on first use"""
+	for resource in (meinantrag, impressum, datenschutz, robots, sitemap):
+		resource._get_page()
+	generate_antrag.backend
+	if docx_available():
+		generate_word.compiled
+
+# Not in batch workers: pages, LLM client and databases are of no use there
+if PRELOAD and not in_batch_worker():
+	preload()
+
+async def run_in_thread(func, *args, **kwargs):
+	"""Run a blocking call in the event loop's thread pool"""
+	loop = asyncio.get_running_loop()
+	return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+async def iterate_chunks(chunks):
+	"""Async iterator over byte strings that are already in memory, for resp.stream"""
+	for chunk in chunks:
+		yield chunk
+
+async def iterate_in_thread(iterator):
+	"""Iterate a blocking iterator, every next() runs in the event loop's thread pool"""
+	done = object()
+	try:
+		while True:
+			item = await run_in_thread(next, iterator, done)
+			if item is done:
+				return
+			yield item
+	finally:
+		close = getattr(iterator, 'close', None)
+		if close is not None:
+			try:
+				close()
+			except ValueError:
+				# Still running in the worker thread, it finishes on its own
+				pass
+
+class AsyncPageResource:
+	"""Serve a PrerenderedResource from the ASGI app"""
+	
+	def __init__(self, resource):
+		self.resource = resource
+	
+	async def on_get(self, req, resp):
+		if getattr(self.resource, '_page', None) is None or DEV_RELOAD:
+			# Rendering (or checking template mtimes) touches the disk
+			page = await run_in_thread(self.resource._get_page)
+		else:
+			page = self.resource._page
+		page.respond(req, resp)
+
+class AsyncGenerateAntragResource(GenerateAntragResource):
+	"""GenerateAntragResource for the ASGI app, Gemini calls do not block a thread while waiting"""
+	
+	async def _get_backend(self):
+		# The first access imports the backend module, which takes a while
+		if self._backend is None:
+			return await run_in_thread(lambda: self.backend)
+		return self._backend
+	
+	async def _generate_async(self, prompt, structured=False, draft=False):
+		backend = self.draft_backend if draft else self.backend
+		
+		async def call():
+			with llm_call(backend, self._llm_stage(structured, draft)):
+				return await backend.generate_async(prompt, structured)
+		
+		return await self.single_flight.do_async(self._flight_key(backend, prompt, structured), call)
+	
+	async def _collect_email_async(self, email_task, deadline, title):
+		"""Wait for the e-mail generation, returns the text and whether the fallback was used"""
+		try:
+			email_text = await asyncio.wait_for(email_task, timeout=max(0, deadline - time.monotonic()))
+			return self._remove_markdown(email_text).strip(), False
+		except Exception as e:
+			print(f"E-mail generation failed, using fallback: {e!r}")
+			return FALLBACK_EMAIL.format(title=title), True
+	
+	async def _check_request_async(self, req, resp):
+		"""Read the form, returns (anliegen, party_id) or None after sending an error"""
+		if not await self._get_backend():
+			self._error(resp, falcon.HTTP_500, f'LLM backend {LLM_BACKEND} not configured')
+			return None
+		
+		with span('form'):
+			anliegen, party_id = self._read_form(req)
+		return self._validate_form(resp, anliegen, party_id)
+	
+	async def _fit_input_async(self, anliegen):
+		"""Keep the Anliegen within INPUT_TOKEN_BUDGET, like _fit_input"""
+		if not self._over_budget(anliegen):
+			return anliegen
+		summary = None
+		if INPUT_OVERFLOW == 'summarize':
+			with self._summarizing():
+				summary = await self.draft_backend.generate_async(PROMPTS['summary'].render(anliegen), timeout=LLM_TIMEOUT / 2)
+		return self._fitted(anliegen, summary)
+	
+	async def _run_generation_async(self, anliegen, cache_key, party_name=''):
+		"""Generate Antrag and e-mail, raises GenerationTimeoutError if the Antrag takes too long"""
+		mode = generation_mode(anliegen)
+		started = time.monotonic()
+		try:
+			anliegen = await self._fit_input_async(anliegen)
+			if mode == 'structured':
+				result, fallback = await self._run_structured_async(anliegen, cache_key, party_name)
+			else:
+				result, fallback = await self._run_text_async(anliegen, cache_key, party_name)
+		except Exception:
+			self._record(mode, started, error=True)
+			raise
+		self._record(mode, started, fallback=fallback)
+		return result
+	
+	async def _run_structured_async(self, anliegen, cache_key, party_name):
+		deadline = time.monotonic() + LLM_TIMEOUT
+		try:
+			text = await asyncio.wait_for(self._generate_async(PROMPTS['structured'].render(anliegen), True), timeout=LLM_TIMEOUT)
+		except asyncio.TimeoutError:
+			raise GenerationTimeoutError('Zeitüberschreitung bei der Generierung des Antrags')
+		parsed, email_text, fallback = await self._structured_result_async(text, anliegen, deadline)
+		return await run_in_thread(self._finish, parsed, email_text, fallback, cache_key, party_name), fallback
+	
+	async def _run_text_async(self, anliegen, cache_key, party_name):
+		deadline = time.monotonic() + LLM_TIMEOUT
+		email_task = asyncio.ensure_future(self._generate_async(PROMPTS['email'].render(anliegen), draft=True))
+		parsed = await self._text_antrag_async(anliegen, deadline, email_task)
+		email_text, email_failed = await self._collect_email_async(email_task, deadline, parsed['title'])
+		return await run_in_thread(self._finish, parsed, email_text, email_failed, cache_key, party_name), email_failed
+	
+	async def _text_antrag_async(self, anliegen, deadline, email_task=None):
+		try:
+			generated_text = await asyncio.wait_for(self._generate_async(PROMPTS['antrag'].render(anliegen)), timeout=max(0, deadline - time.monotonic()))
+		except asyncio.TimeoutError:
+			if email_task is not None:
+				email_task.cancel()
+			raise GenerationTimeoutError('Zeitüberschreitung bei der Generierung des Antrags')
+		except BaseException:
+			if email_task is not None:
+				email_task.cancel()
+			raise
+		return self._parse_gemini_response(generated_text)
+	
+	async def _structured_result_async(self, text, anliegen, deadline):
+		fields, parsed = self._parse_structured(text)
+		email_task = None if fields['email_body'] else asyncio.ensure_future(self._generate_async(PROMPTS['email'].render(anliegen), draft=True))
+		if parsed is None:
+			parsed = await self._text_antrag_async(anliegen, deadline, email_task)
+		if email_task is None:
+			return parsed, fields['email_body'], False
+		email_text, email_failed = await self._collect_email_async(email_task, deadline, parsed['title'])
+		return parsed, email_text, email_failed
+	
+	async def on_post(self, req, resp):
+		"""Generate text from user input using Gemini API"""
+		try:
+			form = await self._check_request_async(req, resp)
+			if form is None:
+				return
+			anliegen, party_id = form
+			
+			cache_key, result = await run_in_thread(self._lookup_cache, anliegen, party_id)
+			if result is None:
+				async with self.scheduler.slot_async():
+					result = await self._run_generation_async(anliegen, cache_key, party_id)
+			self._respond(resp, result, party_id)
+		except Exception as e:
+			self._generation_failed(resp, e)
+	
+	async def on_post_stream(self, req, resp):
+		"""Generate text like on_post, but send partial results as Server-Sent Events"""
+		form = await self._check_request_async(req, resp)
+		if form is None:
+			return
+		anliegen, party_id = form
+		
+		cache_key, cached = await run_in_thread(self._lookup_cache, anliegen, party_id)
+		if cached is None:
+			try:
+				await self.scheduler.acquire_async()
+			except SchedulerBusyError as e:
+				self._busy(resp, e)
+				return
+		if self._event_stream(resp, cached, party_id):
+			resp.stream = AsyncSlotStream(self._stream_events_async(anliegen, party_id, cache_key), self.scheduler)
+	
+	async def _stream_events_async(self, anliegen, party_name, cache_key):
+		"""Yield SSE events with the growing parse result, then the complete result"""
+		events = GenerationEvents(self, anliegen)
+		yield b': generating\n\n'
+		try:
+			anliegen = await self._fit_input_async(anliegen)
+		except Exception as e:
+			yield events.failed(e)
+			return
+		prompt = events.prompt(anliegen)
+		email_task = None if events.structured else asyncio.ensure_future(self._generate_async(PROMPTS['email'].render(anliegen), draft=True))
+		try:
+			try:
+				with llm_call(self.backend, events.stage):
+					async for text in self.backend.stream_async(prompt, events.structured):
+						event = events.piece(text)
+						if event is not None:
+							yield event
+			except Exception as e:
+				yield events.failed(e)
+				return
+			
+			if events.structured:
+				parsed, email_text, email_failed = await self._structured_result_async(events.text, anliegen, events.deadline)
+			else:
+				parsed = self._parse_gemini_response(events.text)
+				email_text, email_failed = await self._collect_email_async(email_task, events.deadline, parsed['title'])
+			result = await run_in_thread(self._finish, parsed, email_text, email_failed, cache_key, party_name)
+			yield events.done(result, party_name, email_failed)
+		finally:
+			# Also reached when the client disconnects mid-stream
+			if email_task is not None and not email_task.done():
+				email_task.cancel()
+
+class AsyncGenerationJobResource(GenerationJobResource):
+	"""GenerationJobResource for the ASGI app, jobs run as tasks on the event loop"""
+	
+	def __init__(self, generator, jobs):
+		self.generator = generator
+		self.jobs = jobs
+		# Strong references, the event loop only keeps weak ones to running tasks
+		self._tasks = set()
+	
+	def _start_task(self, job_id, anliegen, cache_key, party_name):
+		task = asyncio.ensure_future(self._run_async(job_id, anliegen, cache_key, party_name))
+		self._tasks.add(task)
+		task.add_done_callback(self._tasks.discard)
+	
+	async def _run_async(self, job_id, anliegen, cache_key, party_name):
+		started = time.monotonic()
+		try:
+			await run_in_thread(self.jobs.update, job_id, status='running')
+			result = await self.generator._run_generation_async(anliegen, cache_key, party_name)
+			await run_in_thread(self.jobs.update, job_id, status='done', result=result)
+		except Exception as e:
+			await run_in_thread(self._failed, job_id, e)
+		finally:
+			self.generator.scheduler.release(time.monotonic() - started)
+	
+	async def on_post(self, req, resp):
+		"""Create a generation job from the same form as /api/generate-antrag"""
+		form = await self.generator._check_request_async(req, resp)
+		if form is None:
+			return
+		loop = asyncio.get_running_loop()
+		# The job store and the cache may be SQLite files that wait out a lock,
+		# the start is handed back to the loop, also from a thread of another request
+		await run_in_thread(self._submit, resp, form, lambda *job: loop.call_soon_threadsafe(self._start_task, *job))
+	
+	async def on_get_job(self, req, resp, job_id):
+		await run_in_thread(GenerationJobResource.on_get_job, self, req, resp, job_id)
+
+class AsyncGenerateWordResource:
+	"""Serve a GenerateWordResource from the ASGI app, rendering runs in a worker thread"""
+	
+	def __init__(self, resource):
+		self.resource = resource
+	
+	async def on_post(self, req, resp):
+		"""Generate Word document from form data"""
+		try:
+			if not docx_available():
+				resp.status = falcon.HTTP_500
+				resp.content_type = 'application/json'
+				resp.text = json.dumps({
+					'success': False,
+					'error': 'python-docx not installed'
+				})
+				return
+			
+			title, demand, justification, party_name = self.resource._read_form(req)
+			
+			chunks = await run_in_thread(self.resource._generate_word_chunks, title, demand, justification, party_name)
+			
+			self.resource._send_document(resp, chunks)
+			resp.stream = iterate_chunks(chunks)
+			
+		except Exception as e:
+			import traceback
+			traceback.print_exc()
+			resp.status = falcon.HTTP_500
+			resp.content_type = 'application/json'
+			resp.text = json.dumps({
+				'success': False,
+				'error': str(e)
+			})
+
+	async def on_post_batch(self, req, resp):
+		"""Generate a ZIP archive of Word documents from a JSON list of {title, demand, justification, party_name}"""
+		items = self.resource._batch_response(resp, req.context.json)
+		if items is not None:
+			resp.stream = iterate_in_thread(self.resource._batch_chunks(items))
+
+class AsyncStaticResource:
+	"""Serve a StaticResource from the ASGI app, files are read in a worker thread"""
+	
+	def __init__(self, resource):
+		self.resource = resource
+	
+	async def on_get(self, req, resp, path):
+		cached = self.resource._files.get(path)
+		if cached is not None and not DEV_RELOAD:
+			page = cached[1]
+		else:
+			page = await run_in_thread(self.resource.get, path)
+		if page is None:
+			raise falcon.HTTPNotFound()
+		if isinstance(page, str):
+			resp.content_type = self.resource._content_type(page)
+			resp.set_header('Cache-Control', STATIC_CACHE_CONTROL)
+			resp.data = await run_in_thread(_read_file, page)
+			return
+		page.respond(req, resp)
+	
+	on_head = on_get
+
+def _read_file(path):
+	with open(path, 'rb') as f:
+		return f.read()
+
+class AsyncStatsResource(StatsResource):
+	async def on_get(self, req, resp):
+		# The number of jobs and the library size are counted in SQLite
+		await run_in_thread(StatsResource.on_get, self, req, resp)
+
+def create_asgi_app():
+	"""Create the ASGI application, e.g. for uvicorn --factory meinantrag:create_asgi_app
+	
+	Pages, the result cache and the compiled Word template are shared with the
+	WSGI app of this module; only the generation resources differ.
+	"""
+	import falcon.asgi
+	
+	asgi_app = falcon.asgi.App(middleware=create_middleware())
+	asgi_generate_antrag = AsyncGenerateAntragResource(cache=generation_cache, scheduler=generation_scheduler, library=antrag_library)
+	asgi_generation_job = AsyncGenerationJobResource(asgi_generate_antrag, generation_jobs)
+	if PRELOAD:
+		asgi_generate_antrag.backend
+	
+	asgi_app.add_route('/', AsyncPageResource(meinantrag))
+	asgi_app.add_route('/impressum', AsyncPageResource(impressum))
+	asgi_app.add_route('/datenschutz', AsyncPageResource(datenschutz))
+	asgi_app.add_route('/api/generate-antrag', asgi_generate_antrag)
+	asgi_app.add_route('/api/generate-antrag/stream', asgi_generate_antrag, suffix='stream')
+	asgi_app.add_route('/api/jobs', asgi_generation_job)
+	asgi_app.add_route('/api/jobs/{job_id}', asgi_generation_job, suffix='job')
+	asgi_generate_word = AsyncGenerateWordResource(generate_word)
+	asgi_app.add_route('/api/generate-word', asgi_generate_word)
+	asgi_app.add_route('/api/generate-word/batch', asgi_generate_word, suffix='batch')
+	asgi_app.add_route('/robots.txt', AsyncPageResource(robots))
+	asgi_app.add_route('/sitemap.xml', AsyncPageResource(sitemap))
+	asgi_app.add_route('/metrics', AsyncMetricsResource())
+	if request_profiler is not None:
+		asgi_app.add_route('/api/admin/profiles', AsyncProfilesResource(request_profiler))
+	asgi_app.add_route('/api/library/search', AsyncLibraryResource(antrag_library), suffix='search')
+	asgi_app.add_route('/api/stats', AsyncStatsResource(cache=generation_cache, scheduler=generation_scheduler, jobs=generation_jobs, generator=asgi_generate_antrag, library=antrag_library, limiter=rate_limiter))
+	
+	if static_files is not None:
+		asgi_app.add_route('/static/{path:path}', AsyncStaticResource(static_files))
+	
+	return asgi_app
 
 if __name__ == '__main__':
+	import argparse
+	import socketserver
 	import wsgiref.simple_server
 	
+	parser = argparse.ArgumentParser(description='MeinAntrag web application')
+	parser.add_argument('--compile-templates', metavar='DIR', help='precompile the Jinja2 templates into DIR and exit')
+	parser.add_argument('--host', default='localhost', help='interface to listen on (default: localhost)')
+	parser.add_argument('--port', type=int, default=8000, help='port to listen on (default: 8000)')
+	parser.add_argument('--asgi', action='store_true', help='serve the ASGI app with uvicorn instead of wsgiref')
+	args = parser.parse_args()
+	
+	if args.compile_templates:
+		compile_templates(args.compile_templates)
+		sys.exit(0)
+	
 	print("Starting MeinAntrag web application...")
-	print("Open your browser and navigate to: http://localhost:8000")
+	print(f"Open your browser and navigate to: http://{args.host}:{args.port}")
 	print(f"Serving static assets from: {STATIC_DIR}")
 	
-	httpd = wsgiref.simple_server.make_server('localhost', 8000, app)
+	if args.asgi:
+		try:
+			import uvicorn
+		except ImportError:
+			print("Error: --asgi requires uvicorn (pip install uvicorn)")
+			sys.exit(1)
+		uvicorn.run(create_asgi_app(), host=args.host, port=args.port)
+		sys.exit(0)
+	
+	# One thread per request, like the threads of the uWSGI deployment
+	class ThreadingWSGIServer(socketserver.ThreadingMixIn, wsgiref.simple_server.WSGIServer):
+		daemon_threads = True
+	
+	httpd = wsgiref.simple_server.make_server(args.host, args.port, app, server_class=ThreadingWSGIServer)
 	httpd.serve_forever()
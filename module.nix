@@ -60,15 +60,28 @@ in
             need-app = true;
             "no-orphans" = true;
 
+            # /static is answered by uWSGI itself instead of a Python worker thread,
+            # with the .gz siblings of the build for clients that accept gzip
+            "static-map" = "/static=${pkgs.meinantrag}/share/meinantrag/assets";
+            "static-gzip-all" = true;
+            # Bundles under dist/ have a content hash in their name and never change
+            "static-expires-uri" = "^/static/dist/ 31536000";
+            "route-uri" = "^/static/dist/ addheader:Cache-Control: public, max-age=31536000, immutable";
+
+            # Metrics snapshots of the previous run would be summed into the new one
+            "exec-asap" = "${pkgs.coreutils}/bin/rm -rf ${config.services.uwsgi.runDir}/meinantrag-metrics";
+
             env = [
               "PYTHONPATH=${pkgs.meinantrag}/share/meinantrag:${pkgs.meinantrag.pythonPath}"
               "MEINANTRAG_TEMPLATES_DIR=${pkgs.meinantrag}/share/meinantrag/templates"
+              "MEINANTRAG_COMPILED_TEMPLATES_DIR=${pkgs.meinantrag}/share/meinantrag/templates-compiled"
               "MEINANTRAG_STATIC_DIR=${pkgs.meinantrag}/share/meinantrag/assets"
+              "MEINANTRAG_PROMPTS_DIR=${pkgs.meinantrag}/share/meinantrag/prompts"
+              "MEINANTRAG_PRELOAD=1"
+              "MEINANTRAG_RATE_LIMIT_DB=${config.services.uwsgi.runDir}/meinantrag-ratelimit.db"
+              "MEINANTRAG_JOBS_DB=${config.services.uwsgi.runDir}/meinantrag-jobs.db"
+              "MEINANTRAG_METRICS_DIR=${config.services.uwsgi.runDir}/meinantrag-metrics"
             ] ++ (lib.mapAttrsToList (name: value: "${name}=${value}") cfg.settings);
-
-            settings = {
-              "static-map" = "/static=${pkgs.meinantrag}/share/meinantrag/assets";
-            };
           };
         };
       };